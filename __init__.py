@@ -1,13 +1,15 @@
 __version__ = "1.1.1"
 
-from .player import Player
+from .player import Player, PlayerPool
 from .exceptions import LineupOptimizerException, LineupOptimizerIncorrectTeamName, \
     LineupOptimizerIncorrectPositionName, OptimizerParsingException, InvalidSiteSpecified, InvalidSportSpecified, ListOfPlayersIsEmpty
 from .lineup_optimizer import LineupOptimizer
 from .lineup import Lineup
+from .solvers import Solver, solvers_mapping
 from .settings import FanDuelFootballSettings, FanDuelBaseballSettings, FanDuelBasketballSettings, \
     DraftKingsFootballSettings, DraftKingsBaseballSettings, DraftKingsBasketballSettings
 from .constants import *
+from .registry import SlateRegistry
 
 settings_mapping = {
     Site.DRAFTKINGS: {
@@ -32,7 +34,78 @@ def get_optimizer(site, sport):
     except KeyError:
         raise NotImplementedError
 
-def get_optimizer(jsonSpec):
+def get_player_options(player):
+    """
+    Return force, exclude and max exposure options of player from spec.
+    :type player: dict
+    :rtype: Tuple[bool, bool, float]
+    """
+    excluded = False
+    force = False
+    max_exposure = None
+    if JSON_SPEC.PLAYER_FORCE in player and player[JSON_SPEC.PLAYER_FORCE] and isinstance(player[JSON_SPEC.PLAYER_FORCE], bool):
+        force = player[JSON_SPEC.PLAYER_FORCE]
+    if JSON_SPEC.PLAYER_EXCLUDE in player and player[JSON_SPEC.PLAYER_EXCLUDE] and isinstance(player[JSON_SPEC.PLAYER_EXCLUDE], bool):
+        excluded = player[JSON_SPEC.PLAYER_EXCLUDE]
+    if JSON_SPEC.PLAYER_MAX_EXPOSURE in player and player[JSON_SPEC.PLAYER_MAX_EXPOSURE] and (isinstance(player[JSON_SPEC.PLAYER_MAX_EXPOSURE], float) or
+        isinstance(player[JSON_SPEC.PLAYER_MAX_EXPOSURE], int)):
+        max_exposure = player[JSON_SPEC.PLAYER_MAX_EXPOSURE]
+        max_exposure = max_exposure / 100.0 if max_exposure and max_exposure > 1 else max_exposure
+    return force, excluded, max_exposure
+
+
+def parse_player_row(player):
+    """
+    Return row of players pool for player from spec or None if player is invalid.
+    Row has same fields as arguments of Player.
+    :type player: dict
+    :rtype: tuple
+    """
+    if JSON_SPEC.PLAYER_ID in player and player[JSON_SPEC.PLAYER_ID] and JSON_SPEC.PLAYER_FULL_NAME in player and \
+        player[JSON_SPEC.PLAYER_FULL_NAME] and JSON_SPEC.PLAYER_POSITION in player and player[JSON_SPEC.PLAYER_POSITION] and \
+        JSON_SPEC.PLAYER_FPPG in player and player[JSON_SPEC.PLAYER_FPPG] and \
+            (isinstance(player[JSON_SPEC.PLAYER_FPPG], float) or isinstance(player[JSON_SPEC.PLAYER_FPPG], int)) and \
+        JSON_SPEC.PLAYER_SALARY in player and player[JSON_SPEC.PLAYER_SALARY] and isinstance(player[JSON_SPEC.PLAYER_SALARY], int) and \
+        player[JSON_SPEC.PLAYER_SALARY] > 0 and JSON_SPEC.PLAYER_TEAM in player and player[JSON_SPEC.PLAYER_TEAM] and \
+        JSON_SPEC.PLAYER_OPPONENT in player and player[JSON_SPEC.PLAYER_OPPONENT]:
+        id = player[JSON_SPEC.PLAYER_ID]
+        full_name = player[JSON_SPEC.PLAYER_FULL_NAME]
+        positions_string = player[JSON_SPEC.PLAYER_POSITION]
+        positions = []
+        if '/' in positions_string:
+            positions = positions_string.split('/')
+        else:
+            positions.append(positions_string)
+
+        fps = player[JSON_SPEC.PLAYER_FPPG]
+        salary = player[JSON_SPEC.PLAYER_SALARY]
+        team = player[JSON_SPEC.PLAYER_TEAM].upper()
+        opponent = player[JSON_SPEC.PLAYER_OPPONENT].upper()
+        is_injured = False
+        if JSON_SPEC.PLAYER_INJURED in player and player[JSON_SPEC.PLAYER_INJURED] and isinstance(player[JSON_SPEC.PLAYER_INJURED], bool):
+            is_injured = player[JSON_SPEC.PLAYER_INJURED]
+        force, excluded, max_exposure = get_player_options(player)
+
+        return id, full_name, positions, team, opponent, salary, fps, is_injured, max_exposure, force, excluded
+    return None
+
+
+def is_multi_entry(jsonSpec):
+    """
+    Check that spec asks for multi entry mode, which allows up to LIMITS.MAX_MULTI_ENTRY_LINEUPS lineups.
+    :type jsonSpec: dict
+    :rtype: bool
+    """
+    return isinstance(jsonSpec, dict) and jsonSpec.get(JSON_SPEC.MULTI_ENTRY) is True
+
+
+def get_optimizer(jsonSpec, registry=None):
+    """
+    Create optimizer for spec, players pool of spec is taken from registry of slates if it's passed.
+    :type jsonSpec: dict
+    :type registry: SlateRegistry
+    :rtype: LineupOptimizer
+    """
 
     if JSON_SPEC.SITE not in jsonSpec or jsonSpec[JSON_SPEC.SITE] not in sites:
         raise InvalidSiteSpecified("Site specified in spec is invalid!!!")
@@ -45,61 +118,51 @@ def get_optimizer(jsonSpec):
     settings = settings_mapping[site][sport]
     optimizer = LineupOptimizer(settings_mapping[site][sport])
     players_list = []
+    excluded_players = []
+    registered = None
 
     if JSON_SPEC.PLAYERS in jsonSpec:
         players = jsonSpec[JSON_SPEC.PLAYERS]
 
-        for player in players:
-            if JSON_SPEC.PLAYER_ID in player and player[JSON_SPEC.PLAYER_ID] and JSON_SPEC.PLAYER_FULL_NAME in player and \
-                player[JSON_SPEC.PLAYER_FULL_NAME] and JSON_SPEC.PLAYER_POSITION in player and player[JSON_SPEC.PLAYER_POSITION] and \
-                JSON_SPEC.PLAYER_FPPG in player and player[JSON_SPEC.PLAYER_FPPG] and \
-                    (isinstance(player[JSON_SPEC.PLAYER_FPPG], float) or isinstance(player[JSON_SPEC.PLAYER_FPPG], int)) and \
-                JSON_SPEC.PLAYER_SALARY in player and player[JSON_SPEC.PLAYER_SALARY] and isinstance(player[JSON_SPEC.PLAYER_SALARY], int) and \
-                player[JSON_SPEC.PLAYER_SALARY] > 0 and JSON_SPEC.PLAYER_TEAM in player and player[JSON_SPEC.PLAYER_TEAM] and \
-                JSON_SPEC.PLAYER_OPPONENT in player and player[JSON_SPEC.PLAYER_OPPONENT]:
-                id = player[JSON_SPEC.PLAYER_ID]
-                full_name = player[JSON_SPEC.PLAYER_FULL_NAME]
-                positions_string = player[JSON_SPEC.PLAYER_POSITION]
-                positions = []
-                if '/' in positions_string:
-                    positions = positions_string.split('/')
-                else:
-                    positions.append(positions_string)
-
-                fps = player[JSON_SPEC.PLAYER_FPPG]
-                salary = player[JSON_SPEC.PLAYER_SALARY]
-                team = player[JSON_SPEC.PLAYER_TEAM].upper()
-                opponent = player[JSON_SPEC.PLAYER_OPPONENT].upper()
-                is_injured = False
-                excluded = False
-                force = False
-                max_exposure = None
-                if JSON_SPEC.PLAYER_INJURED in player and player[JSON_SPEC.PLAYER_INJURED] and isinstance(player[JSON_SPEC.PLAYER_INJURED], bool):
-                    is_injured = player[JSON_SPEC.PLAYER_INJURED]
-                if JSON_SPEC.PLAYER_FORCE in player and player[JSON_SPEC.PLAYER_FORCE] and isinstance(player[JSON_SPEC.PLAYER_FORCE], bool):
-                    force = player[JSON_SPEC.PLAYER_FORCE]
-                if JSON_SPEC.PLAYER_EXCLUDE in player and player[JSON_SPEC.PLAYER_EXCLUDE] and isinstance(player[JSON_SPEC.PLAYER_EXCLUDE], bool):
-                    excluded = player[JSON_SPEC.PLAYER_EXCLUDE]
-                if JSON_SPEC.PLAYER_MAX_EXPOSURE in player and player[JSON_SPEC.PLAYER_MAX_EXPOSURE] and (isinstance(player[JSON_SPEC.PLAYER_MAX_EXPOSURE], float) or
-                    isinstance(player[JSON_SPEC.PLAYER_MAX_EXPOSURE], int)):
-                    max_exposure = player[JSON_SPEC.PLAYER_MAX_EXPOSURE]
-                    max_exposure = max_exposure / 100.0 if max_exposure and max_exposure > 1 else max_exposure
-
-                pl = Player(id,full_name,positions, team, opponent, salary, fps, is_injured=is_injured, max_exposure=max_exposure,
-                                force=force, exclude=excluded)
-                if not excluded:
-                    players_list.append(pl)
+        if registry is not None:
+            registered, template_indices = registry.get_slate(site, sport, players, parse_player_row)
+        if registered is not None:
+            # players of registered pool are copied, so options of players of this spec don't change pool
+            players_list = registered.copy_players()
+            for player, i in zip(players, template_indices):
+                if i < 0:
+                    continue
+                pl = players_list[i]
+                pl.force, pl.exclude, pl.max_exposure = get_player_options(player)
+                if pl.exclude:
+                    excluded_players.append(pl)
+            if len(excluded_players) == len(players_list):
+                players_list = []
+        else:
+            rows = [parse_player_row(player) for player in players]
+            players_list = PlayerPool(row for row in rows if row is not None and not row[-1]).players
 
     if not players_list:
         raise ListOfPlayersIsEmpty("List of players is empty!!!")
 
-    optimizer.load_players(players_list)
+    if registered is not None:
+        optimizer._set_players(players_list, registered.index.bind(players_list))
+        for pl in excluded_players:
+            optimizer.remove_player(pl)
+        optimizer._available_teams = set(pl.team for pl in optimizer.players)
+    else:
+        optimizer.load_players(players_list)
     optimizer._site = site
     optimizer._sport = sport
     optimizer._num_of_lineups = 1
 
+    max_lineups = LIMITS.MAX_LINEUPS
+    if is_multi_entry(jsonSpec):
+        optimizer._multi_entry = True
+        max_lineups = LIMITS.MAX_MULTI_ENTRY_LINEUPS
+
     if JSON_SPEC.NUMBER_OF_LINEUPS in jsonSpec and isinstance(jsonSpec[JSON_SPEC.NUMBER_OF_LINEUPS], int) and \
-                            0 < jsonSpec[JSON_SPEC.NUMBER_OF_LINEUPS] <= LIMITS.MAX_LINEUPS:
+                            0 < jsonSpec[JSON_SPEC.NUMBER_OF_LINEUPS] <= max_lineups:
         optimizer._num_of_lineups = jsonSpec[JSON_SPEC.NUMBER_OF_LINEUPS]
 
     if JSON_SPEC.SOLVER in jsonSpec and (isinstance(jsonSpec[JSON_SPEC.SOLVER], str) or isinstance(jsonSpec[JSON_SPEC.SOLVER], unicode)):
@@ -111,6 +174,41 @@ def get_optimizer(jsonSpec):
     if JSON_SPEC.THREADS in jsonSpec and isinstance(jsonSpec[JSON_SPEC.THREADS], int) :
         optimizer._threads = jsonSpec[JSON_SPEC.THREADS]
 
+    if JSON_SPEC.PERSISTENT_MODEL in jsonSpec and isinstance(jsonSpec[JSON_SPEC.PERSISTENT_MODEL], bool):
+        optimizer._persistent_model = jsonSpec[JSON_SPEC.PERSISTENT_MODEL]
+
+    if JSON_SPEC.WARM_START in jsonSpec and isinstance(jsonSpec[JSON_SPEC.WARM_START], bool):
+        optimizer._warm_start = jsonSpec[JSON_SPEC.WARM_START]
+
+    if JSON_SPEC.K_BEST in jsonSpec and isinstance(jsonSpec[JSON_SPEC.K_BEST], bool):
+        optimizer._k_best = jsonSpec[JSON_SPEC.K_BEST]
+
+    if JSON_SPEC.PORTFOLIO in jsonSpec and isinstance(jsonSpec[JSON_SPEC.PORTFOLIO], bool):
+        optimizer._portfolio = jsonSpec[JSON_SPEC.PORTFOLIO]
+
+    if JSON_SPEC.DIVERSITY_CUTS in jsonSpec and jsonSpec[JSON_SPEC.DIVERSITY_CUTS] in (
+            DIVERSITY_CUTS.EAGER, DIVERSITY_CUTS.LAZY):
+        optimizer._diversity_cuts = jsonSpec[JSON_SPEC.DIVERSITY_CUTS]
+
+    if JSON_SPEC.LAZY_RULES in jsonSpec and isinstance(jsonSpec[JSON_SPEC.LAZY_RULES], bool):
+        optimizer._lazy_rules = jsonSpec[JSON_SPEC.LAZY_RULES]
+
+    if JSON_SPEC.PRESOLVE in jsonSpec and isinstance(jsonSpec[JSON_SPEC.PRESOLVE], bool):
+        optimizer._presolve = jsonSpec[JSON_SPEC.PRESOLVE]
+
+    if JSON_SPEC.PARALLEL_WORKERS in jsonSpec and isinstance(jsonSpec[JSON_SPEC.PARALLEL_WORKERS], int):
+        optimizer._parallel_workers = jsonSpec[JSON_SPEC.PARALLEL_WORKERS]
+
+    if JSON_SPEC.TIME_LIMIT in jsonSpec and (isinstance(jsonSpec[JSON_SPEC.TIME_LIMIT], float) or
+                                             isinstance(jsonSpec[JSON_SPEC.TIME_LIMIT], int)) and \
+            jsonSpec[JSON_SPEC.TIME_LIMIT] > 0:
+        optimizer._time_limit = jsonSpec[JSON_SPEC.TIME_LIMIT]
+
+    if JSON_SPEC.MIP_GAP in jsonSpec and (isinstance(jsonSpec[JSON_SPEC.MIP_GAP], float) or
+                                          isinstance(jsonSpec[JSON_SPEC.MIP_GAP], int)) and \
+            0 <= jsonSpec[JSON_SPEC.MIP_GAP] < 1:
+        optimizer._mip_gap = jsonSpec[JSON_SPEC.MIP_GAP]
+
     if JSON_SPEC.MAX_EXPOSURE in jsonSpec and (isinstance(jsonSpec[JSON_SPEC.MAX_EXPOSURE], float) or
                                                isinstance(jsonSpec[JSON_SPEC.MAX_EXPOSURE], int)) and \
         0 < jsonSpec[JSON_SPEC.MAX_EXPOSURE] < 100:
@@ -196,8 +294,7 @@ def get_optimizer(jsonSpec):
                                 if team is not None and team in optimizer.get_available_teams():
                                     use_teams.append(team)
                                 if use_teams:
-                                    pls = [pl for pl in optimizer.players if not (pl.positions[0] == 'QB' and pl.team not in use_teams)]
-                                    optimizer.load_players(pls)
+                                    optimizer.remove_players_not_from_teams(('QB', ), use_teams)
                     elif item[JSON_SPEC.STACK_TYPE] == JSON_SPEC.STACK_RB_D:
                         optimizer._rb_d_stack = True
                         if JSON_SPEC.STACK_TEAMS in item and item[JSON_SPEC.STACK_TEAMS] is not None and \
@@ -207,8 +304,7 @@ def get_optimizer(jsonSpec):
                                 if team is not None and team in optimizer.get_available_teams():
                                     use_teams.append(team)
                                 if use_teams:
-                                    pls = [pl for pl in optimizer.players if not ((pl.positions[0] == 'D' or pl.positions[0] == 'DST') and pl.team not in use_teams)]
-                                    optimizer.load_players(pls)
+                                    optimizer.remove_players_not_from_teams(('D', 'DST'), use_teams)
 
     if JSON_SPEC.MIN_MAX_PLAYERS_FROM_TEAM in jsonSpec:
         minMaxPlayersFromTeam = jsonSpec[JSON_SPEC.MIN_MAX_PLAYERS_FROM_TEAM]
@@ -249,14 +345,12 @@ def get_optimizer(jsonSpec):
                         if minPlayers > 0:
                             teamConstraints[team] = [['>=', minPlayers]]
     if remove_teams:
-        pls = [pl for pl in optimizer.players if pl.team not in remove_teams]
+        slate = optimizer.slate
         for team in remove_teams:
             optimizer.get_available_teams().remove(team)
-        optimizer.load_players(pls)
-
-    for pl in optimizer.players:
-        if pl.force:
-            pl.fppg = 1000.0 #optimizer.add_player_to_lineup(pl)
+            for i in slate.teams.get(team, ()):
+                if slate.active[i]:
+                    optimizer.remove_player(slate.players[i])
 
     if teamConstraints:
         optimizer._teamConstraints = teamConstraints
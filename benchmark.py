@@ -0,0 +1,118 @@
+"""
+Benchmark of solver backends on lineup model of all players of spec, presolve isn't applied. Every backend compiles
+same model once and solves it repeatedly, first with all players free and then with players fixed to best lineup.
+Search of fixed model is trivial, so its time is overhead of backend: writing model file, starting solver process and
+reading solution file for pulp backends, only passing bounds for in-process backends.
+With -d option modes of diversity cuts are compared on whole run of spec with numberOfUniquePlayers instead,
+time of first and last tenth of lineups shows if cost of lineup grows with number of taken lineups.
+python -m pydfs_lineup_optimizer.benchmark spec.json -s CBC HIGHS BNB
+python -m pydfs_lineup_optimizer.benchmark spec.json -d eager lazy
+"""
+from __future__ import print_function
+import argparse
+import json
+import sys
+import time
+import numpy as np
+from . import get_optimizer
+from .constants import JSON_SPEC
+from .run import OptimizationRun
+
+
+def time_solves(solver, repeats):
+    """
+    Return best lineup and mean seconds of solve after first one, which can include compiling of model.
+    :type solver: Solver
+    :type repeats: int
+    :rtype: Tuple[List[int], float]
+    """
+    selected = solver.solve()
+    start = time.time()
+    for _ in range(repeats):
+        solver.solve()
+    return selected, (time.time() - start) / repeats
+
+
+def benchmark_solvers(spec, solvers, repeats=20):
+    """
+    Return milliseconds of solve and of fixed model solve for every backend, None for backend which failed.
+    :type spec: dict
+    :type solvers: List[str]
+    :type repeats: int
+    :rtype: List[Tuple[str, float, float]]
+    """
+    optimizer = get_optimizer(spec)
+    players = optimizer.players
+    model_indices = np.full(len(optimizer.slate), -1, dtype=int)
+    model_indices[optimizer.slate.indices_of(players)] = np.arange(len(players))
+    groups = optimizer._get_groups(model_indices)
+    run = OptimizationRun(players, 1)
+    results = []
+    for name in solvers:
+        optimizer._solver = name
+        try:
+            solver = optimizer._create_solver(len(players))
+        except Exception as e:
+            print('{}: {}'.format(name, e), file=sys.stderr)
+            results.append((name, None, None))
+            continue
+        optimizer._build_model(solver, run, groups)
+        selected, solve_time = time_solves(solver, repeats)
+        if selected is None:
+            results.append((name, None, None))
+            continue
+        lineup = set(selected)
+        for i in range(len(players)):
+            solver.set_bounds(i, int(i in lineup), int(i in lineup))
+        _, overhead = time_solves(solver, repeats)
+        results.append((name, solve_time * 1000, overhead * 1000))
+    return results
+
+
+def benchmark_diversity_cuts(spec, modes):
+    """
+    Return number of lineups, seconds of run and mean milliseconds of lineup in first and last tenth of run
+    for every mode of diversity cuts.
+    :type spec: dict
+    :type modes: List[str]
+    :rtype: List[Tuple[str, int, float, float, float]]
+    """
+    results = []
+    for mode in modes:
+        times = []
+        optimizer = get_optimizer(dict(spec, **{JSON_SPEC.DIVERSITY_CUTS: mode}))
+        start = time.time()
+        for _ in optimizer.iter_optimize(lambda i, solve_time, points: times.append(solve_time)):
+            pass
+        total = time.time() - start
+        tenth = max(len(times) // 10, 1)
+        results.append((mode, len(times), total, np.mean(times[:tenth]) * 1000 if times else 0.0,
+                         np.mean(times[-tenth:]) * 1000 if times else 0.0))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare solver backends on lineup model of spec.')
+    parser.add_argument('spec', help='JSON file with spec')
+    parser.add_argument('-s', '--solvers', nargs='+', default=['CBC', 'HIGHS', 'BNB'], help='names of backends')
+    parser.add_argument('-r', '--repeats', type=int, default=20, help='number of timed solves')
+    parser.add_argument('-d', '--diversity-cuts', nargs='+', help='compare modes of diversity cuts on whole run')
+    args = parser.parse_args(argv)
+    with open(args.spec, 'r') as f:
+        spec = json.load(f)
+    if args.diversity_cuts:
+        print('{:<12}{:>9}{:>10}{:>14}{:>14}'.format('cuts', 'lineups', 'total s', 'first ms', 'last ms'))
+        for mode, num_of_lineups, total, first, last in benchmark_diversity_cuts(spec, args.diversity_cuts):
+            print('{:<12}{:>9}{:>10.1f}{:>14.1f}{:>14.1f}'.format(mode, num_of_lineups, total, first, last))
+        return 0
+    print('{:<8}{:>12}{:>14}'.format('solver', 'solve ms', 'overhead ms'))
+    for name, solve_time, overhead in benchmark_solvers(spec, args.solvers, args.repeats):
+        if solve_time is None:
+            print('{:<8}{:>12}{:>14}'.format(name, '-', '-'))
+        else:
+            print('{:<8}{:>12.1f}{:>14.1f}'.format(name, solve_time, overhead))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
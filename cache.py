@@ -0,0 +1,233 @@
+"""
+Cache of optimization results keyed by hash of canonical form of spec.
+Results are lists of serialized lineups, they are kept in memory LRU with size limit and optionally in directory,
+so they survive restarts and are shared by processes using same directory.
+Only results which are same for every run of spec are cached: randomized specs have no key and results of specs
+with time limit are stored only when they weren't cut short by deadline.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from .constants import JSON_SPEC
+
+# version of canonical form and of stored results, bump it when optimizer starts to return different lineups
+CACHE_FORMAT = 3
+
+# spec fields which change only how lineups are found, so they don't make specs different
+EXECUTION_FIELDS = (JSON_SPEC.SPEC_ID, JSON_SPEC.MESSAGE, JSON_SPEC.THREADS, JSON_SPEC.PERSISTENT_MODEL,
+                    JSON_SPEC.WARM_START, JSON_SPEC.PRESOLVE, JSON_SPEC.PARALLEL_WORKERS)
+
+PLAYER_FIELDS = (JSON_SPEC.PLAYER_ID, JSON_SPEC.PLAYER_FULL_NAME, JSON_SPEC.PLAYER_POSITION, JSON_SPEC.PLAYER_FPPG,
+                 JSON_SPEC.PLAYER_SALARY, JSON_SPEC.PLAYER_TEAM, JSON_SPEC.PLAYER_OPPONENT, JSON_SPEC.PLAYER_INJURED,
+                 JSON_SPEC.PLAYER_MAX_EXPOSURE, JSON_SPEC.PLAYER_FORCE, JSON_SPEC.PLAYER_EXCLUDE)
+
+
+def _sort_key(field):
+    """
+    Key of items of spec lists, items with different types of field values are grouped by type name.
+    """
+    def key(item):
+        value = item.get(field) if isinstance(item, dict) else None
+        return type(value).__name__, value if isinstance(value, (int, float, str)) else 0
+    return key
+
+
+def canonical_spec(spec):
+    """
+    Return canonical form of spec, it's same for specs which differ only in order of players and of team items,
+    in unknown fields of players or in execution fields.
+    Sorting is stable, so order of items which refer to same team and which override each other is kept.
+    :type spec: dict
+    :rtype: dict
+    """
+    spec = dict((key, value) for key, value in spec.items() if key not in EXECUTION_FIELDS)
+    players = spec.get(JSON_SPEC.PLAYERS)
+    if isinstance(players, list):
+        players = [dict((key, value) for key, value in player.items() if key in PLAYER_FIELDS)
+                   if isinstance(player, dict) else player for player in players]
+        spec[JSON_SPEC.PLAYERS] = sorted(players, key=_sort_key(JSON_SPEC.PLAYER_ID))
+    for field in (JSON_SPEC.STACKING, JSON_SPEC.MIN_MAX_PLAYERS_FROM_TEAM):
+        if isinstance(spec.get(field), list):
+            spec[field] = sorted(spec[field], key=_sort_key(JSON_SPEC.TEAM_NAME))
+    return spec
+
+
+def spec_key(spec):
+    """
+    Return hash of canonical form of spec or None if spec can't be cached.
+    Randomized specs can't be cached, they are asked again to get other lineups.
+    :type spec: dict
+    :rtype: str
+    """
+    if not isinstance(spec, dict):
+        return None
+    variation = spec.get(JSON_SPEC.VARIATION)
+    if isinstance(variation, (int, float)) and variation > 0:
+        return None
+    try:
+        data = json.dumps([CACHE_FORMAT, canonical_spec(spec)], sort_keys=True, separators=(',', ':'))
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def is_final_result(spec, num_of_lineups, max_gap):
+    """
+    Check that result of spec doesn't depend on time of its run, so it can be cached. Result of spec with time limit
+    is cut short by deadline when it has less lineups than requested or when some lineup wasn't solved to mip gap
+    of spec, max_gap is infinite when solver didn't know gap of some lineup.
+    :type spec: dict
+    :type num_of_lineups: int
+    :type max_gap: float
+    :rtype: bool
+    """
+    time_limit = spec.get(JSON_SPEC.TIME_LIMIT)
+    if not isinstance(time_limit, (int, float)) or time_limit <= 0:
+        return True
+    requested = spec.get(JSON_SPEC.NUMBER_OF_LINEUPS)
+    mip_gap = spec.get(JSON_SPEC.MIP_GAP)
+    if not isinstance(mip_gap, (int, float)) or not 0 <= mip_gap < 1:
+        mip_gap = 0
+    return num_of_lineups >= (requested if isinstance(requested, int) else 1) and max_gap <= mip_gap + 1e-9
+
+
+def get_max_gap(max_gap, lineup):
+    """
+    Return max gap of lineups with passed lineup, lineup without known gap makes it infinite.
+    :type max_gap: float
+    :type lineup: Lineup
+    :rtype: float
+    """
+    return max(max_gap, lineup.gap if lineup.gap is not None else float('inf'))
+
+
+class LineupsCache(object):
+    """
+    Two tier cache of serialized lineups. Memory tier keeps least recently used results up to max_size characters,
+    directory tier keeps all results in files, one lineup per line. Cache can be used from several threads.
+    """
+    def __init__(self, max_size=256 * 1024 * 1024, directory=None):
+        """
+        :type max_size: int
+        :type directory: str
+        """
+        self.max_size = max_size
+        self.directory = directory
+        self.size = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, key):
+        """
+        Return serialized lineups of spec with passed key or None if they aren't cached.
+        Results read from directory are moved to memory tier.
+        :type key: str
+        :rtype: List[str]
+        """
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+        lineups = self._read(key)
+        if lineups is not None:
+            self._store(key, lineups)
+        return lineups
+
+    def put(self, key, lineups):
+        """
+        :type key: str
+        :type lineups: List[str]
+        """
+        lineups = list(lineups)
+        self._store(key, lineups)
+        self._write(key, lineups)
+
+    def get_path(self, key):
+        """
+        Return path of file with lineups of spec in directory tier or None, file is read by caller line by line,
+        so large results aren't loaded to memory.
+        :type key: str
+        :rtype: str
+        """
+        if not self.directory or not os.path.isfile(self._get_path(key)):
+            return None
+        return self._get_path(key)
+
+    def put_file(self, key, path):
+        """
+        Store copy of file with one lineup per line in directory tier only.
+        :type key: str
+        :type path: str
+        """
+        if not self.directory:
+            return
+        target = self._get_path(key)
+        self._make_directory(target)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(path, temp_path)
+            os.replace(temp_path, target)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def _store(self, key, lineups):
+        size = sum(len(lineup) for lineup in lineups)
+        if size > self.max_size:
+            return
+        with self._lock:
+            if key in self._results:
+                self.size -= sum(len(lineup) for lineup in self._results.pop(key))
+            self._results[key] = lineups
+            self.size += size
+            while self.size > self.max_size:
+                _, evicted = self._results.popitem(last=False)
+                self.size -= sum(len(lineup) for lineup in evicted)
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.jsonl')
+
+    def _read(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._get_path(key), 'r') as f:
+                return [line.rstrip('\n') for line in f]
+        except (IOError, OSError):
+            return None
+
+    def _write(self, key, lineups):
+        """
+        Write lineups to temporary file which replaces result file, so readers never see partially written result.
+        """
+        if not self.directory:
+            return
+        path = self._get_path(key)
+        self._make_directory(path)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                for lineup in lineups:
+                    f.write(lineup + '\n')
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def _make_directory(self, path):
+        if not os.path.isdir(os.path.dirname(path)):
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError:
+                # directory was created by other process
+                pass
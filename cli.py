@@ -0,0 +1,230 @@
+"""
+Command line runner of optimizer for JSON lines files of specs.
+Every line of input is spec for get_optimizer, specs are optimized in pool of worker processes and result of every
+spec is written as JSON line as soon as it's finished:
+{"index": 0, "id": "slate-1", "lineups": [...], "time": 1.25, "error": null}
+Specs with same canonical form are optimized once, their duplicates wait for running optimization or are answered
+from cache. Lineups of multi entry specs are written by worker to spool file one per line and copied from it
+to output, so they are never collected in memory.
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import cpu_count
+from . import get_optimizer, is_multi_entry
+from .player import Player
+from .constants import JSON_SPEC
+from .cache import LineupsCache, spec_key, is_final_result, get_max_gap
+from .registry import SlateRegistry
+
+# slates of specs optimized by worker process
+registry = SlateRegistry()
+
+
+def redirect_output():
+    """
+    Send output of optimizer and solver binaries of worker process to stderr, stdout is left for results.
+    """
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+
+def run_spec(spec):
+    """
+    Optimize lineups for spec, lineups are serialized in worker, so players aren't sent between processes.
+    Players pool is parsed once for all specs of same slate optimized by worker.
+    Return serialized lineups, error of spec and False if result was cut short by deadline and can't be cached.
+    :type spec: dict
+    :rtype: Tuple[List[str], str, bool]
+    """
+    try:
+        lineups = get_optimizer(spec, registry).optimize()
+    except Exception as e:
+        return None, '{}: {}'.format(type(e).__name__, e), False
+    max_gap = 0.0
+    for lineup in lineups:
+        max_gap = get_max_gap(max_gap, lineup)
+    return [json.dumps(lineup, default=Player.jdefault) for lineup in lineups], None, \
+        is_final_result(spec, len(lineups), max_gap)
+
+
+def spool_spec(spec, directory):
+    """
+    Optimize lineups for spec and write every serialized lineup to new file in directory as soon as it's found.
+    Return path of file, error of spec and False if result was cut short by deadline and can't be cached.
+    :type spec: dict
+    :type directory: str
+    :rtype: Tuple[str, str, bool]
+    """
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.jsonl')
+    num_of_lineups = 0
+    max_gap = 0.0
+    try:
+        with os.fdopen(fd, 'w') as f:
+            for lineup in get_optimizer(spec, registry).iter_optimize():
+                f.write(json.dumps(lineup, default=Player.jdefault) + '\n')
+                num_of_lineups += 1
+                max_gap = get_max_gap(max_gap, lineup)
+    except Exception as e:
+        os.remove(path)
+        return None, '{}: {}'.format(type(e).__name__, e), False
+    return path, None, is_final_result(spec, num_of_lineups, max_gap)
+
+
+def iter_spooled(path):
+    """
+    Yield serialized lineups from spool file.
+    :type path: str
+    :rtype: Iterator[str]
+    """
+    with open(path, 'r') as f:
+        for line in f:
+            yield line.rstrip('\n')
+
+
+def write_record(output, index, spec_id, lineups, seconds, error):
+    """
+    Write result of spec as JSON line, lineups are written one by one.
+    :type output: file
+    :type index: int
+    :type spec_id: str
+    :type lineups: Iterable[str]
+    :type seconds: float
+    :type error: str
+    """
+    output.write('{{"index": {}, "id": {}, "lineups": '.format(index, json.dumps(spec_id)))
+    if lineups is None:
+        output.write('null')
+    else:
+        output.write('[')
+        for i, lineup in enumerate(lineups):
+            output.write(', ' + lineup if i else lineup)
+        output.write(']')
+    output.write(', "time": {}, "error": {}}}\n'.format(round(seconds, 3), json.dumps(error)))
+
+
+def iter_lines(stream):
+    """
+    Yield indices and not empty lines of input.
+    :type stream: file
+    :rtype: Iterator[Tuple[int, str]]
+    """
+    index = 0
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield index, line
+            index += 1
+
+
+def run(stream, output, workers, cache=None):
+    """
+    Optimize all specs from input stream in pool of worker processes and write results to output.
+    Only two specs per worker are read ahead, so input of any size is processed with bounded memory.
+    Duplicates of running specs are attached to their optimization, final results are stored in cache.
+    Multi entry specs are spooled to files in temporary directory, which is removed at the end.
+    Return number of specs and number of failed specs.
+    :type stream: file
+    :type output: file
+    :type workers: int
+    :type cache: LineupsCache
+    :rtype: Tuple[int, int]
+    """
+    counts = [0, 0]
+
+    def write(index, spec_id, lineups, start, error):
+        # lineups of multi entry spec are path of file with them
+        write_record(output, index, spec_id, iter_spooled(lineups) if isinstance(lineups, str) else lineups,
+                     time.time() - start, error)
+        output.flush()
+        counts[0] += 1
+        counts[1] += error is not None
+
+    lines = iter_lines(stream)
+    # key and waiting specs of every running optimization and running optimizations by keys of specs
+    pending = {}
+    running = {}
+    spool_directory = tempfile.mkdtemp(prefix='lineups-')
+    try:
+        with ProcessPoolExecutor(workers, initializer=redirect_output) as executor:
+            while True:
+                for index, line in lines:
+                    start = time.time()
+                    try:
+                        spec = json.loads(line)
+                    except ValueError as e:
+                        write(index, None, None, start, '{}: {}'.format(type(e).__name__, e))
+                        continue
+                    spec_id = spec.get(JSON_SPEC.SPEC_ID) if isinstance(spec, dict) else None
+                    multi_entry = is_multi_entry(spec)
+                    key = spec_key(spec)
+                    lineups = None
+                    if cache is not None and key is not None:
+                        # results of multi entry specs are read from cache directory line by line
+                        lineups = cache.get_path(key) if multi_entry else cache.get(key)
+                    if lineups is not None:
+                        write(index, spec_id, lineups, start, None)
+                    elif key is not None and key in running:
+                        pending[running[key]][1].append((index, spec_id, start))
+                    else:
+                        if multi_entry:
+                            future = executor.submit(spool_spec, spec, spool_directory)
+                        else:
+                            future = executor.submit(run_spec, spec)
+                        pending[future] = (key, [(index, spec_id, start)])
+                        if key is not None:
+                            running[key] = future
+                        if len(pending) >= workers * 2:
+                            break
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    lineups, error, final = future.result()
+                    key, waiting = pending.pop(future)
+                    running.pop(key, None)
+                    for index, spec_id, start in waiting:
+                        write(index, spec_id, lineups, start, error)
+                    if cache is not None and key is not None and error is None and final:
+                        if isinstance(lineups, str):
+                            cache.put_file(key, lineups)
+                        else:
+                            cache.put(key, lineups)
+                    if isinstance(lineups, str) and os.path.exists(lineups):
+                        os.remove(lineups)
+    finally:
+        shutil.rmtree(spool_directory, ignore_errors=True)
+    return counts[0], counts[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pydfs_lineup_optimizer',
+                                     description='Optimize lineups for JSON lines file of specs.')
+    parser.add_argument('input', nargs='?', default='-', help='JSON lines file with specs, stdin by default')
+    parser.add_argument('-o', '--output', default='-', help='JSON lines file for results, stdout by default')
+    parser.add_argument('-w', '--workers', type=int, default=cpu_count(), help='number of worker processes')
+    parser.add_argument('--cache-dir', help='directory for results of specs shared by runs')
+    parser.add_argument('--cache-size', type=int, default=256, help='max size of results kept in memory in MB')
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error('number of workers must be positive')
+    cache = LineupsCache(args.cache_size * 1024 * 1024, args.cache_dir)
+    stream = sys.stdin if args.input == '-' else open(args.input, 'r')
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    start = time.time()
+    try:
+        total, errors = run(stream, output, args.workers, cache)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if output is not sys.stdout:
+            output.close()
+    print('{} specs optimized, {} failed, {:.2f} s'.format(total, errors, time.time() - start), file=sys.stderr)
+    return 1 if errors else 0
@@ -9,6 +9,12 @@ class Sport:
 
 class LIMITS:
     MAX_LINEUPS = 200
+    # limit of specs with multi entry mode, their lineups are streamed instead of collected
+    MAX_MULTI_ENTRY_LINEUPS = 10000
+
+class DIVERSITY_CUTS:
+    EAGER = 'eager'
+    LAZY = 'lazy'
 
 class JSON_SPEC:
     # general
@@ -60,3 +66,15 @@ class JSON_SPEC:
     SOLVER = 'solver'
     MESSAGE = 'message'
     THREADS = 'thrads'
+    PERSISTENT_MODEL = 'persistentModel'
+    WARM_START = 'warmStart'
+    K_BEST = 'kBest'
+    PRESOLVE = 'presolve'
+    PARALLEL_WORKERS = 'parallelWorkers'
+    SPEC_ID = 'id'
+    TIME_LIMIT = 'timeLimit'
+    MIP_GAP = 'mipGap'
+    PORTFOLIO = 'portfolio'
+    DIVERSITY_CUTS = 'diversityCuts'
+    LAZY_RULES = 'lazyRules'
+    MULTI_ENTRY = 'multiEntry'
@@ -0,0 +1,127 @@
+"""
+Diversity cuts which keep number of unique players between lineups of run.
+Taken lineups are kept in bitset index, so overlap of candidate with all of them is one popcount query
+and duplicate of taken lineup is found by hash.
+In eager mode cut of every taken lineup is added at once and kept for whole run.
+In lazy mode cut of taken lineup is added at once too, because next candidates are mostly near last lineups,
+but it's removed when it wasn't tight for window of next lineups, so model size doesn't grow with number
+of lineups.
+Older lineups are cut only when candidate violates them and candidate is solved again, cut which is added
+again is kept for twice longer window, so cuts of lineups which candidates repeat often stay in model.
+"""
+import numpy as np
+from .constants import DIVERSITY_CUTS
+from .lineup_index import LineupIndex
+
+
+class DiversityCuts(object):
+    # number of next lineups after which cut which wasn't tight is removed in lazy mode
+    window = 50
+
+    def __init__(self, num_of_players, max_common_players, mode=DIVERSITY_CUTS.EAGER, window=None):
+        """
+        :type num_of_players: int
+        :type max_common_players: int
+        :type mode: str
+        :type window: int
+        """
+        self.max_common_players = max_common_players
+        self.mode = mode
+        if window is not None:
+            self.window = window
+        self.lineups = LineupIndex(num_of_players)
+        self._solver = None
+        # active cuts with their constraints, index of their taken lineup, number of lineups when they were tight
+        # last time and their windows
+        self._active = {}
+        # windows of next cuts of taken lineups whose cuts were removed
+        self._windows = {}
+        self._next_key = 0
+
+    def __len__(self):
+        return len(self.lineups)
+
+    @property
+    def num_of_active_cuts(self):
+        return len(self._active)
+
+    def attach(self, solver):
+        """
+        Use passed solver for next cuts. Cuts of previous solver are forgotten, in eager mode all taken lineups
+        are cut off from new solver and in lazy mode lineups of last window.
+        :type solver: Solver
+        """
+        if solver is self._solver:
+            return
+        self._solver = solver
+        self._active.clear()
+        start = 0 if self.mode == DIVERSITY_CUTS.EAGER else max(len(self.lineups) - self.window, 0)
+        for i in range(start, len(self.lineups)):
+            self._add_cut(i)
+
+    def add_lineup(self, selected):
+        """
+        Count taken lineup with passed indices of players and cut it off at once. In lazy mode cuts which
+        weren't tight for their window of lineups are removed.
+        :type selected: List[int]
+        """
+        if not self.lineups.add(selected):
+            return
+        self._add_cut(len(self.lineups) - 1)
+        if self.mode == DIVERSITY_CUTS.EAGER:
+            return
+        # cut of same lineup only is tight for every near lineup, so only repeating keeps it
+        tight = None
+        if self.max_common_players < len(selected) - 1:
+            tight = self.get_overlaps(selected) >= self.max_common_players
+        for key, cut in list(self._active.items()):
+            if tight is not None and tight[cut[1]]:
+                cut[2] = len(self.lineups)
+            elif len(self.lineups) - cut[2] > cut[3]:
+                self._solver.remove_constraint(cut[0])
+                del self._active[key]
+                self._windows[cut[1]] = cut[3] * 2
+
+    def get_overlaps(self, selected):
+        """
+        Return numbers of common players of passed lineup with every taken lineup.
+        :type selected: List[int]
+        :rtype: np.ndarray
+        """
+        return self.lineups.get_overlaps(selected)
+
+    def is_diverse(self, selected):
+        """
+        Check that lineup with passed indices of players keeps number of unique players with all taken lineups.
+        :type selected: List[int]
+        :rtype: bool
+        """
+        if self.max_common_players == len(selected) - 1:
+            return selected not in self.lineups
+        return self.lineups.get_max_overlap(selected) <= self.max_common_players
+
+    def separate(self, selected):
+        """
+        Add cuts of taken lineups violated by candidate with passed indices of players.
+        Return False if candidate keeps number of unique players with all taken lineups.
+        :type selected: List[int]
+        :rtype: bool
+        """
+        if self.max_common_players == len(selected) - 1:
+            # only same lineup is violated, it's found by hash
+            position = self.lineups.find(selected)
+            violated = [position] if position is not None else []
+        else:
+            violated = np.nonzero(self.get_overlaps(selected) > self.max_common_players)[0].tolist()
+        if not violated:
+            return False
+        for i in violated:
+            self._add_cut(i)
+        return True
+
+    def _add_cut(self, lineup):
+        constraint = self._solver.add_constraint(
+            dict((i, 1) for i in self.lineups.get_lineup(lineup)), '<=', self.max_common_players)
+        self._active[self._next_key] = [constraint, lineup, len(self.lineups),
+                                        self._windows.get(lineup, self.window)]
+        self._next_key += 1
@@ -7,6 +7,8 @@ class Lineup:
         :param players: List[Player]
         '''
         self.players = players
+        # proven relative gap of lineup points to upper bound, None if solver doesn't know it
+        self.gap = None
 
     def __str__(self):
         res = '\n'.join([str(index + 1) + ". " + str(player) for index, player in enumerate(self.players)])
@@ -0,0 +1,110 @@
+"""
+Index of taken lineups stored as fixed width bitsets over indices of players in run.
+Duplicate lineups are found by hash of bitset, numbers of common players of lineup with all taken lineups
+are counted by popcount of bitwise and, so queries don't compare lists of players.
+"""
+import numpy as np
+
+# number of set bits of every byte, used when numpy has no bitwise_count
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(words):
+    """
+    Return numbers of set bits in rows of passed array of words.
+    :type words: np.ndarray
+    :rtype: np.ndarray
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=-1, dtype=int)
+    return _BYTE_POPCOUNT[words.view(np.uint8)].sum(axis=-1, dtype=int)
+
+
+class LineupIndex(object):
+    def __init__(self, num_of_players, capacity=16):
+        """
+        :type num_of_players: int
+        :type capacity: int
+        """
+        self.num_of_players = num_of_players
+        self._num_of_words = max((num_of_players + 63) // 64, 1)
+        self._bits = np.zeros((capacity, self._num_of_words), dtype=np.uint64)
+        self._positions = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, selected):
+        return self.find(selected) is not None
+
+    def get_bits(self, selected):
+        """
+        Return bitset of lineup with passed indices of players.
+        :type selected: List[int]
+        :rtype: np.ndarray
+        """
+        mask = np.zeros(self._num_of_words * 64, dtype=bool)
+        mask[list(selected)] = True
+        return np.packbits(mask, bitorder='little').view(np.uint64)
+
+    def add(self, selected):
+        """
+        Add lineup with passed indices of players, return False if same lineup is already in index.
+        :type selected: List[int]
+        :rtype: bool
+        """
+        bits = self.get_bits(selected)
+        key = bits.tobytes()
+        if key in self._positions:
+            return False
+        if self._count == len(self._bits):
+            self._bits = np.concatenate((self._bits, np.zeros_like(self._bits)))
+        self._bits[self._count] = bits
+        self._positions[key] = self._count
+        self._count += 1
+        return True
+
+    def find(self, selected):
+        """
+        Return position of same lineup in index or None.
+        :type selected: List[int]
+        :rtype: int
+        """
+        return self._positions.get(self.get_bits(selected).tobytes())
+
+    def get_lineup(self, position):
+        """
+        Return indices of players of lineup at passed position.
+        :type position: int
+        :rtype: np.ndarray
+        """
+        mask = np.unpackbits(self._bits[position].view(np.uint8), bitorder='little')
+        return np.nonzero(mask[:self.num_of_players])[0]
+
+    def get_overlaps(self, selected):
+        """
+        Return numbers of common players of passed lineup with every lineup in index.
+        :type selected: List[int]
+        :rtype: np.ndarray
+        """
+        return popcount(self._bits[:self._count] & self.get_bits(selected))
+
+    def get_max_overlap(self, selected):
+        """
+        Return max number of common players of passed lineup with any lineup in index, 0 for empty index.
+        :type selected: List[int]
+        :rtype: int
+        """
+        if not self._count:
+            return 0
+        return int(self.get_overlaps(selected).max())
+
+    def filter(self, candidates, max_common_players):
+        """
+        Return candidates which have no more than max_common_players common players with every lineup in index.
+        :type candidates: List[List[int]]
+        :type max_common_players: int
+        :rtype: List[List[int]]
+        """
+        return [selected for selected in candidates if self.get_max_overlap(selected) <= max_common_players]
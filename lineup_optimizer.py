@@ -1,17 +1,25 @@
 from __future__ import division
 from collections import Counter, OrderedDict, defaultdict
-from itertools import chain, combinations
-from copy import deepcopy
-from random import getrandbits, uniform
-from pulp import LpProblem, LpMaximize, LpVariable, LpInteger, lpSum, LpSolverDefault, pulp
+from itertools import chain, combinations, count
+from heapq import heappush, heappop
+from math import fsum
 from .exceptions import LineupOptimizerException, LineupOptimizerInvalidNumberOfPlayersInPineup, LineupOptimizerIncorrectPositionName
 from .settings import BaseSettings
-from .player import Player
+from .player import Player, copy_players
 from .lineup import Lineup
+from .solvers import Solver, ConstraintMatrix, LazyConstraints, get_solver
+from .slate import SlateIndex
+from .slots import get_slot_table, get_cover_table, assign_slots
+from .parallel import RandomizedLineupsCoordinator
+from .run import OptimizationRun, get_run_points
+from .portfolio import PortfolioPlanner
+from .diversity import DiversityCuts
+from .presolve import PresolveReport, DOMINATED, remove_over_budget_players, remove_dominated_players
 from .utils import ratio, list_intersection
 from collections import defaultdict
 from .constants import *
 import time
+import numpy as np
 #from line_profiler import LineProfiler
 
 class PositionPlaces:
@@ -37,6 +45,80 @@ class PositionPlaces:
             self.min += 1
 
 
+# compiled position tables of settings, they are shared by all optimizers with same settings
+_position_tables = {}
+
+
+def get_position_tables(settings):
+    """
+    Return positions and not linked positions of settings as tuples of (positions, min, optional) items,
+    tables are compiled on first call for settings and then shared.
+    :type settings: BaseSettings
+    :rtype: Tuple[tuple, tuple]
+    """
+    tables = _position_tables.get(settings)
+    if tables is None:
+        tables = _position_tables[settings] = compile_position_tables(settings.positions)
+    return tables
+
+
+def compile_position_tables(positions_list):
+    """
+    Convert positions list into tables of places for using in optimizer.
+    :type positions_list: List[LineupPosition]
+    :rtype: Tuple[tuple, tuple]
+    """
+    positions = {}
+    not_linked_positions = {}
+    positions_counter = Counter([tuple(sorted(p.positions)) for p in positions_list])
+    for key in positions_counter.keys():
+        additional_pos = len(list(filter(
+            lambda p: len(p.positions) > len(key) and list_intersection(key, p.positions), positions_list
+        )))
+        min_value = positions_counter[key] + len(list(filter(
+            lambda p: len(p.positions) < len(key) and list_intersection(key, p.positions), positions_list
+        )))
+        positions[key] = (min_value, additional_pos)
+    for first_position, second_position in combinations(positions.items(), 2):
+        if list_intersection(first_position[0], second_position[0]):
+            continue
+        new_key = tuple(sorted(chain(first_position[0], second_position[0])))
+        if new_key in positions:
+            continue
+        not_linked_positions[new_key] = (
+            first_position[1][0] + second_position[1][0],
+            first_position[1][1] + second_position[1][1]
+        )
+
+    for first_position, second_position, third_position in combinations(positions.items(), 3):
+        if list_intersection(first_position[0], second_position[0]):
+            continue
+        if list_intersection(first_position[0], third_position[0]):
+            continue
+        if list_intersection(second_position[0], third_position[0]):
+            continue
+
+        new_key = tuple(sorted(chain(first_position[0], second_position[0], third_position[0])))
+        if new_key in positions:
+            continue
+        not_linked_positions[new_key] = (
+            first_position[1][0] + second_position[1][0] + third_position[1][0],
+            first_position[1][1] + second_position[1][1] + third_position[1][1]
+        )
+    positions = sorted(positions.items(), key=lambda item: len(item[0]))
+    return tuple((key, places[0], places[1]) for key, places in positions), \
+        tuple((key, places[0], places[1]) for key, places in not_linked_positions.items())
+
+
+def get_position_places(table):
+    """
+    Return mutable places of optimizer for compiled position table.
+    :type table: tuple
+    :rtype: OrderedDict[tuple, PositionPlaces]
+    """
+    return OrderedDict((key, PositionPlaces(min_value, optional)) for key, min_value, optional in table)
+
+
 class LineupOptimizer(object):
     def __init__(self, settings):
         """
@@ -44,6 +126,9 @@ class LineupOptimizer(object):
         :type settings: BaseSettings
         """
         self._players = []
+        self._players_by_id = None
+        self._players_view = None
+        self._slate = SlateIndex([])
         self._lineup = []
         self._available_positions = []
         self._available_teams = []
@@ -52,7 +137,7 @@ class LineupOptimizer(object):
         self._max_from_one_team = None
         self._settings = settings
         self._set_settings()
-        self._removed_players = []
+        self._removed_players = OrderedDict()
         self._search_threshold = 0.8
         self._min_deviation = 0.06
         self._max_deviation = 0.12
@@ -82,7 +167,30 @@ class LineupOptimizer(object):
         self._no_def_vs_opp_players = False
 
         self._number_of_unique_players = None
-
+        # keep overlap cuts of unique players for all lineups, or remove idle ones and add them again when violated
+        self._diversity_cuts = DIVERSITY_CUTS.EAGER
+        # add team, opponent and stacking rows only when solution violates them
+        self._lazy_rules = False
+        # up to LIMITS.MAX_MULTI_ENTRY_LINEUPS lineups, only modes which memory doesn't grow with them are used
+        self._multi_entry = False
+
+        # compile base model once per run and change it incrementally between lineups
+        self._persistent_model = True
+        # pass previous lineup as initial solution to backends which support it
+        self._warm_start = True
+        # enumerate best lineups in points order from one partitioned search instead of re-solving with cuts
+        self._k_best = False
+        # plan all lineups together, so max exposure is kept by choice of lineups instead of removing players
+        self._portfolio = False
+        # remove dominated and over budget players before model is built
+        self._presolve = True
+        self._presolve_report = None
+        # generate randomized lineups in pool of worker processes
+        self._parallel_workers = None
+        # seconds for whole optimize run, best lineups found in time are returned
+        self._time_limit = None
+        # relative gap to upper bound at which solves can stop
+        self._mip_gap = None
 
         # optimizers
         self._solver = "GLPK"
@@ -105,17 +213,35 @@ class LineupOptimizer(object):
     @property
     def players(self):
         """
+        Available players, list is cached until players are loaded, removed or restored.
         :rtype: list[Player]
         """
-        return [player for player in self._players
-                if player not in self._removed_players]# and player not in self._lineup]
+        if self._players_view is None:
+            self._players_view = [player for player in self._players
+                                  if player not in self._removed_players]# and player not in self._lineup]
+        return self._players_view
 
     @property
     def removed_players(self):
         """
         :rtype: list[Player]
         """
-        return self._removed_players
+        return list(self._removed_players)
+
+    @property
+    def slate(self):
+        """
+        :rtype: SlateIndex
+        """
+        return self._slate
+
+    @property
+    def presolve_report(self):
+        """
+        Report of players removed by presolve in last optimize() run.
+        :rtype: PresolveReport
+        """
+        return self._presolve_report
 
     def _set_settings(self):
         """
@@ -124,53 +250,11 @@ class LineupOptimizer(object):
         self._budget = self._settings.budget
         self._total_players = self._settings.get_total_players()
         self._max_from_one_team = self._settings.max_from_one_team
-        self._get_positions_for_optimizer(self._settings.positions)
-        self._available_positions = self._positions.keys()
-
-    def _get_positions_for_optimizer(self, positions_list):
-        """
-        Convert positions list into dict for using in optimizer.
-        :type positions_list: List[LineupPosition]
-        """
-        positions = {}
-        not_linked_positions = {}
-        positions_counter = Counter([tuple(sorted(p.positions)) for p in positions_list])
-        for key in positions_counter.keys():
-            additional_pos = len(list(filter(
-                lambda p: len(p.positions) > len(key) and list_intersection(key, p.positions), positions_list
-            )))
-            min_value = positions_counter[key] + len(list(filter(
-                lambda p: len(p.positions) < len(key) and list_intersection(key, p.positions), positions_list
-            )))
-            positions[key] = PositionPlaces(min_value, additional_pos)
-        for first_position, second_position in combinations(positions.items(), 2):
-            if list_intersection(first_position[0], second_position[0]):
-                continue
-            new_key = tuple(sorted(chain(first_position[0], second_position[0])))
-            if new_key in positions:
-                continue
-            not_linked_positions[new_key] = PositionPlaces(
-                first_position[1].min + second_position[1].min,
-                first_position[1].optional + second_position[1].optional
-            )
-
-        for first_position, second_position, third_position in combinations(positions.items(), 3):
-            if list_intersection(first_position[0], second_position[0]):
-                continue
-            if list_intersection(first_position[0], third_position[0]):
-                continue
-
-            new_key = tuple(sorted(chain(first_position[0], second_position[0], third_position[0])))
-            if new_key in positions:
-                continue
-            not_linked_positions[new_key] = PositionPlaces(
-                first_position[1].min + second_position[1].min + third_position[1].min,
-                first_position[1].optional + second_position[1].optional + third_position[1].optional
-            )
-        positions = OrderedDict(sorted(positions.items(), key=lambda item: len(item[0])))
-        self._not_linked_positions = not_linked_positions
-        self._positions = positions
-        self._init_positions = positions
+        # compiled tables are shared, so optimizer changes only its own places made from them
+        self._init_positions, self._init_not_linked_positions = get_position_tables(self._settings)
+        self._positions = get_position_places(self._init_positions)
+        self._not_linked_positions = get_position_places(self._init_not_linked_positions)
+        self._available_positions = tuple(key for key, _, _ in self._init_positions)
 
     def set_deviation(self, min_deviation, max_deviation):
         """
@@ -194,15 +278,28 @@ class LineupOptimizer(object):
         Calls load_players_from_CSV method from _settings object.
         :type filename: str
         """
-        self._players = self._settings.load_players_from_CSV(filename)
-        self._set_available_teams()
+        self._set_players(self._settings.load_players_from_CSV(filename))
 
     def load_players(self, players):
         """
         Manually loads player to optimizer
         :type players: List[Player]
         """
+        self._set_players(players)
+
+    def _set_players(self, players, slate=None):
+        """
+        Set players pool and rebuild lookups of players by id and slate index.
+        Slate index of same pool from slate registry can be passed, so it isn't rebuilt.
+        :type players: List[Player]
+        :type slate: SlateIndex
+        """
         self._players = players
+        # lookup by id is built on first use, most specs don't lock players by id
+        self._players_by_id = None
+        self._players_view = None
+        self._slate = slate if slate is not None else \
+            SlateIndex(player for player in players if isinstance(player, Player))
         self._set_available_teams()
 
     def _set_available_teams(self):
@@ -216,17 +313,31 @@ class LineupOptimizer(object):
         Remove player from list for selecting players for lineup.
         :type player: Player
         """
-        self._removed_players.append(player)
+        self._removed_players[player] = None
+        self._players_view = None
+        self._slate.remove(player)
+
+    def remove_players_not_from_teams(self, positions, teams):
+        """
+        Remove players with passed primary positions which aren't from passed teams.
+        Players are looked up in slate index, so only players of passed positions are visited.
+        :type positions: Tuple[str]
+        :type teams: List[str]
+        """
+        slate = self._slate
+        for position in positions:
+            for i in slate.primary_positions.get(position, ()):
+                if slate.active[i] and slate.players[i].team not in teams:
+                    self.remove_player(slate.players[i])
 
     def restore_player(self, player):
         """
         Restore removed player.
         :type player: Player
         """
-        try:
-            self._removed_players.remove(player)
-        except ValueError:
-            pass
+        if self._removed_players.pop(player, False) is None:
+            self._players_view = None
+            self._slate.restore(player)
 
     def _add_to_lineup(self, player):
         """
@@ -274,12 +385,19 @@ class LineupOptimizer(object):
 
     def get_player_by_id(self, id):
         """
-        Return closest player with similar name or None.
-        :param name: str
+        Return not removed player with passed id or None.
+        :param id: str
         :return: Player
         """
-        players = [player for player in self.players if player.id == id]
-        return players[0] if players else None
+        if self._players_by_id is None:
+            self._players_by_id = {}
+            for player in self._players:
+                if isinstance(player, Player):
+                    self._players_by_id.setdefault(player.id, []).append(player)
+        for player in self._players_by_id.get(id, ()):
+            if player not in self._removed_players:
+                return player
+        return None
 
     def _recalculate_positions(self, players):
         """
@@ -288,7 +406,7 @@ class LineupOptimizer(object):
         :type players: List[Player]
         :return: Dict, int
         """
-        positions = deepcopy(self._init_positions)
+        positions = get_position_places(self._init_positions)
         players.sort(key=lambda p: len(p.positions))
         total_added = 0
         for player in players:
@@ -424,1170 +542,827 @@ class LineupOptimizer(object):
         """
         Select optimal lineup from players list.
         This method uses Mixed Integer Linear Programming method for evaluating best starting lineup.
-        It"s return generator. If you don"t specify n it will return generator with all possible lineups started
-        from highest fppg to lowest fppg.
+        It returns list of lineups started from highest fppg to lowest fppg.
         :rtype: List[Lineup]
         """
+        return list(self.iter_optimize())
 
+    def iter_optimize(self, progress_callback=None, cancel_callback=None):
+        """
+        Generator of lineups, every lineup is yielded as soon as it's found and sorted.
+        Both callbacks are called after every lineup with index of lineup, seconds spent on finding it and
+        its points. Generation stops when cancel_callback returns True or when generator is closed,
+        solvers and worker processes of run are released at that moment.
+        :type progress_callback: Callable[[int, float, float], None]
+        :type cancel_callback: Callable[[int, float, float], bool]
+        :rtype: Iterator[Lineup]
+        """
+        lineups = self._iter_lineups()
+        try:
+            start = time.time()
+            for i, lineup in enumerate(lineups):
+                solve_time = time.time() - start
+                points = sum(player.fppg for player in lineup.players)
+                if progress_callback is not None:
+                    progress_callback(i, solve_time, points)
+                yield lineup
+                if cancel_callback is not None and cancel_callback(i, solve_time, points):
+                    return
+                start = time.time()
+        finally:
+            lineups.close()
+
+    def _iter_lineups(self):
+        """
+        Generator of sorted lineups, every lineup is yielded as soon as it's found.
+        Only lineups needed for next cuts are kept, so memory doesn't grow with number of lineups.
+        :rtype: Iterator[Lineup]
+        """
         # validate positions and teams
         # teams, positions = self._validate_optimizer_params(self._teamConstraints, self._positionConstraints)
 
+        deadline = time.time() + self._time_limit if self._time_limit else None
         locked_players = self._lineup[:]
-        previous_lineup = []
-        players = [player for player in self._players
-                   if player not in self._removed_players and player not in self._lineup
-                   and isinstance(player, Player) and player.max_exposure != 0.0 and
+        locked = set(locked_players)
+        players = [player for player in self.players
+                   if player not in locked and isinstance(player, Player) and player.max_exposure != 0.0 and
                    not (self._include_injured and player.is_injured)]
+        # report of removed players is read from presolve_report property, it isn't printed by optimizer
+        self._presolve_report = None
+        if self._presolve:
+            players = self._presolve_players(players)
+
+        # model indices of players in pool, players which aren't in model are marked by -1
+        model_indices = np.full(len(self._slate), -1, dtype=int)
+        model_indices[self._slate.indices_of(players)] = np.arange(len(players))
+        groups = self._get_groups(model_indices)
+
+        run = OptimizationRun(players, self._num_of_lineups, self._max_exposure)
+        # candidates of portfolio and partitions of k-best search grow with number of lineups
+        if self._portfolio and not self._randomness and not self._multi_entry:
+            lineups = self._optimize_portfolio(run, groups, deadline)
+        elif self._k_best and not self._randomness and self._number_of_unique_players is None and \
+                not self._multi_entry:
+            lineups = self._optimize_k_best(run, groups, deadline)
+        elif self._randomness and self._parallel_workers and self._parallel_workers > 1:
+            lineups = self._optimize_parallel(run, groups, deadline)
+        else:
+            lineups = self._optimize_sequential(run, groups, deadline)
+        try:
+            for lineup in lineups:
+                yield lineup
+        finally:
+            lineups.close()
+        self._lineup = locked_players
 
-        # MLB no batters vs opp pitchers
-        batters_by_team = defaultdict(list)
-        pitchers = []
-        #if self._sport == Sport.BASEBALL:
-        if self._sport == Sport.BASEBALL or self._no_batters_vs_opp_pitchers:
-            for pl in players:
-                if pl.positions[0] != 'P':
-                    batters_by_team[pl.team].append(pl)
-                else:
-                    pitchers.append(pl)
-
-        # nfl stacking
-        qbs = []
-        receivers_by_team = defaultdict(list)
-        if self._qb_wr_te_stack or self._qb_wr_stack or self._qb_te_stack:
-            for pl in players:
-                if pl.positions[0] == 'QB':
-                    qbs.append(pl)
-                else:
-                    if self._qb_wr_te_stack:
-                        if 'WR' in pl.positions or 'TE' in pl.positions:
-                            receivers_by_team[pl.team].append(pl)
-                    elif self._qb_wr_stack:
-                        if 'WR' in pl.positions:
-                            receivers_by_team[pl.team].append(pl)
-                    elif self._qb_te_stack:
-                        if 'TE' in pl.positions:
-                            receivers_by_team[pl.team].append(pl)
-
-        defenses = []
-        rbs_by_team = defaultdict(list)
-        opp_players = defaultdict(list)
-        if self._rb_d_stack or self._no_def_vs_opp_players:
-            for pl in players:
-                if pl.positions[0] == 'D' or pl.positions[0] == 'DST':
-                    defenses.append(pl)
-                else:
-                    if self._rb_d_stack and 'RB' in pl.positions:
-                        rbs_by_team[pl.team].append(pl)
-                    if self._no_def_vs_opp_players:
-                        opp_players[pl.team].append(pl)
-
-        rb_k = defaultdict(list)
-        if self._no_qb_rb_k_same_team:
-            for pl in players:
-                if pl.positions[0] == 'QB':
-                    if not qbs:
-                        qbs.append(pl)
-                elif 'RB' in pl.positions or 'K' in pl.positions:
-                    rb_k[pl.team].append(pl)
-
-        tight_ends = []
-        rb_wr_k = defaultdict(list)
-        if self._no_rb_wr_te_k_same_team:
-            for pl in players:
-                if pl.positions[0] == 'TE':
-                    tight_ends.append(pl)
-                elif 'RB' in pl.positions or 'WR' in pl.positions or 'K' in pl.positions:
-                    rb_wr_k[pl.team].append(pl)
-
+    def _optimize_sequential(self, run, groups, deadline=None):
+        """
+        Generate lineups one by one, every lineup is best lineup which isn't cut off by previous ones.
+        Lineups with more points than previous lineup are cut off by bound of points, so only lineups with
+        same points as previous one are cut off by rows of lineups.
+        :type run: OptimizationRun
+        :type groups: dict
+        :type deadline: float
+        :rtype: Iterator[Lineup]
+        """
+        players = run.players
+        index = run.index
+        previous_lineup = []
+        previous_lineup_points = None
         current_max_points = 10000000
         counter = 0
 
-        all_lineups = []
         diff_lineups = []
-        ret_lineups = []
-
-        if self._threads:
-            print ("Threads " + str(self._threads))
-
-        if self._message:
-            print ("Message " + str(self._message))
-
-        #LpSolverDefault.keepFiles = 1
-
-        if self._solver and self._solver == 'CBC' and self._threads and self._threads > 0:
-            LpSolverDefault.threads = self._threads
-
-        if self._solver and self._solver == 'CBC' and self._message and self._message == 1:
-            LpSolverDefault.msg = 1
-
+        rule_cuts = None
+        if self._lazy_rules:
+            rule_cuts = LazyConstraints(self._get_rule_rows(players, groups), len(players))
+        diversity = None
+        if self._number_of_unique_players is not None:
+            diversity = DiversityCuts(len(players), self._total_players - self._number_of_unique_players,
+                                      self._diversity_cuts)
+        elif self._randomness:
+            # randomized points don't cut off taken lineups, so candidates mostly repeat last lineups and these
+            # are cut off at once, older repeated lineups are found by hash of lineup index. Independently deviated
+            # points of multi entry mode repeat old lineups so often that solving them again costs more than rows
+            # of all taken lineups, so there every taken lineup is cut off for whole run
+            diversity = DiversityCuts(len(players), self._total_players - 1,
+                                      DIVERSITY_CUTS.EAGER if self._multi_entry else DIVERSITY_CUTS.LAZY)
+        available = np.ones(len(players), dtype=bool)
+
+        solver = None
+        max_points_constraint = None
+        lineup_cuts = {}
         while self._num_of_lineups > counter:
-            print (counter)
-            if counter == 65:
-                test11 = 1
-
             #start = time.time()
-            prob = LpProblem("DFS", LpMaximize)
-
-            x = LpVariable.dicts(
-                "table", players,
-                lowBound=0,
-                upBound=1,
-                cat=LpInteger
-            )
+            # base model is compiled once per run, afterwards only cuts, bounds and objective are changed
+            if solver is None or not self._persistent_model:
+                solver = self._create_solver(len(players))
+                self._build_model(solver, run, groups, rules=rule_cuts is None)
+                max_points_constraint = None
+                lineup_cuts = {}
+                for i in np.nonzero(~available)[0]:
+                    solver.set_bounds(int(i), 0, 0)
 
             # add randomnes to the lineups
             if self._randomness:
-                if previous_lineup:
-                    for player in previous_lineup.players:
-                        player.deviated_fppg = player.deviated_fppg * (1 + (-1 ) * uniform(self._min_deviation, self._max_deviation))
+                if self._multi_entry:
+                    # points lowered for every lineup make search harder with every lineup, so in multi entry mode
+                    # every lineup gets independent deviation of points, like lineups of parallel workers
+                    run.reset_deviated_points()
+                    run.deviate_points(players, self._min_deviation, self._max_deviation)
+                elif previous_lineup:
+                    run.deviate_points(previous_lineup.players, self._min_deviation, self._max_deviation)
                 else:
-                    for player in players:
-                        player.deviated_fppg = player.fppg
+                    run.reset_deviated_points()
 
                 # Goal => maximaze sum of fps
-                prob += lpSum([player.deviated_fppg * x[player] for player in players])
+                solver.set_objective(run.deviated_points)
             else:
-                # Goal => maximaze sum of fps
-                prob += lpSum([player.fppg * x[player] for player in players])
-                if self._number_of_unique_players is None:
-                    prob += lpSum([player.fppg * x[player] for player in players]) <= current_max_points
+                if max_points_constraint is None:
+                    max_points_constraint = solver.add_constraint(
+                        dict(enumerate(run.points)), '<=', current_max_points)
+                else:
+                    solver.change_rhs(max_points_constraint, current_max_points)
 
-            # budget constraint
-            if self._max_salary:
-                prob += lpSum([player.salary * x[player] for player in players]) <= self._max_salary
+            if rule_cuts is not None:
+                rule_cuts.attach(solver)
+            # sync cuts with lineups which must be excluded from the next solve
+            if diversity is not None:
+                diversity.attach(solver)
             else:
-                prob += lpSum([player.salary * x[player] for player in players]) <= self.budget
-
-            if self._min_salary:
-                prob += lpSum([player.salary * x[player] for player in players]) >= self._min_salary
-
-            prob += lpSum([x[player] for player in players]) == self._total_players
-
-            # set position constraints. Loop through all positions which are set in optimizer and add all players,
-            # which have that position in a list of their positions, to constraint
-            for position, places in self._positions.items():
-                if self._sport == Sport.BASEBALL:
-                    if position[0] != 'P' and self._site != Site.FANDUEL:
-                        prob += lpSum([x[player] for player in players if
-                                   any([player_position in position for player_position in player.positions])
-                                   ]) >= places.min
-                    else:
-                        prob += lpSum([x[player] for player in players if
-                                       any([player_position in position for player_position in player.positions])
-                                       ]) == places.min
-                elif self._sport == Sport.FOOTBALL or self._sport == Sport.BASKETBALL:
-                    if len(position) == 3:
-                        continue
-
-                    if self._site != Site.FANDUEL and position[0] != 'QB' and position[0] != 'DST':
-                        prob += lpSum([x[player] for player in players if
-                                       any([player_position in position for player_position in player.positions])
-                                       ]) >= places.min
-                    else:
-                        prob += lpSum([x[player] for player in players if
-                                       any([player_position in position for player_position in player.positions])
-                                       ]) == places.min
-
-
-            # only for cases when there are multiple positions for player (dk MLB, NBA)
-            if self._site == Site.DRAFTKINGS and (self._sport == Sport.BASEBALL or self._sport == Sport.BASKETBALL):
-                # set constraints for all position combinations
-                for position, places in self._not_linked_positions.items():
-                    if 'P' in position:
-                        continue
-                    prob += lpSum([x[player] for player in players if
-                                   any([player_position in position for player_position in player.positions])
-                                   ]) >= places.min
-
-            # avoid batters from pitcher opponent team
-            if self._no_batters_vs_opp_pitchers:
-                for pitcher in pitchers:
-                    if pitcher:
-                        prob += lpSum([x[pl] for pl in batters_by_team[pitcher.opponent]]) <= ((x[pitcher] - 1) * (-self._max_from_one_team))
-
-
-            # stacks with qb
-            if self._qb_wr_te_stack or self._qb_wr_stack or self._qb_te_stack:
-                for qb in qbs:
-                    if qb:
-                        prob += lpSum([x[pl] for pl in receivers_by_team[qb.team]]) >= x[qb]
-
-            # stacks with defense
-            if self._rb_d_stack:
-                for dst in defenses:
-                    if dst:
-                        prob += lpSum([x[pl] for pl in rbs_by_team[dst.team]]) >= x[dst]
-
-            # no defense vs opp
-            if self._no_def_vs_opp_players:
-                for dst in defenses:
-                    if dst:
-                        prob += lpSum([x[pl] for pl in opp_players[dst.opponent]]) <= ((x[dst] - 1) * (-self._max_from_one_team))
-
-            # no qb, rb, k, from same team
-            if self._no_qb_rb_k_same_team:
-                for qb in qbs:
-                    if qb:
-                        prob += lpSum([x[pl] for pl in rb_k[qb.team]]) <= (1 + (x[qb] - 1) * (-self._max_from_one_team + 1))
-
-            # no rb, wr, te, k from same team
-            if self._no_rb_wr_te_k_same_team:
-                for te in tight_ends:
-                    if te:
-                        prob += lpSum([x[pl] for pl in rb_wr_k[te.team]]) <= ((x[te] - 1) * (-self._max_from_one_team ))
-
-            if self._teamConstraints is not None and self._sport == Sport.BASEBALL:
-                for key, value in self._teamConstraints.items():
-                    for item in value:
-                        if item[0] == '==':
-                            prob += lpSum([x[player] for player in batters_by_team[key]]) == item[1]
-
-            #for key, value in batters_by_team.items():
-                #for item in value:
-            #   prob += lpSum((sum([x[pl1] for pl1 in value]) == 3)) == 1
-
-            # print (prob)
-            # set exact number of players from same team
-            if self._teamConstraints is not None:
-                for key, value in self._teamConstraints.items():
-                    for item in value:
-                        if item[0] == '=':
-                            prob += lpSum([x[player] for player in players if player.team == key]) == item[1]
-                        elif item[0] == '>=':
-                            prob += lpSum([x[player] for player in players if player.team == key]) >= item[1]
-                        elif item[0] == '<=':
-                            prob += lpSum([x[player] for player in players if player.team == key]) <= item[1]
-
-            # limit maximum number of players from each team
-            if self._max_from_one_team:
-                for team in self._available_teams:
-                    prob += lpSum([x[player] for player in players if player.team == team]) <= self._max_from_one_team
-
-            if self._number_of_unique_players is not None and all_lineups:
-                for lin in all_lineups:
-                    prob += lpSum([x[player] for player in lin.players]) <= self._total_players - self._number_of_unique_players
-
-            if diff_lineups and self._number_of_unique_players is None:
+                for lin in [lin for lin in lineup_cuts if lin not in diff_lineups]:
+                    solver.remove_constraint(lineup_cuts.pop(lin))
                 for lin in diff_lineups:
-                    prob += lpSum([x[player] for player in lin.players if player in x]) <= self._total_players - 1
+                    if lin not in lineup_cuts:
+                        lineup_cuts[lin] = solver.add_constraint(
+                            self._get_coefficients(index, lin.players), '<=', self._total_players - 1)
 
-            #prob.solve(pulp.COIN_CMD(path="C:\\Users\\hariso.HSL\\Downloads\\COIN-OR-1.7.4-win32-msvc11\\COIN-OR\\win32-msvc11\\bin\\cbc.exe"))
-            #prob.solve()
-            #prob.solve(pulp.GLPK_CMD(path="C:\\Users\\hariso.HSL\\Downloads\\winglpk-4.63\\glpk-4.63\\w64\\glpsol.exe", msg=0))
-
-            if self._solver and self._solver == 'CBC':
-                prob.solve()
-            elif self._solver and self._solver == 'COIN':
-                prob.solve(pulp.COIN_CMD(msg=self._message, threads=self._threads))
-            else:
-                prob.solve(pulp.GLPK_CMD(msg=self._message))
-
-            #if self._solver and self._solver == 'CBC':
-            #    prob.solve()
-            #elif self._solver and self._solver == 'COIN':
-            #    prob.solve(pulp.COIN_CMD(path="C:\\Users\\hariso.HSL\\Downloads\\COIN-OR-1.7.4-win32-msvc11\\COIN-OR\\win32-msvc11\\bin\\cbc.exe", msg=self._message, threads=self._threads))
-            #else:
-            #    prob.solve(pulp.GLPK_CMD(path="C:\\Users\\hariso.HSL\\Downloads\\winglpk-4.63\\glpk-4.63\\w64\\glpsol.exe", msg=self._message))
+            if self._warm_start and previous_lineup and solver.supports_warm_start:
+                # previous lineup violates only new cuts, so swapping few players gives good initial solution
+                if self._randomness:
+                    num_of_swaps = 0
+                elif self._number_of_unique_players is not None:
+                    num_of_swaps = self._number_of_unique_players
+                else:
+                    num_of_swaps = 1
+                warm_start = self._repair_lineup(run, [index[player] for player in previous_lineup.players
+                                                       if player in index], available, groups, num_of_swaps)
+                if warm_start and diversity is not None and not diversity.is_diverse(warm_start):
+                    warm_start = None
+                solver.set_warm_start(warm_start or None)
 
-            #print (prob.solver)
             #end = time.time()
             #print(end - start)
-            #print (str(len(prob._variables)))
-            if prob.status == 1:
-                lineup_players = self._lineup[:]
-                removePlayers = []
-                for player in players:
-                    if x[player].value() == 1.0:
-                        lineup_players.append(player)
-                        player.num_of_lineups += 1
-                        exposure = player.max_exposure if player.max_exposure is not None else self._max_exposure
-                        if exposure is not None and exposure <= player.num_of_lineups / self._num_of_lineups:
-                            if player in players:
-                                removePlayers.append(player)
+            if not self._set_time_budget(solver, deadline, self._num_of_lineups - counter):
+                return
+            selected = solver.solve()
+            if selected is None and not solver.infeasible and deadline is not None and \
+                    self._set_time_budget(solver, deadline, 1):
+                # nothing was found in share of time, last try gets all time left
+                selected = solver.solve()
+            # candidate is solved again while it breaks lazy rules or has too many common players with taken lineups
+            while selected is not None and any(cuts is not None and cuts.separate(selected)
+                                               for cuts in (rule_cuts, diversity)):
+                if not self._set_time_budget(solver, deadline, self._num_of_lineups - counter):
+                    return
+                selected = solver.solve()
+            if selected is not None:
+                lineup_players = self._lineup[:] + [players[i] for i in selected]
+                removePlayers = [players[i] for i in run.add_lineup(selected)]
 
                 lineup = Lineup(lineup_players)
-                all_lineups.append(lineup)
+                if diversity is not None:
+                    diversity.add_lineup(selected)
                 try:
-                    new_lineup = self.get_sorted_lineup(lineup)
-                    ret_lineups.append(new_lineup)
+                    new_lineup = self.get_sorted_lineup(lineup, run)
                 except LineupOptimizerInvalidNumberOfPlayersInPineup:
-                    return ret_lineups;
+                    return
+                new_lineup.gap = solver.gap
+                yield new_lineup
 
+                # bound of points is row of model, so it's compared with run points of selected players:
+                # forced players have their run points and locked players aren't in model
+                lineup_points = round(sum(run.points[i] for i in selected), 6)
                 if previous_lineup and not self._randomness:
-                    current_lineup_points = lineup.fantasy_points_projection
-                    previous_lineup_points = previous_lineup.fantasy_points_projection
-                    if previous_lineup_points != current_lineup_points:
+                    if previous_lineup_points != lineup_points:
                         current_max_points = previous_lineup_points - 0.01
-                        diff_lineups = []
-                        #diff_lineups.append(lineup)
+                        # lineups above new bound are cut off by it, but current one is still under it
+                        diff_lineups = [lineup]
                     else:
                         diff_lineups.append(lineup)
                 elif not self._randomness:
                     diff_lineups.append(lineup)
+                if self._number_of_unique_players is not None and not self._randomness:
+                    # next lineup is best of smaller set of lineups, so it has no more points,
+                    # lineups near taken ones with more points are cut off without diversity cuts
+                    current_max_points = lineup_points + 1e-6
 
                 previous_lineup = lineup
-                #yield lineup
-                #all_lineups.append(lineup)
-                if removePlayers:
-                    for remPl in removePlayers:
-                        if self._no_batters_vs_opp_pitchers:
-                            if remPl.positions[0] == 'P':
-                                pitchers.remove(remPl)
-                            else:
-                                batters_by_team[remPl.team].remove(remPl)
-                        if self._qb_wr_te_stack or self._qb_te_stack or self._qb_wr_stack:
-                            if remPl.positions[0] == 'QB':
-                                qbs.remove(remPl)
-                            elif remPl.positions[0] == 'WR' or remPl.positions[0] == 'TE':
-                                receivers_by_team[remPl.team].remove(remPl)
-                        if self._rb_d_stack:
-                            if remPl.positions[0] == 'D' or remPl.positions[0] == 'DST':
-                                defenses.remove(remPl)
-                            elif remPl.positions[0] == 'RB':
-                                rbs_by_team[remPl.team].remove(remPl)
-                        players[players.index(remPl)].fppg = -1000.0
-                        players[players.index(remPl)].deviated_fppg = -1000.0
+                previous_lineup_points = lineup_points
+                # players who reached max exposure can't be selected anymore
+                for remPl in removePlayers:
+                    solver.set_bounds(index[remPl], 0, 0)
+                    available[index[remPl]] = False
 
                 if self._randomness:
-                    current_max_points = sum(player.deviated_fppg for player in lineup_players) - 0.01
+                    current_max_points = sum(run.deviated_points[i] for i in selected) - 0.01
                 counter += 1
             else:
-                return ret_lineups
+                return
                 #raise LineupOptimizerException("Can't generate lineups")
-        self._lineup = locked_players
-        return ret_lineups
-
-    def fanduel_football_sort_lineup(self, lineup):
-        sortedLineup = [Player] * self._settings.get_total_players()
-        rb_count = 0
-        wr_count = 0
-
-        new_lineup = deepcopy(lineup)
-        for player in new_lineup.players:
-            if player.positions[0] == 'QB':
-                sortedLineup[0] = player
-            elif player.positions[0] == 'RB':
-                sortedLineup[1 + rb_count] = player;
-                rb_count = rb_count + 1
-            elif player.positions[0] == 'WR':
-                sortedLineup[3 + wr_count] = player
-                wr_count = wr_count + 1
-            elif player.positions[0] == 'TE':
-                sortedLineup[6] = player
-            elif player.positions[0] == 'K':
-                sortedLineup[7] = player
-            elif player.positions[0] == 'D':
-                sortedLineup[8] = player
-
-        return Lineup(sortedLineup)
-
-    def fanduel_baseball_sort_lineup(self, lineup):
-        sortedLineup = [Player] * self._settings.get_total_players()
-        of_count = 0
-        new_lineup = deepcopy(lineup)
-        for player in new_lineup.players:
-            if 'P' in player.positions:
-                sortedLineup[0] = player
-            elif 'C' in player.positions:
-                sortedLineup[1] = player;
-            elif '1B' in player.positions:
-                sortedLineup[2] = player
-            elif '2B' in player.positions:
-                sortedLineup[3] = player
-            elif '3B' in player.positions:
-                sortedLineup[4] = player
-            elif 'SS' in player.positions:
-                sortedLineup[5] = player
-            elif 'OF' in player.positions:
-                sortedLineup[6 + of_count] = player
-                of_count = of_count + 1
-
-        return Lineup(sortedLineup)
-
-    def fanduel_basketball_sort_lineup(self, lineup):
-        sortedLineup = [Player] * self._settings.get_total_players()
-        pg_count = 0
-        sg_count = 0
-        sf_count = 0
-        pf_count = 0
-
-        new_lineup = deepcopy(lineup)
-        for player in new_lineup.players:
-            if 'PG' in player.positions:
-                sortedLineup[0 + pg_count] = player
-                pg_count = pg_count + 1
-            elif 'SG' in player.positions:
-                sortedLineup[2 + sg_count] = player;
-                sg_count = sg_count + 1
-            elif 'SF' in player.positions:
-                sortedLineup[4 + sf_count] = player
-                sf_count = sf_count + 1
-            elif 'PF' in player.positions:
-                sortedLineup[6 + pf_count] = player
-                pf_count = pf_count + 1
-            elif 'C' in player.positions:
-                sortedLineup[8] = player
-
-        return Lineup(sortedLineup)
-
-    def draftkings_football_sort_lineup(self, lineup):
-        sortedLineup = [Player] * self._settings.get_total_players()
-        rb_count = 0
-        wr_count = 0
-        te_count = 0
-        newLineup = deepcopy(lineup)
-
-        for player in newLineup.players:
-            if player.positions[0] == 'QB':
-                sortedLineup[0] = player
-            elif player.positions[0] == 'RB':
-                if rb_count <= 1:
-                    sortedLineup[1 + rb_count] = player;
-                else:
-                    sortedLineup[7] = player;
-                rb_count = rb_count + 1
-            elif player.positions[0] == 'WR':
-                if wr_count <= 2:
-                    sortedLineup[3 + wr_count] = player
-                else:
-                    sortedLineup[7] = player
-                wr_count = wr_count + 1
-            elif player.positions[0] == 'TE':
-                if te_count < 1:
-                    sortedLineup[6] = player
-                else:
-                    sortedLineup[7] = player
-                te_count = te_count + 1
-            elif player.positions[0] == 'DST':
-                sortedLineup[8] = player
-
-        sortedLineup[1].provider_position = 'RB'
-        sortedLineup[2].provider_position = 'RB'
-        sortedLineup[3].provider_position = 'WR'
-        sortedLineup[4].provider_position = 'WR'
-        sortedLineup[5].provider_position = 'WR'
-        sortedLineup[6].provider_position = 'TE'
-        sortedLineup[7].provider_position = 'FLEX'
-
-        return Lineup(sortedLineup)
-
-    def draftkings_baseball_sort_lineup(self, lineup):
-        sortedLineup = [Player] * self._settings.get_total_players()
-        positions = {'C': 1, '1B': 1, '2B': 1, '3B': 1, 'SS': 1, 'OF': 3}
-        current_count = {'C': [], '1B': [], '2B': [], '3B': [], 'SS': [], 'OF': []}
-        ignore_positions = []
-
-        p_count = 0
-        of_count = 0
-
-        new_lineup = deepcopy(lineup)
-        for player in new_lineup.players:
-            if 'P' in player.positions:
-                sortedLineup[0 + p_count] = player
-                p_count = p_count + 1
-                continue
-            if 'C' in player.positions:
-                if len(player.positions) == 1:
-                    sortedLineup[2] = player
-                    positions['C'] = 0
-                    current_count['C'] = []
-                    ignore_positions.append('C')
-                    continue
-                if 'C' not in ignore_positions:
-                    current_count['C'].append(player)
-            if '1B' in player.positions:
-                if len(player.positions) == 1:
-                    sortedLineup[3] = player
-                    positions['1B'] = 0
-                    current_count['1B'] = []
-                    ignore_positions.append('1B')
-                    continue
-                if '1B' not in ignore_positions:
-                    current_count['1B'].append(player)
-            if '2B' in player.positions:
-                if len(player.positions) == 1:
-                    sortedLineup[4] = player
-                    positions['2B'] = 0
-                    current_count['2B'] = []
-                    ignore_positions.append('2B')
-                    continue
-                if '2B' not in ignore_positions:
-                    current_count['2B'].append(player)
-            if '3B' in player.positions:
-                if len(player.positions) == 1:
-                    sortedLineup[5] = player
-                    positions['3B'] = 0
-                    current_count['3B'] = []
-                    ignore_positions.append('3B')
-                    continue
-                if '3B' not in ignore_positions:
-                    current_count['3B'].append(player)
-            if 'SS' in player.positions:
-                if len(player.positions) == 1:
-                    sortedLineup[6] = player
-                    positions['SS'] = 0
-                    current_count['SS'] = []
-                    ignore_positions.append('SS')
-                    continue
-                if 'SS' not in ignore_positions:
-                    current_count['SS'].append(player)
-            if 'OF' in player.positions:
-                if len(player.positions) == 1:
-                    sortedLineup[7 + of_count] = player
-                    of_count = of_count + 1
-                    positions['OF'] = positions['OF'] - 1
-                    if positions['OF'] <= 0:
-                        current_count['OF'] = []
-                        ignore_positions.append('OF')
-                    continue
-                if 'OF' not in ignore_positions:
-                    current_count['OF'].append(player)
-
-        no_update = 0
-        while True:
-            handled = 0
-            for position, pl in current_count.items():
-                if len(pl) == 0 or positions[position] == 0:
-                    continue
 
-                if position == 'C' and len(pl) == positions['C']:
-                    sortedLineup[2] = pl[0]
-                    positions['C'] = 0
-                    pp = pl[0]
-                    handled = handled + 1
-                    for pos in pp.positions:
-                        if current_count[pos]:
-                            ind = current_count[pos].index(pp)
-                            del current_count[pos][ind]
-                    current_count[position] = []
-                elif position == '1B' and len(pl) == positions['1B']:
-                    sortedLineup[3] = pl[0]
-                    positions['1B'] = 0
-                    pp = pl[0]
-                    handled = handled + 1
-                    for pos in pp.positions:
-                        if current_count[pos]:
-                            ind = current_count[pos].index(pp)
-                            del current_count[pos][ind]
-                    current_count[position] = []
-                elif position == '2B' and len(pl) == positions['2B']:
-                    sortedLineup[4] = pl[0]
-                    positions['2B'] = 0
-                    pp = pl[0]
-                    handled = handled + 1
-                    for pos in pp.positions:
-                        if current_count[pos]:
-                            ind = current_count[pos].index(pp)
-                            del current_count[pos][ind]
-                    current_count[position] = []
-                elif position == '3B' and len(pl) == positions['3B']:
-                    sortedLineup[5] = pl[0]
-                    positions['3B'] = 0
-                    pp = pl[0]
-                    handled = handled + 1
-                    for pos in pp.positions:
-                        if current_count[pos]:
-                            ind = current_count[pos].index(pp)
-                            del current_count[pos][ind]
-                    current_count[position] = []
-                elif position == 'SS' and len(pl) == positions['SS']:
-                    sortedLineup[6] = pl[0]
-                    positions['SS'] = 0
-                    pp = pl[0]
-                    handled = handled + 1
-                    for pos in pp.positions:
-                        if current_count[pos]:
-                            ind = current_count[pos].index(pp)
-                            del current_count[pos][ind]
-                    current_count[position] = []
-                elif position == 'OF' and len(pl) == positions['OF']:
-                    for p in pl:
-                        handled = handled + 1
-                        sortedLineup[7 + of_count] = p
-                        positions['OF'] = positions['OF'] - 1
-                        of_count = of_count + 1
-                        for pos in p.positions:
-                            if pos != 'OF':
-                                if current_count[pos]:
-                                    ind = current_count[pos].index(p)
-                                    del current_count[pos][ind]
-
-                    for p in pl:
-                        if current_count[position]:
-                            try:
-                                ind = current_count[position].index(p)
-                                del current_count[position][ind]
-                            except:
-                                nothing = True
-
-                    current_count[position] = []
-
-            done = True
-            for pos, cnt in positions.items():
-                if cnt > 0:
-                    done = False
-                    break
-            if done:
+    def _presolve_players(self, players):
+        """
+        Remove players which can't be selected to best lineups: players over budget with cheapest fill of
+        other places and players dominated by cheaper players with more points.
+        Dominance is checked only when best lineups are searched by players points.
+        :type players: List[Player]
+        :rtype: List[Player]
+        """
+        slate = self._slate
+        indices = slate.indices_of(players)
+        budget = self._max_salary or self.budget
+        # dominators from other teams can break team rules, so only players from same team are counted
+        same_team_only = bool(self._teamConstraints or self._no_batters_vs_opp_pitchers or self._qb_wr_stack or
+                              self._qb_wr_te_stack or self._qb_te_stack or self._rb_d_stack or
+                              self._no_qb_rb_k_same_team or self._no_rb_wr_te_k_same_team or
+                              self._no_def_vs_opp_players)
+        exposures = self._max_exposure is not None or any(player.max_exposure is not None for player in players)
+        # result depends only on checked players, their points and rules, so it's shared by optimizers of same slate
+        points = dict((player, get_run_points(player)) for player in players)
+        key = ('presolve', indices.tobytes(), np.array([points[player] for player in players], dtype=float).tobytes(),
+               budget, len(self._lineup), self._randomness, self._number_of_unique_players is not None, exposures,
+               bool(self._min_salary), same_team_only, self._num_of_lineups, self._max_from_one_team)
+        result = slate.get_memo(key)
+        if result is None:
+            report = PresolveReport(len(players))
+            kept = remove_over_budget_players(players, self._settings.positions, budget, len(self._lineup), report)
+            if self._randomness:
+                report.skipped[DOMINATED] = 'randomness'
+            elif self._number_of_unique_players is not None:
+                report.skipped[DOMINATED] = 'unique players'
+            elif exposures:
+                report.skipped[DOMINATED] = 'max exposure'
+            elif self._min_salary:
+                report.skipped[DOMINATED] = 'min salary'
+            else:
+                kept = remove_dominated_players(kept, self._settings.positions, self._num_of_lineups,
+                                                self._max_from_one_team, same_team_only, report, points)
+            result = (slate.indices_of(kept),
+                      [(reason, slate.indices_of(removed)) for reason, removed in report.removed.items()],
+                      dict(report.skipped))
+            slate.set_memo(key, result)
+        kept, removed, skipped = result
+        report = PresolveReport(len(players))
+        for reason, removed_indices in removed:
+            report.removed[reason] = [slate.players[i] for i in removed_indices]
+        report.skipped.update(skipped)
+        self._presolve_report = report
+        return [slate.players[i] for i in kept]
+
+    def _optimize_k_best(self, run, groups, deadline=None):
+        """
+        Enumerate best lineups in points order with Lawler-Murty partitioning of solutions space.
+        Every subproblem fixes some players in and some players out, after taking best lineup of subproblem
+        rest of its space is split into disjoint subproblems which exclude this lineup. Lineups with equal points
+        are returned in order of finding, so ties are handled without points epsilon.
+        Players who reached max exposure are removed from model and queued subproblems which selected them
+        are solved again. Every lineup spawns subproblem for every player, so time left until deadline is shared
+        by all expected subproblems.
+        :type run: OptimizationRun
+        :type groups: dict
+        :type deadline: float
+        :rtype: Iterator[Lineup]
+        """
+        players = run.players
+        solver = self._create_solver(len(players))
+        self._build_model(solver, run, groups)
+        removed = set()
+        queue = []
+        counter = count()
+
+        def solve_subproblem(fixed_in, fixed_out, num_of_solves_left):
+            if removed.intersection(fixed_in) or not self._set_time_budget(solver, deadline, num_of_solves_left):
+                return
+            for i in fixed_in:
+                solver.set_bounds(i, 1, 1)
+            for i in fixed_out:
+                solver.set_bounds(i, 0, 0)
+            selected = solver.solve()
+            for i in chain(fixed_in, fixed_out):
+                if i not in removed:
+                    solver.set_bounds(i, 0, 1)
+            if selected is not None:
+                points = fsum(run.points[i] for i in selected)
+                heappush(queue, (-points, next(counter), selected, fixed_in, fixed_out, solver.gap))
+
+        num_of_lineups = 0
+        solve_subproblem((), (), self._num_of_lineups * self._total_players)
+        while queue and num_of_lineups < self._num_of_lineups:
+            if deadline is not None and time.time() >= deadline:
+                return
+            _, _, selected, fixed_in, fixed_out, gap = heappop(queue)
+            num_of_solves_left = (self._num_of_lineups - num_of_lineups) * self._total_players
+            if removed.intersection(selected):
+                # lineup was found before its players reached max exposure
+                solve_subproblem(fixed_in, fixed_out, num_of_solves_left)
+                continue
+            lineup_players = self._lineup[:] + [players[i] for i in selected]
+            for i in run.add_lineup(selected):
+                removed.add(i)
+                solver.set_bounds(i, 0, 0)
+            try:
+                lineup = self.get_sorted_lineup(Lineup(lineup_players), run)
+            except LineupOptimizerInvalidNumberOfPlayersInPineup:
+                return
+            lineup.gap = gap
+            num_of_lineups += 1
+            yield lineup
+            # i-th subproblem keeps players selected before i-th free player and excludes him
+            free = [i for i in selected if i not in fixed_in]
+            for position, i in enumerate(free):
+                solve_subproblem(tuple(fixed_in) + tuple(free[:position]), tuple(fixed_out) + (i, ),
+                                 num_of_solves_left - position)
+
+    def _optimize_portfolio(self, run, groups, deadline=None):
+        """
+        Plan all lineups together with column generation. Candidate lineups are found by greedy passes of
+        sequential run, first of them with real points is seed of portfolio, so planned portfolio is never worse
+        than sequential lineups. When seed stops before requested number of lineups, next passes have points of
+        players lowered by prices of exposure caps, and master problem selects portfolio from all candidates,
+        so players which are rare for some positions aren't spent by first lineups.
+        :type run: OptimizationRun
+        :type groups: dict
+        :type deadline: float
+        :rtype: Iterator[Lineup]
+        """
+        players = run.players
+        planner = PortfolioPlanner(run.points, run.get_usage_caps(), self._num_of_lineups)
+        seed = None
+        for round_number in range(planner.max_rounds + 1):
+            # every pass and master problem get equal share of time left
+            pass_deadline = None
+            if deadline is not None:
+                pass_deadline = time.time() + (deadline - time.time()) / (planner.max_rounds + 2 - round_number)
+            pass_run = OptimizationRun(players, self._num_of_lineups, self._max_exposure)
+            pass_run.points = planner.get_pricing_objective()
+            # selected players of lineup are players whose number of lineups in pass was changed
+            num_of_lineups = pass_run.num_of_lineups.copy()
+            num_of_pass_lineups = 0
+            lineups = self._optimize_sequential(pass_run, groups, pass_deadline)
+            try:
+                for _ in lineups:
+                    planner.add_column(np.nonzero(pass_run.num_of_lineups != num_of_lineups)[0].tolist())
+                    num_of_lineups = pass_run.num_of_lineups.copy()
+                    num_of_pass_lineups += 1
+            finally:
+                lineups.close()
+            if seed is None:
+                seed = list(range(len(planner.columns)))
+            # pass which found all lineups keeps all caps, so next passes are not needed
+            if num_of_pass_lineups == self._num_of_lineups or not planner.update_prices(pass_run.num_of_lineups):
                 break
 
-            if handled == 0:
-                for position, pl in current_count.items():
-                    if position == 'OF' and len(pl) == 4 - of_count:
-                        pl_pos = pl[0].positions
-                        pos_tmp_cnt = len(pl_pos)
-                        same_pos = True
-                        for p in pl:
-                            if len(p.positions) != pos_tmp_cnt:
-                                same_pos = False
-                                break
-                            for pos in p.positions:
-                                if pos not in pl[0].positions:
-                                    same_pos = False
-                                    break
-                        if not same_pos:
-                            no_update = no_update + 1
-                            break
-
-                        num_added = 0
-                        for pos in pl[0].positions:
-                            pos_loc = self.get_draftkings_baseball_index(pos, p_count, of_count)
-                            if pos == 'OF':
-                                of_count = of_count + 1
-                            elif pos == 'P':
-                                p_count = p_count + 1
-                            sortedLineup[pos_loc] = pl[num_added]
-                            num_added = num_added + 1
-                            positions[pos] = positions[pos] - 1
-
-                        for pos in pl_pos:
-                            current_count[pos] = []
-
-                    if len(pl) == 2 and len(pl[0].positions) == 2 and len(pl[1].positions) == 2:
-                        equal_pos = True
-                        for pos in pl[0].positions:
-                            if pos not in pl[1].positions:
-                                equal_pos = False
-                                no_update = no_update + 1
-                                break
-
-                        if equal_pos:
-                            pl_pos = pl[0].positions
-                            pos1_loc = self.get_draftkings_baseball_index(pl_pos[0], p_count, of_count)
-                            pos2_loc = self.get_draftkings_baseball_index(pl_pos[1], p_count, of_count)
-
-                            sortedLineup[pos1_loc] = pl[0]
-                            sortedLineup[pos2_loc] = pl[1]
-                            positions[pl_pos[0]] = positions[pl_pos[0]] - 1
-                            positions[pl_pos[1]] = positions[pl_pos[1]] - 1
-                            if pl_pos == 'OF' or pl_pos == 'OF':
-                                of_count = of_count + 1
-                            if pl_pos == 'P' or pl_pos == 'P':
-                                p_count = p_count + 1
-
-                            current_count[pl_pos[0]] = []
-                            current_count[pl_pos[1]] = []
-                            break
-
-            if no_update > 5:
-                break
+        def create_master_solver(num_of_variables):
+            master = get_solver(self._solver, num_of_variables, message=self._message, threads=self._threads,
+                                general=True)
+            master.set_mip_gap(self._mip_gap)
+            if deadline is not None:
+                master.set_time_limit(max(deadline - time.time(), 1.0))
+            return master
+
+        for column_index in planner.plan(create_master_solver, seed):
+            selected = planner.columns[column_index]
+            lineup_players = self._lineup[:] + [players[i] for i in selected]
+            run.add_lineup(selected)
+            try:
+                lineup = self.get_sorted_lineup(Lineup(lineup_players), run)
+            except LineupOptimizerInvalidNumberOfPlayersInPineup:
+                return
+            yield lineup
+
+    def _optimize_parallel(self, run, groups, deadline=None):
+        """
+        Generate randomized lineups in pool of worker processes, every worker solves model with independently
+        deviated points of players. Max exposure and number of unique players are checked for all taken lineups,
+        players who reached max exposure are excluded from next tasks.
+        :type run: OptimizationRun
+        :type groups: dict
+        :type deadline: float
+        :rtype: Iterator[Lineup]
+        """
+        players = run.players
+        max_common_players = None
+        if self._number_of_unique_players is not None:
+            max_common_players = self._total_players - self._number_of_unique_players
+        coordinator = RandomizedLineupsCoordinator(self._solver, run.points,
+                                                   self._get_model_rows(players, groups), self._parallel_workers,
+                                                   self._mip_gap, max_common_players)
+        lineups = coordinator.iter_lineups(self._num_of_lineups, self._min_deviation, self._max_deviation, deadline)
+        try:
+            for selected, gap in lineups:
+                lineup_players = self._lineup[:] + [players[i] for i in selected]
+                for i in run.add_lineup(selected):
+                    coordinator.remove(i)
+                try:
+                    lineup = self.get_sorted_lineup(Lineup(lineup_players), run)
+                except LineupOptimizerInvalidNumberOfPlayersInPineup:
+                    return
+                lineup.gap = gap
+                yield lineup
+        finally:
+            lineups.close()
 
-        sortedLineup[2].provider_position = 'C'
-        sortedLineup[3].provider_position = '1B'
-        sortedLineup[4].provider_position = '2B'
-        sortedLineup[5].provider_position = '3B'
-        sortedLineup[6].provider_position = 'SS'
-        sortedLineup[7].provider_position = 'OF'
-        sortedLineup[8].provider_position = 'OF'
-        sortedLineup[9].provider_position = 'OF'
-
-        return Lineup(sortedLineup)
-
-    def get_draftkings_baseball_index(self, position, p_count, of_count):
-        if position == 'P':
-            return 0 + p_count
-        if position == 'C':
-            return 2
-        if position == '1B':
-            return 3
-        if position == '2B':
-            return 4
-        if position == '3B':
-            return 5
-        if position == 'SS':
-            return 6
-        if position == 'OF':
-            return 7 + of_count
-
-    def draftkings_basketball_sort_lineup(self, lineup):
-        sortedLineup = [Player] * self._settings.get_total_players()
-        current_count = {'PG': [], 'SG': [], 'SF': [], 'PF': [], 'C': [], 'G': [], 'F': [], 'FLEX': []}
-        positions = {'PG': 1, 'SG': 1, 'SF': 1, 'PF': 1, 'C': 1, 'G': 1, 'F': 1, 'FLEX': 1}
-        pg_count = 0
-        sg_count = 0
-        sf_count = 0
-        pf_count = 0
-        c_count = 0
-        g_count = 0
-        f_count = 0
-        flex_count = 0
-
-        new_lineup = deepcopy(lineup)
-        for player in new_lineup.players:
-            if 'PG' in player.positions:
-                if len(player.positions) == 1 and pg_count == 0:
-                    sortedLineup[0] = player
-                    positions['PG'] = 0
-                    pg_count = pg_count + 1
-                    continue
-                elif pg_count == 0:
-                    current_count['PG'].append(player)
-            if 'SG' in player.positions:
-                if len(player.positions) == 1 and sg_count == 0:
-                    sortedLineup[1] = player
-                    positions['SG'] = 0
-                    sg_count = sg_count + 1
-                    continue
-                elif sg_count == 0:
-                    current_count['SG'].append(player)
-            if 'SF' in player.positions:
-                if len(player.positions) == 1 and sf_count == 0:
-                    sortedLineup[2] = player
-                    positions['SF'] = 0
-                    sf_count = sf_count + 1
-                    continue
-                elif sf_count == 0:
-                    current_count['SF'].append(player)
-            if 'PF' in player.positions:
-                if len(player.positions) == 1 and pf_count == 0:
-                    sortedLineup[3] = player
-                    positions['PF'] = 0
-                    pf_count = pf_count + 1
+    def _create_solver(self, num_of_variables):
+        """
+        :type num_of_variables: int
+        :rtype: Solver
+        """
+        solver = get_solver(self._solver, num_of_variables, message=self._message, threads=self._threads)
+        solver.set_mip_gap(self._mip_gap)
+        return solver
+
+    def _set_time_budget(self, solver, deadline, num_of_solves_left):
+        """
+        Give next solve equal share of time left until deadline, unused time goes back to next solves.
+        Return False if deadline has passed.
+        :type solver: Solver
+        :type deadline: float
+        :type num_of_solves_left: int
+        :rtype: bool
+        """
+        if deadline is None:
+            return True
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+        solver.set_time_limit(remaining / max(num_of_solves_left, 1))
+        return True
+
+    def _repair_lineup(self, run, lineup, available, groups, num_of_swaps):
+        """
+        Cheap repair of previous lineup for using it as warm start of next solve.
+        Players removed by max exposure and lowest scored players which can be swapped are replaced by best unused
+        players with same positions and team, which don't increase points of lineup and keep it under the budget.
+        Candidates for swap are taken from slate index by team and positions of replaced player.
+        Return None if lineup can't be repaired.
+        :type run: OptimizationRun
+        :type lineup: List[int]
+        :type available: np.ndarray
+        :type groups: dict
+        :type num_of_swaps: int
+        :rtype: List[int]
+        """
+        players = run.players
+        points = run.points
+        model_indices = groups['model_indices']
+        candidates_table = self._slate.team_position_tuples
+        used = set(lineup)
+        repaired = [i for i in lineup if available[i]]
+        budget = (self._max_salary or self.budget) - sum(players[i].salary for i in repaired)
+        to_replace = [i for i in lineup if not available[i]]
+        swappable = sorted(repaired, key=lambda i: points[i])
+        num_of_swaps = max(num_of_swaps - len(to_replace), 0)
+        while to_replace or num_of_swaps:
+            if to_replace:
+                old_index = to_replace.pop()
+            elif swappable:
+                old_index = swappable.pop(0)
+                budget += players[old_index].salary
+            else:
+                return None
+            old_player = players[old_index]
+            candidates = model_indices[candidates_table[(old_player.team, tuple(old_player.positions))]]
+            best_index = None
+            for i in candidates[candidates >= 0]:
+                if i in used or not available[i]:
                     continue
-                elif pf_count == 0:
-                    current_count['PF'].append(player)
-            if 'C' in player.positions:
-                if len(player.positions) == 1 and c_count == 0:
-                    positions['C'] = 0
-                    sortedLineup[4] = player
-                    c_count = c_count + 1
+                if points[i] > points[old_index] or players[i].salary > budget:
                     continue
-                elif c_count == 0:
-                    current_count['C'].append(player)
+                if best_index is None or points[i] > points[best_index]:
+                    best_index = int(i)
+            if best_index is None:
+                if not available[old_index]:
+                    return None
+                # this player can't be swapped, try next one
+                budget -= old_player.salary
+                continue
+            if available[old_index]:
+                repaired.remove(old_index)
+                num_of_swaps -= 1
+            repaired.append(best_index)
+            used.add(best_index)
+            budget -= players[best_index].salary
+        return repaired
+
+    def _get_groups(self, model_indices):
+        """
+        Return model indices of players groups used by position, team and stacking constraints.
+        :type model_indices: np.ndarray
+        :rtype: dict
+        """
+        def to_model(indices):
+            indices = model_indices[indices]
+            return indices[indices >= 0]
+
+        groups = {'model_indices': model_indices}
+        for name, group in self._get_pool_groups().items():
+            if isinstance(group, dict):
+                groups[name] = dict((key, to_model(indices)) for key, indices in group.items())
+            elif name == 'qbs' and self._no_qb_rb_k_same_team and \
+                    not (self._qb_wr_te_stack or self._qb_wr_stack or self._qb_te_stack):
+                # without qb stacks only first qb is checked
+                groups[name] = to_model(group)[:1]
+            else:
+                groups[name] = to_model(group)
+        return groups
 
-            if 'SF' in player.positions or 'PF' in player.positions:
-                current_count['F'].append(player)
-            if 'PG' in player.positions or 'SG' in player.positions:
-                current_count['G'].append(player)
+    def _get_pool_groups(self):
+        """
+        Return pool indices of players groups used by position, team and stacking constraints.
+        Groups are taken from lookup tables of slate index, so players pool isn't scanned for every rule,
+        and they are kept in memo of slate for optimizers with same rules.
+        :rtype: dict
+        """
+        slate = self._slate
+        positions_keys = tuple(chain(self._positions, (position for position, _ in self._get_cover_table())))
+        key = ('groups', positions_keys, self._sport, self._no_batters_vs_opp_pitchers, self._qb_wr_te_stack,
+               self._qb_wr_stack, self._qb_te_stack, self._rb_d_stack, self._no_def_vs_opp_players,
+               self._no_qb_rb_k_same_team, self._no_rb_wr_te_k_same_team)
+        groups = slate.get_memo(key)
+        if groups is not None:
+            return groups
+        no_players = np.zeros(0, dtype=int)
+
+        def select(table, keys, mask=None):
+            # pool indices of players from groups of passed keys, optionally filtered by mask of pool
+            indices = [table[key] for key in keys if key in table]
+            indices = np.unique(np.concatenate(indices)) if indices else no_players
+            if mask is not None:
+                indices = indices[mask[indices]]
+            return indices
+
+        def select_by_team(mask):
+            return dict((team, select(slate.teams, (team, ), mask)) for team in slate.teams)
+
+        positions = dict((position, select(slate.positions, position)) for position in positions_keys)
+        groups = {
+            'positions': positions,
+            'teams': select_by_team(None),
+            'pitchers': no_players,
+            'batters_by_team': {},
+            'qbs': no_players,
+            'receivers_by_team': {},
+            'defenses': no_players,
+            'rbs_by_team': {},
+            'opp_players': {},
+            'rb_k': {},
+            'tight_ends': no_players,
+            'rb_wr_k': {},
+        }
 
-            current_count['FLEX'].append(player)
+        # MLB no batters vs opp pitchers
+        if self._sport == Sport.BASEBALL or self._no_batters_vs_opp_pitchers:
+            groups['pitchers'] = select(slate.primary_positions, ('P', ))
+            groups['batters_by_team'] = select_by_team(~slate.mask(slate.primary_positions, ('P', )))
 
-        handled_counter = 0
+        # nfl stacking
+        not_qbs = ~slate.mask(slate.primary_positions, ('QB', ))
+        if self._qb_wr_te_stack or self._qb_wr_stack or self._qb_te_stack:
+            groups['qbs'] = select(slate.primary_positions, ('QB', ))
+            if self._qb_wr_te_stack:
+                receivers = ('WR', 'TE')
+            elif self._qb_wr_stack:
+                receivers = ('WR', )
+            else:
+                receivers = ('TE', )
+            groups['receivers_by_team'] = select_by_team(slate.mask(slate.positions, receivers) & not_qbs)
 
-        while True:
-            handled = 0
-            for position, pl in current_count.items():
-                if len(pl) == 0 or positions[position] == 0:
-                    positions[position] = 0
-                    current_count[position] = []
-                    continue
+        if self._rb_d_stack or self._no_def_vs_opp_players:
+            groups['defenses'] = select(slate.primary_positions, ('D', 'DST'))
+            not_defenses = ~slate.mask(slate.primary_positions, ('D', 'DST'))
+            if self._rb_d_stack:
+                groups['rbs_by_team'] = select_by_team(slate.mask(slate.positions, ('RB', )) & not_defenses)
+            if self._no_def_vs_opp_players:
+                groups['opp_players'] = select_by_team(not_defenses)
 
-                #for pos in positions:
-
-                #if positions[pos] > 0 and pos != 'FLEX' and len(current_count[pos]) > 0:
-                #        test2 = [o.id for o in current_count[pos]]
-                #        filtered = [i for i in current_count['FLEX'] if i in current_count[pos]]
-                #        test = ""
-
-                if position == 'PG' and len(pl) == 1:
-                    pp = pl[0]
-                    if pg_count == 0:
-                        sortedLineup[0] = pl[0]
-                        pg_count = pg_count + 1
-                        handled = handled + 1
-
-                        for pos in pp.positions:
-                            if pp in current_count[pos]:
-                                ind = current_count[pos].index(pp)
-                                del current_count[pos][ind]
-
-                        if ('SF' in pp.positions or 'PF' in pp.positions) and pp in current_count['F']:
-                            ind = current_count['F'].index(pp)
-                            del current_count['F'][ind]
-
-                        positions[position] = 0
-                        current_count['PG'] = []
-                        ind = current_count['G'].index(pp)
-                        del current_count['G'][ind]
-                        if pp in current_count['FLEX']:
-                            ind = current_count['FLEX'].index(pp)
-                            del current_count['FLEX'][ind]
-                elif position == 'SG' and len(pl) == 1:
-                    pp = pl[0]
-                    if sg_count == 0:
-                        sortedLineup[1] = pl[0]
-                        sg_count = sg_count + 1
-                        handled = handled + 1
-                        for pos in pp.positions:
-                            if pp in current_count[pos]:
-                                ind = current_count[pos].index(pp)
-                                del current_count[pos][ind]
-
-                        if ('SF' in pp.positions or 'PF' in pp.positions) and pp in current_count['F']:
-                            ind = current_count['F'].index(pp)
-                            del current_count['F'][ind]
-
-                        positions[position] = 0
-                        current_count['SG'] = []
-                        ind = current_count['G'].index(pp)
-                        del current_count['G'][ind]
-                        if pp in current_count['FLEX']:
-                            ind = current_count['FLEX'].index(pp)
-                            del current_count['FLEX'][ind]
-                elif position == 'SF' and len(pl) == 1:
-                    pp = pl[0]
-                    if sf_count == 0:
-                        sortedLineup[2] = pl[0]
-                        sf_count = sf_count + 1
-                        handled = handled + 1
-                        for pos in pp.positions:
-                            if pp in current_count[pos]:
-                                ind = current_count[pos].index(pp)
-                                del current_count[pos][ind]
-
-                        if ('PG' in pp.positions or 'SG' in pp.positions) and pp in current_count['G']:
-                            ind = current_count['G'].index(pp)
-                            del current_count['G'][ind]
-
-                        positions[position] = 0
-                        current_count['SF'] = []
-                        ind = current_count['F'].index(pp)
-                        del current_count['F'][ind]
-                        if pp in current_count['FLEX']:
-                            ind = current_count['FLEX'].index(pp)
-                            del current_count['FLEX'][ind]
-                elif position == 'PF' and len(pl) == 1:
-                    pp = pl[0]
-                    if pf_count == 0:
-                        sortedLineup[3] = pl[0]
-                        pf_count = pf_count + 1
-                        handled = handled + 1
-                        for pos in pp.positions:
-                            if pp in current_count[pos]:
-                                ind = current_count[pos].index(pp)
-                                del current_count[pos][ind]
-
-                        if ('PG' in pp.positions or 'SG' in pp.positions) and current_count['G']:
-                            ind = current_count['G'].index(pp)
-                            del current_count['G'][ind]
-
-                        positions[position] = 0
-                        current_count['PF'] = []
-                        ind = current_count['F'].index(pp)
-                        del current_count['F'][ind]
-                        if pp in current_count['FLEX']:
-                            ind = current_count['FLEX'].index(pp)
-                            del current_count['FLEX'][ind]
-                elif position == 'C' and len(pl) == 1:
-                    pp = pl[0]
-                    if c_count == 0:
-                        sortedLineup[4] = pl[0]
-                        c_count = c_count + 1
-                        handled = handled + 1
-                        for pos in pp.positions:
-                            if pp in current_count[pos]:
-                                ind = current_count[pos].index(pp)
-                                del current_count[pos][ind]
-
-                        if ('SF' in pp.positions or 'PF' in pp.positions) and pp in current_count['F']:
-                            ind = current_count['F'].index(pp)
-                            del current_count['F'][ind]
-
-                        if ('PG' in pp.positions or 'SG' in pp.positions) and pp in current_count['G']:
-                            ind = current_count['G'].index(pp)
-                            del current_count['G'][ind]
-
-                        positions[position] = 0
-                        current_count['C'] = []
-                        if pp in current_count['FLEX']:
-                            ind = current_count['FLEX'].index(pp)
-                            del current_count['FLEX'][ind]
-                elif position == 'G' and len(pl) == 1:
-                    pp = pl[0]
-                    if g_count == 0:
-                        sortedLineup[5] = pl[0]
-                        g_count = g_count + 1
-                        handled = handled + 1
-                        for pos in pp.positions:
-                            if pp in current_count[pos]:
-                                ind = current_count[pos].index(pp)
-                                del current_count[pos][ind]
-
-                        if ('SF' in pp.positions or 'PF' in pp.positions) and pp in current_count['F']:
-                            ind = current_count['F'].index(pp)
-                            del current_count['F'][ind]
-
-                        positions[position] = 0
-                        current_count['G'] = []
-                        if pp in current_count['FLEX']:
-                            ind = current_count['FLEX'].index(pp)
-                            del current_count['FLEX'][ind]
-                elif position == 'F' and len(pl) == 1:
-                    pp = pl[0]
-                    if f_count == 0:
-                        sortedLineup[6] = pl[0]
-                        f_count = f_count + 1
-                        handled = handled + 1
-                        for pos in pp.positions:
-                            if pp in current_count[pos]:
-                                ind = current_count[pos].index(pp)
-                                del current_count[pos][ind]
-
-                        if ('PG' in pp.positions or 'SG' in pp.positions) and pp in current_count['G']:
-                            ind = current_count['G'].index(pp)
-                            del current_count['G'][ind]
-
-                        positions[position] = 0
-                        if pp in current_count['FLEX']:
-                            ind = current_count['FLEX'].index(pp)
-                            del current_count['FLEX'][ind]
-                        current_count['F'] = []
-                elif position == 'FLEX' and len(pl) == 1:
-                    pp = pl[0]
-                    if flex_count == 0:
-                        sortedLineup[7] = pl[0]
-                        flex_count = flex_count + 1
-                        handled = handled + 1
-                        for pos in pp.positions:
-                            if pp in current_count[pos]:
-                                ind = current_count[pos].index(pp)
-                                del current_count[pos][ind]
-
-                        positions[position] = 0
-                        current_count['FLEX'] = []
-
-            if pg_count == 1 and sg_count == 1 and sf_count == 1 and pf_count == 1 and g_count == 1 and f_count == 1 and flex_count == 1:
-                break
+        if self._no_qb_rb_k_same_team:
+            if not len(groups['qbs']):
+                groups['qbs'] = select(slate.primary_positions, ('QB', ))
+            groups['rb_k'] = select_by_team(slate.mask(slate.positions, ('RB', 'K')) & not_qbs)
+
+        if self._no_rb_wr_te_k_same_team:
+            groups['tight_ends'] = select(slate.primary_positions, ('TE', ))
+            not_tight_ends = ~slate.mask(slate.primary_positions, ('TE', ))
+            groups['rb_wr_k'] = select_by_team(slate.mask(slate.positions, ('RB', 'WR', 'K')) & not_tight_ends)
+        slate.set_memo(key, groups)
+        return groups
+
+    def _get_cover_table(self):
+        """
+        Return cover table of settings for sites where lineup players can have several positions,
+        rows of positions and their pairs don't guarantee that these players can fill all places.
+        :rtype: Tuple[Tuple[Tuple[str], int]]
+        """
+        if self._site == Site.DRAFTKINGS and (self._sport == Sport.BASEBALL or self._sport == Sport.BASKETBALL):
+            return get_cover_table(self._settings)
+        return ()
+
+    def _get_coefficients(self, index, players, coefficient=1):
+        """
+        Return constraint coefficients for passed players, players which aren't in model are skipped.
+        :type index: dict[Player, int]
+        :type players: List[Player]
+        :rtype: dict[int, float]
+        """
+        return dict((index[player], coefficient) for player in players if player in index)
 
-            if len(current_count['FLEX']) > 0 and positions['FLEX'] != 0:
-                for pl in current_count['FLEX']:
-                    if len(pl.positions) == 1 and pl.positions[0] == 'C':
-                        sortedLineup[7] = pl[0]
-                        positions['FLEX'] = 0
-                        current_count['FLEX'] = []
-                        flex_count = flex_count + 1
-                        handled = handled + 1
-                        break
-
-
-            if handled == 0:
-                handled_counter = handled_counter + 1
-                if handled_counter > 3:
-                    raise LineupOptimizerInvalidNumberOfPlayersInPineup("Invalid lineup")
+    def _build_model(self, solver, run, groups, rules=True):
+        """
+        Add objective, budget, position, team and stacking constraints to solver model.
+        Rows are assembled from integer indices of players into sparse matrix and added to solver in bulk.
+        Rows of team, opponent and stacking rules are skipped if rules is False, they are added lazily then.
+        :type solver: Solver
+        :type run: OptimizationRun
+        :type groups: dict
+        :type rules: bool
+        """
+        # Goal => maximaze sum of fps
+        solver.set_objective(run.points)
+        solver.add_constraints(self._get_model_rows(run.players, groups, rules))
+
+    def _get_model_rows(self, players, groups, rules=True):
+        """
+        Return sparse matrix of budget, position, team and stacking constraints.
+        :type players: List[Player]
+        :type groups: dict
+        :type rules: bool
+        :rtype: ConstraintMatrix
+        """
+        rows = ConstraintMatrix()
+        all_players = np.arange(len(players))
+
+        # budget constraint
+        salaries = np.array([player.salary for player in players], dtype=float)
+        rows.add_row(all_players, salaries, '<=', self._max_salary or self.budget)
+        if self._min_salary:
+            rows.add_row(all_players, salaries, '>=', self._min_salary)
+
+        rows.add_row(all_players, 1, '==', self._total_players)
+
+        # set position constraints. Loop through all positions which are set in optimizer and add all players,
+        # which have that position in a list of their positions, to constraint
+        positions = groups['positions']
+        for position, places in self._positions.items():
+            position_players = positions[position]
+            if self._sport == Sport.BASEBALL:
+                if position[0] != 'P' and self._site != Site.FANDUEL:
+                    rows.add_row(position_players, 1, '>=', places.min)
                 else:
-                    sortedPositions = sorted((current_count[key], key) for key in current_count)
-                    counter = 0
-                    found = 0
-                    while counter < 2:
-                        if found == 1:
-                            handled_counter = 0
-                            break
-
-                        for pl, position in sortedPositions:
-                            if positions[position] == 0 or position == 'FLEX' or (counter == 0 and (position == 'G' or position == 'F')):
-                                continue
-                            else:
-
-                                if len(current_count[position]) == 0:
-                                    raise LineupOptimizerInvalidNumberOfPlayersInPineup("Invalid lineup")
-
-                                found = 1
-                                if position == 'PG':
-                                    pp = pl[0]
-                                    if pg_count == 0:
-                                        sortedLineup[0] = pl[0]
-                                        pg_count = pg_count + 1
-
-                                        for pos in pp.positions:
-                                            if pp in current_count[pos]:
-                                                ind = current_count[pos].index(pp)
-                                                del current_count[pos][ind]
-
-                                        if ('SF' in pp.positions or 'PF' in pp.positions) and pp in current_count['F']:
-                                            ind = current_count['F'].index(pp)
-                                            del current_count['F'][ind]
-
-                                        positions[position] = 0
-                                        current_count['PG'] = []
-                                        ind = current_count['G'].index(pp)
-                                        del current_count['G'][ind]
-                                        if pp in current_count['FLEX']:
-                                            ind = current_count['FLEX'].index(pp)
-                                            del current_count['FLEX'][ind]
-                                elif position == 'SG':
-                                    pp = pl[0]
-                                    if sg_count == 0:
-                                        sortedLineup[1] = pl[0]
-                                        sg_count = sg_count + 1
-                                        for pos in pp.positions:
-                                            if pp in current_count[pos]:
-                                                ind = current_count[pos].index(pp)
-                                                del current_count[pos][ind]
-
-                                        if ('SF' in pp.positions or 'PF' in pp.positions) and pp in current_count['F']:
-                                            ind = current_count['F'].index(pp)
-                                            del current_count['F'][ind]
-
-                                        positions[position] = 0
-                                        current_count['SG'] = []
-                                        ind = current_count['G'].index(pp)
-                                        del current_count['G'][ind]
-                                        if pp in current_count['FLEX']:
-                                            ind = current_count['FLEX'].index(pp)
-                                            del current_count['FLEX'][ind]
-                                elif position == 'SF':
-                                    pp = pl[0]
-                                    if sf_count == 0:
-                                        sortedLineup[2] = pl[0]
-                                        sf_count = sf_count + 1
-                                        for pos in pp.positions:
-                                            if pp in current_count[pos]:
-                                                ind = current_count[pos].index(pp)
-                                                del current_count[pos][ind]
-
-                                        if ('PG' in pp.positions or 'SG' in pp.positions) and pp in current_count['G']:
-                                            ind = current_count['G'].index(pp)
-                                            del current_count['G'][ind]
-
-                                        positions[position] = 0
-                                        current_count['SF'] = []
-                                        ind = current_count['F'].index(pp)
-                                        del current_count['F'][ind]
-                                        if pp in current_count['FLEX']:
-                                            ind = current_count['FLEX'].index(pp)
-                                            del current_count['FLEX'][ind]
-                                elif position == 'PF':
-                                    pp = pl[0]
-                                    if pf_count == 0:
-                                        sortedLineup[3] = pl[0]
-                                        pf_count = pf_count + 1
-                                        for pos in pp.positions:
-                                            if pp in current_count[pos]:
-                                                ind = current_count[pos].index(pp)
-                                                del current_count[pos][ind]
-
-                                        if ('PG' in pp.positions or 'SG' in pp.positions) and pp in current_count['G']:
-                                            ind = current_count['G'].index(pp)
-                                            del current_count['G'][ind]
-
-                                        positions[position] = 0
-                                        current_count['PF'] = []
-                                        ind = current_count['F'].index(pp)
-                                        del current_count['F'][ind]
-                                        if pp in current_count['FLEX']:
-                                            ind = current_count['FLEX'].index(pp)
-                                            del current_count['FLEX'][ind]
-                                elif position == 'C':
-                                    pp = pl[0]
-                                    if c_count == 0:
-                                        sortedLineup[4] = pl[0]
-                                        c_count = c_count + 1
-                                        for pos in pp.positions:
-                                            if pp in current_count[pos]:
-                                                ind = current_count[pos].index(pp)
-                                                del current_count[pos][ind]
-
-                                        if ('PG' in pp.positions or 'SG' in pp.positions) and pp in current_count['G']:
-                                            ind = current_count['G'].index(pp)
-                                            del current_count['G'][ind]
-
-                                        if ('SF' in pp.positions or 'PF' in pp.positions) and pp in current_count['F']:
-                                            ind = current_count['F'].index(pp)
-                                            del current_count['F'][ind]
-
-                                        positions[position] = 0
-                                        current_count['C'] = []
-                                        if pp in current_count['FLEX']:
-                                            ind = current_count['FLEX'].index(pp)
-                                            del current_count['FLEX'][ind]
-                                elif position == 'G':
-                                    pp = pl[0]
-                                    if g_count == 0:
-                                        sortedLineup[5] = pl[0]
-                                        g_count = g_count + 1
-                                        for pos in pp.positions:
-                                            if pp in current_count[pos]:
-                                                ind = current_count[pos].index(pp)
-                                                del current_count[pos][ind]
-
-                                        if ('SF' in pp.positions or 'PF' in pp.positions) and pp in current_count['F']:
-                                            ind = current_count['F'].index(pp)
-                                            del current_count['F'][ind]
-
-                                        positions[position] = 0
-                                        current_count['G'] = []
-                                        if pp in current_count['FLEX']:
-                                            ind = current_count['FLEX'].index(pp)
-                                            del current_count['FLEX'][ind]
-                                elif position == 'F':
-                                    pp = pl[0]
-                                    if f_count == 0:
-                                        sortedLineup[6] = pl[0]
-                                        f_count = f_count + 1
-                                        for pos in pp.positions:
-                                            if pp in current_count[pos]:
-                                                ind = current_count[pos].index(pp)
-                                                del current_count[pos][ind]
-
-                                        if ('PG' in pp.positions or 'SG' in pp.positions) and pp in current_count['G']:
-                                            ind = current_count['G'].index(pp)
-                                            del current_count['G'][ind]
-
-                                        positions[position] = 0
-                                        current_count['F'] = []
-                                        if pp in current_count['FLEX']:
-                                            ind = current_count['FLEX'].index(pp)
-                                            del current_count['FLEX'][ind]
-
-                                if found == 1:
-                                    break
-
-                        counter = counter + 1
+                    rows.add_row(position_players, 1, '==', places.min)
+            elif self._sport == Sport.FOOTBALL or self._sport == Sport.BASKETBALL:
+                if len(position) == 3:
+                    continue
 
+                if self._site != Site.FANDUEL and position[0] != 'QB' and position[0] != 'DST':
+                    rows.add_row(position_players, 1, '>=', places.min)
+                else:
+                    rows.add_row(position_players, 1, '==', places.min)
 
-            else:
-                handled_counter = 0
+        # only for cases when there are multiple positions for player (dk MLB, NBA)
+        # set constraints for all position combinations, so players of lineup always can fill its places
+        for position, min_value in self._get_cover_table():
+            if position in self._positions:
+                continue
+            min_value -= sum(1 for player in self._lineup if list_intersection(position, player.positions))
+            if min_value > 0:
+                rows.add_row(positions[position], 1, '>=', min_value)
+
+        no_players = np.zeros(0, dtype=int)
+        if self._teamConstraints is not None and self._sport == Sport.BASEBALL:
+            for key, value in self._teamConstraints.items():
+                for item in value:
+                    if item[0] == '==':
+                        rows.add_row(groups['batters_by_team'].get(key, no_players), 1, '==', item[1])
+
+        # set exact number of players from same team
+        teams = groups['teams']
+        if self._teamConstraints is not None:
+            for key, value in self._teamConstraints.items():
+                team_players = teams.get(key, no_players)
+                for item in value:
+                    if item[0] == '=':
+                        rows.add_row(team_players, 1, '==', item[1])
+                    elif item[0] == '>=' or item[0] == '<=':
+                        rows.add_row(team_players, 1, item[0], item[1])
+
+        if rules:
+            self._add_rule_rows(rows, players, groups)
+        return rows
+
+    def _get_rule_rows(self, players, groups):
+        """
+        Return sparse matrix of team, opponent and stacking rules, which can be added to model lazily.
+        :type players: List[Player]
+        :type groups: dict
+        :rtype: ConstraintMatrix
+        """
+        rows = ConstraintMatrix()
+        self._add_rule_rows(rows, players, groups)
+        return rows
 
+    def _add_rule_rows(self, rows, players, groups):
+        """
+        Add rows of max players from one team, players vs opponents and stacking rules.
+        :type rows: ConstraintMatrix
+        :type players: List[Player]
+        :type groups: dict
+        """
+        no_players = np.zeros(0, dtype=int)
+        # avoid batters from pitcher opponent team
+        if self._no_batters_vs_opp_pitchers:
+            for pitcher in groups['pitchers']:
+                # sum(batters) <= (x[pitcher] - 1) * -max_from_one_team
+                self._add_row_with_player(rows, groups['batters_by_team'].get(players[pitcher].opponent, no_players),
+                                          pitcher, self._max_from_one_team, '<=', self._max_from_one_team)
+
+        # stacks with qb
+        if self._qb_wr_te_stack or self._qb_wr_stack or self._qb_te_stack:
+            for qb in groups['qbs']:
+                self._add_row_with_player(rows, groups['receivers_by_team'].get(players[qb].team, no_players),
+                                          qb, -1, '>=', 0)
+
+        # stacks with defense
+        if self._rb_d_stack:
+            for dst in groups['defenses']:
+                self._add_row_with_player(rows, groups['rbs_by_team'].get(players[dst].team, no_players),
+                                          dst, -1, '>=', 0)
+
+        # no defense vs opp
+        if self._no_def_vs_opp_players:
+            for dst in groups['defenses']:
+                self._add_row_with_player(rows, groups['opp_players'].get(players[dst].opponent, no_players),
+                                          dst, self._max_from_one_team, '<=', self._max_from_one_team)
+
+        # no qb, rb, k, from same team
+        if self._no_qb_rb_k_same_team:
+            for qb in groups['qbs']:
+                # sum(rb_k) <= 1 + (x[qb] - 1) * (-max_from_one_team + 1)
+                self._add_row_with_player(rows, groups['rb_k'].get(players[qb].team, no_players),
+                                          qb, self._max_from_one_team - 1, '<=', self._max_from_one_team)
+
+        # no rb, wr, te, k from same team
+        if self._no_rb_wr_te_k_same_team:
+            for te in groups['tight_ends']:
+                self._add_row_with_player(rows, groups['rb_wr_k'].get(players[te].team, no_players),
+                                          te, self._max_from_one_team, '<=', self._max_from_one_team)
 
-        sortedLineup[0].provider_position = 'PG'
-        sortedLineup[1].provider_position = 'SG'
-        sortedLineup[2].provider_position = 'SF'
-        sortedLineup[3].provider_position = 'PF'
-        sortedLineup[4].provider_position = 'C'
-        sortedLineup[5].provider_position = 'G'
-        sortedLineup[6].provider_position = 'F'
-        sortedLineup[7].provider_position = 'FLEX'
+        teams = groups['teams']
+        # limit maximum number of players from each team
+        if self._max_from_one_team:
+            for team in self._available_teams:
+                rows.add_row(teams.get(team, no_players), 1, '<=', self._max_from_one_team)
 
-        return Lineup(sortedLineup)
+    def _add_row_with_player(self, rows, indices, player_index, coefficient, sense, rhs):
+        """
+        Add row of players with coefficient 1 and one player with his own coefficient.
+        :type rows: ConstraintMatrix
+        :type indices: np.ndarray
+        :type player_index: int
+        :type coefficient: float
+        :type sense: str
+        :type rhs: float
+        """
+        indices = indices[indices != player_index]
+        rows.add_row(np.append(indices, player_index), np.append(np.ones(len(indices)), coefficient), sense, rhs)
 
-    def get_sorted_lineup(self, lineup):
+    def get_sorted_lineup(self, lineup, run=None):
+        """
+        Return lineup with copies of players in order of lineup places, provider position of every player
+        is name of his place. Players are copied, so values of players in returned lineup don't change
+        when next lineups are found, copies of players in passed run get values of run.
+        :type lineup: Lineup
+        :type run: OptimizationRun
+        :rtype: Lineup
+        """
         if len(lineup.players) != self._settings.get_total_players():
             raise LineupOptimizerInvalidNumberOfPlayersInPineup("Invalid lineup")
 
-        for pl in lineup.players:
-            if pl.fppg == -1000.0:
-                raise LineupOptimizerInvalidNumberOfPlayersInPineup("Invalid lineup, negative points")
-
-        if self._site == Site.FANDUEL and self._sport == Sport.FOOTBALL:
-            return self.fanduel_football_sort_lineup(lineup)
-        elif self._site == Site.FANDUEL and self._sport == Sport.BASEBALL:
-            return self.fanduel_baseball_sort_lineup(lineup)
-        elif self._site == Site.DRAFTKINGS and self._sport == Sport.FOOTBALL:
-            return self.draftkings_football_sort_lineup(lineup)
-        elif self._site == Site.DRAFTKINGS and self._sport == Sport.BASEBALL:
-            return self.draftkings_baseball_sort_lineup(lineup)
-        elif self._site == Site.FANDUEL and self._sport == Sport.BASKETBALL:
-            return self.fanduel_basketball_sort_lineup(lineup)
-        elif self._site == Site.DRAFTKINGS and self._sport == Sport.BASKETBALL:
-            return self.draftkings_basketball_sort_lineup(lineup)
-
-        return lineup
+        names, position_masks = get_slot_table(self._settings)
+        masks = []
+        for player in lineup.players:
+            mask = 0
+            for position in player.positions:
+                mask |= position_masks.get(position, 0)
+            masks.append(mask)
+        slots = assign_slots(masks, len(names))
+        if slots is None:
+            raise LineupOptimizerInvalidNumberOfPlayersInPineup("Invalid lineup, players can't fill lineup places")
+        copies = copy_players(lineup.players)
+        if run is not None:
+            run.set_values(lineup.players, copies)
+        sorted_players = [None] * len(names)
+        for player, slot in zip(copies, slots):
+            player.provider_position = names[slot]
+            sorted_players[slot] = player
+        return Lineup(sorted_players)
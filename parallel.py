@@ -0,0 +1,172 @@
+"""
+Parallel generation of randomized lineups in pool of worker processes.
+Every worker builds solver model once and solves it with independently seeded perturbations of players points,
+coordinator in main process dedupes found lineups and enforces max exposure and number of unique players
+for all lineups.
+Last taken lineups are sent with next tasks and workers cut them off from their models, so only lineups
+found by tasks running at the same time or taken long ago can repeat, repeated lineups are dropped by coordinator.
+Tasks and models of workers don't grow with number of lineups, except when number of unique players is set:
+lineups near all taken ones must be cut off then, otherwise most of found lineups would be dropped.
+"""
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from random import getrandbits
+import time
+import numpy as np
+from .solvers import get_solver
+from .lineup_index import LineupIndex
+
+# solver model of worker process, it's built by init_worker once for all tasks of worker
+_worker = {}
+# max number of last taken lineups sent with task and cut off from model of worker
+MAX_CUT_LINEUPS = 200
+
+
+def init_worker(solver_name, fppg, rows, mip_gap, max_common_players=None):
+    """
+    Build solver model in worker process.
+    Taken lineups are cut off by rows with max_common_players common players, or only same lineups if it's None.
+    :type solver_name: str
+    :type fppg: List[float]
+    :type rows: ConstraintMatrix
+    :type mip_gap: float
+    :type max_common_players: int
+    """
+    solver = get_solver(solver_name, len(fppg), threads=1)
+    solver.set_mip_gap(mip_gap)
+    solver.add_constraints(rows)
+    _worker['solver'] = solver
+    _worker['fppg'] = np.array(fppg, dtype=float)
+    _worker['removed'] = frozenset()
+    _worker['cut_lineups'] = OrderedDict()
+    _worker['max_common_players'] = max_common_players
+
+
+def solve_randomized(seed, removed, lineups, min_deviation, max_deviation, time_limit=None):
+    """
+    Solve worker model with points of every player randomly deviated up or down by min to max deviation.
+    Players removed by max exposure are excluded by bounds and taken lineups are excluded by cuts.
+    Return indices of selected players, proven gap of solution and False, or None, None and True if model
+    is infeasible, or None, None and False if nothing was found in time limit.
+    :type seed: int
+    :type removed: frozenset[int]
+    :type lineups: Tuple[Tuple[int]]
+    :type min_deviation: float
+    :type max_deviation: float
+    :type time_limit: float
+    :rtype: Tuple[Tuple[int], float, bool]
+    """
+    solver = _worker['solver']
+    solver.set_time_limit(time_limit)
+    for i in _worker['removed'] - removed:
+        solver.set_bounds(i, 0, 1)
+    for i in removed - _worker['removed']:
+        solver.set_bounds(i, 0, 0)
+    _worker['removed'] = removed
+    cut_lineups = _worker['cut_lineups']
+    max_common_players = _worker['max_common_players']
+    for lineup in lineups:
+        if lineup not in cut_lineups:
+            rhs = len(lineup) - 1 if max_common_players is None else max_common_players
+            cut_lineups[lineup] = solver.add_constraint(dict((i, 1) for i in lineup), '<=', rhs)
+    while max_common_players is None and len(cut_lineups) > MAX_CUT_LINEUPS:
+        solver.remove_constraint(cut_lineups.popitem(last=False)[1])
+    fppg = _worker['fppg']
+    random = np.random.RandomState(seed)
+    deviations = random.uniform(min_deviation, max_deviation, len(fppg)) * random.choice((-1, 1), len(fppg))
+    solver.set_objective((fppg * (1 + deviations)).tolist())
+    selected = solver.solve()
+    if selected is None:
+        return None, None, solver.infeasible
+    return tuple(selected), solver.gap, False
+
+
+class RandomizedLineupsCoordinator(object):
+    """
+    Collect distinct randomized lineups from worker processes.
+    Tasks are submitted ahead of results so workers are always busy, results are taken in order of submitting,
+    so run is reproducible for same seeds. Lineups which are duplicates, have more than max_common_players common
+    players with any taken lineup or have players which reached max exposure after task was submitted are dropped
+    and pool is topped up with new tasks.
+    """
+    max_attempts_per_lineup = 10
+
+    def __init__(self, solver_name, fppg, rows, workers, mip_gap=None, max_common_players=None):
+        """
+        :type solver_name: str
+        :type fppg: List[float]
+        :type rows: ConstraintMatrix
+        :type workers: int
+        :type mip_gap: float
+        :type max_common_players: int
+        """
+        self.solver_name = solver_name
+        self.fppg = fppg
+        self.rows = rows
+        self.workers = workers
+        self.mip_gap = mip_gap
+        self.max_common_players = max_common_players
+        self.removed = set()
+
+    def remove(self, index):
+        """
+        Exclude player from next tasks and drop pending lineups with him.
+        :type index: int
+        """
+        self.removed.add(index)
+
+    def iter_lineups(self, num_of_lineups, min_deviation, max_deviation, deadline=None):
+        """
+        Yield indices of players and proven gaps of distinct lineups, generator stops when num_of_lineups lineups
+        were taken by caller, when model became infeasible, when too many lineups were dropped or at deadline.
+        Task which found nothing in its time limit only counts as dropped lineup.
+        Every task gets equal share of time left until deadline for lineups which are still needed.
+        :type num_of_lineups: int
+        :type min_deviation: float
+        :type max_deviation: float
+        :type deadline: float
+        :rtype: Iterator[Tuple[Tuple[int], float]]
+        """
+        seen = LineupIndex(len(self.fppg))
+        # only last taken lineups are kept for next tasks, unless lineups must have unique players
+        taken = deque(maxlen=MAX_CUT_LINEUPS if self.max_common_players is None else None)
+        num_of_taken = 0
+        attempts = num_of_lineups * self.max_attempts_per_lineup
+        pending = deque()
+        executor = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                       initargs=(self.solver_name, self.fppg, self.rows, self.mip_gap,
+                                                 self.max_common_players))
+        try:
+            while num_of_taken < num_of_lineups:
+                time_limit = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return
+                    time_limit = remaining * self.workers / (num_of_lineups - num_of_taken)
+                while len(pending) < self.workers * 2 and attempts:
+                    pending.append(executor.submit(solve_randomized, getrandbits(32), frozenset(self.removed),
+                                                   tuple(taken), min_deviation, max_deviation, time_limit))
+                    attempts -= 1
+                if not pending:
+                    return
+                selected, gap, infeasible = pending.popleft().result()
+                if infeasible:
+                    # removed players only grow and cuts are almost same, so next tasks are infeasible too
+                    return
+                if selected is None:
+                    # nothing was found in share of time of task, next tasks get time left by it
+                    continue
+                if selected in seen or self.removed.intersection(selected):
+                    continue
+                # lineups taken while task was running aren't cut off by worker
+                if self.max_common_players is not None and seen.get_max_overlap(selected) > self.max_common_players:
+                    continue
+                seen.add(selected)
+                taken.append(selected)
+                num_of_taken += 1
+                yield selected, gap
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
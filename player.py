@@ -1,24 +1,163 @@
 from __future__ import division
+import numpy as np
+
+
+class PlayerPool(object):
+    """
+    Players pool stored as parallel typed arrays, one row for every player. Teams and opponents are stored as ids of
+    interned team names and positions as bit masks of interned position names. Players of pool are views of its rows.
+    Arrays are used for vectorized work with pool, players read and write single values of rows through memoryviews,
+    so they get python values and not numpy scalars.
+    """
+    def __init__(self, rows, players=None):
+        """
+        Rows have same fields as arguments of Player: id, full_name, positions, team, opponent, salary, fppg,
+        is_injured, max_exposure, force and exclude.
+        :type rows: List[tuple]
+        :type players: List[Player]
+        """
+        rows = list(rows)
+        self.team_names = []
+        self.team_ids = {}
+        self.position_bits = {}
+        self.ids = [row[0] for row in rows]
+        self.full_names = [row[1] for row in rows]
+        # players with same positions share one list of positions
+        interned_positions = {}
+        self.positions = [interned_positions.setdefault(tuple(row[2]), row[2]) for row in rows]
+        self.provider_positions = [row[2][0] for row in rows]
+        self.position_masks = np.array([self._get_position_mask(row[2]) for row in rows], dtype=np.int64)
+        self.teams = np.array([self._get_team_id(row[3]) for row in rows], dtype=np.int32)
+        self.opponents = np.array([self._get_team_id(row[4]) for row in rows], dtype=np.int32)
+        self.salary = np.array([row[5] for row in rows], dtype=np.int32)
+        self.fppg = np.array([row[6] for row in rows], dtype=np.float64)
+        self.real_points = self.fppg.copy()
+        self.deviated_fppg = np.full(len(rows), np.nan)
+        self.is_injured = np.array([bool(row[7]) for row in rows], dtype=bool)
+        self.max_exposure = np.array([get_max_exposure(row[8]) for row in rows], dtype=np.float64)
+        self.force = np.array([bool(row[9]) for row in rows], dtype=bool)
+        self.exclude = np.array([bool(row[10]) for row in rows], dtype=bool)
+        self.num_of_lineups = np.zeros(len(rows), dtype=np.int32)
+        self._set_views()
+        if players is None:
+            players = [Player.view(self, i) for i in range(len(rows))]
+        self.players = players
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _set_views(self):
+        self.views = dict((name, memoryview(getattr(self, name))) for name in (
+            'salary', 'fppg', 'real_points', 'deviated_fppg', 'is_injured', 'max_exposure', 'force', 'exclude',
+            'num_of_lineups'))
+
+    def _get_team_id(self, team):
+        team = team.upper()
+        if team not in self.team_ids:
+            self.team_ids[team] = len(self.team_names)
+            self.team_names.append(team)
+        return self.team_ids[team]
+
+    def _get_position_mask(self, positions):
+        mask = 0
+        for position in positions:
+            if position not in self.position_bits:
+                self.position_bits[position] = 1 << len(self.position_bits)
+            mask |= self.position_bits[position]
+        return mask
+
+    def copy(self, rows=None):
+        """
+        Return pool with copies of passed rows, all rows by default. Values which players can't change are shared.
+        :type rows: List[int]
+        :rtype: PlayerPool
+        """
+        pool = object.__new__(PlayerPool)
+        pool.__dict__.update(self.__dict__)
+        if rows is None:
+            rows = slice(None)
+            pool.ids, pool.full_names, pool.positions = self.ids, self.full_names, self.positions
+            pool.provider_positions = list(self.provider_positions)
+        else:
+            rows = list(rows)
+            pool.ids = [self.ids[i] for i in rows]
+            pool.full_names = [self.full_names[i] for i in rows]
+            pool.positions = [self.positions[i] for i in rows]
+            pool.provider_positions = [self.provider_positions[i] for i in rows]
+        pool.team_names = list(self.team_names)
+        pool.team_ids = dict(self.team_ids)
+        for name in ('position_masks', 'teams', 'opponents', 'salary', 'fppg', 'real_points', 'deviated_fppg',
+                     'is_injured', 'max_exposure', 'force', 'exclude', 'num_of_lineups'):
+            setattr(pool, name, getattr(self, name)[rows].copy())
+        pool._set_views()
+        pool.players = [Player.view(pool, i) for i in range(len(pool.ids))]
+        return pool
+
+
+def get_max_exposure(max_exposure):
+    """
+    Return max exposure as share of lineups, values above 1 are percents. None is stored as nan.
+    :type max_exposure: float
+    :rtype: float
+    """
+    if max_exposure is None:
+        return np.nan
+    return max_exposure / 100.0 if max_exposure and max_exposure > 1 else max_exposure
+
+
+def copy_players(players):
+    """
+    Return copies of players detached from their pools. Players of one pool are copied to one new pool,
+    so copying of lineup copies only its rows.
+    :type players: List[Player]
+    :rtype: List[Player]
+    """
+    if players and all(player._pool is players[0]._pool for player in players):
+        return players[0]._pool.copy([player._row for player in players]).players
+    return [player.__copy__() for player in players]
+
+
+def _column(name):
+    def get(self):
+        return self._pool.views[name][self._row]
+
+    def set(self, value):
+        self._pool.views[name][self._row] = value
+    return property(get, set)
 
 
 class Player(object):
-    num_of_lineups = 0
+    """
+    View of row of players pool. Player created directly gets its own pool with one row.
+    """
+    __slots__ = ('_pool', '_row')
 
     def __init__(self, id, full_name, positions, team, opponent, salary, fppg, is_injured=False, max_exposure=None, force=False, exclude=False):
-        self.id = id
-        self.full_name = full_name
-        self.positions = positions
-        self.team = team.upper()
-        self.opponent = opponent.upper()
-        self.salary = salary
-        self.fppg = fppg
-        self.is_injured = is_injured
-        self._max_exposure = None
-        self.max_exposure = max_exposure
-        self.exclude = exclude
-        self.force = force
-        self.provider_position = positions[0]
-        self.real_points = fppg
+        self._pool = PlayerPool([(id, full_name, positions, team, opponent, salary, fppg, is_injured, max_exposure,
+                                  force, exclude)], players=[self])
+        self._row = 0
+
+    @classmethod
+    def view(cls, pool, row):
+        """
+        :type pool: PlayerPool
+        :type row: int
+        :rtype: Player
+        """
+        player = object.__new__(cls)
+        player._pool = pool
+        player._row = row
+        return player
+
+    def __copy__(self):
+        # copy is detached from pool, so values set for copy in lineup don't change pool
+        return self._pool.copy([self._row]).players[0]
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    def __reduce__(self):
+        return _restore_player, (self.to_dict(), )
 
     def __str__(self):
         return "{}{}{}{}{}".format(
@@ -30,16 +169,92 @@ class Player(object):
             "{:<10}".format(str(self.salary) + '$')
         )
 
+    def to_dict(self):
+        """
+        Return fields of player, run state is included only when it's set.
+        :rtype: dict
+        """
+        data = {
+            'id': self.id,
+            'full_name': self.full_name,
+            'positions': self.positions,
+            'team': self.team,
+            'opponent': self.opponent,
+            'salary': self.salary,
+            'fppg': self.fppg,
+            'is_injured': self.is_injured,
+            '_max_exposure': self.max_exposure,
+            'exclude': self.exclude,
+            'force': self.force,
+            'provider_position': self.provider_position,
+            'real_points': self.real_points,
+        }
+        if self.num_of_lineups:
+            data['num_of_lineups'] = self.num_of_lineups
+        if self.deviated_fppg == self.deviated_fppg:
+            data['deviated_fppg'] = self.deviated_fppg
+        return data
+
     def jdefault(o):
-        return o.__dict__
+        return o.to_dict() if isinstance(o, Player) else o.__dict__
+
+    salary = _column('salary')
+    fppg = _column('fppg')
+    real_points = _column('real_points')
+    deviated_fppg = _column('deviated_fppg')
+    is_injured = _column('is_injured')
+    force = _column('force')
+    exclude = _column('exclude')
+    num_of_lineups = _column('num_of_lineups')
+
+    @property
+    def id(self):
+        return self._pool.ids[self._row]
+
+    @property
+    def full_name(self):
+        return self._pool.full_names[self._row]
+
+    @property
+    def positions(self):
+        return self._pool.positions[self._row]
+
+    @property
+    def position_mask(self):
+        return int(self._pool.position_masks[self._row])
+
+    @property
+    def provider_position(self):
+        return self._pool.provider_positions[self._row]
+
+    @provider_position.setter
+    def provider_position(self, provider_position):
+        self._pool.provider_positions[self._row] = provider_position
+
+    @property
+    def team(self):
+        return self._pool.team_names[self._pool.teams[self._row]]
+
+    @team.setter
+    def team(self, team):
+        self._pool.teams[self._row] = self._pool._get_team_id(team)
+
+    @property
+    def opponent(self):
+        return self._pool.team_names[self._pool.opponents[self._row]]
+
+    @opponent.setter
+    def opponent(self, opponent):
+        self._pool.opponents[self._row] = self._pool._get_team_id(opponent)
 
     @property
     def max_exposure(self):
-        return self._max_exposure
+        max_exposure = self._pool.views['max_exposure'][self._row]
+        return None if max_exposure != max_exposure else max_exposure
 
     @max_exposure.setter
     def max_exposure(self, max_exposure):
-        self._max_exposure = max_exposure / 100.0 if max_exposure and max_exposure > 1 else max_exposure
+        self._pool.views['max_exposure'][self._row] = get_max_exposure(max_exposure)
 
     #@property
     #def full_name(self):
@@ -50,4 +265,15 @@ class Player(object):
         return round(self.fppg / self.salary, 2)
 
     def __getitem__(self, index):
-        return 0
\ No newline at end of file
+        return 0
+
+
+def _restore_player(data):
+    player = Player(data['id'], data['full_name'], data['positions'], data['team'], data['opponent'], data['salary'],
+                    data['fppg'], data['is_injured'], data['_max_exposure'], data['force'], data['exclude'])
+    player.provider_position = data['provider_position']
+    player.real_points = data['real_points']
+    player.num_of_lineups = data.get('num_of_lineups', 0)
+    if 'deviated_fppg' in data:
+        player.deviated_fppg = data['deviated_fppg']
+    return player
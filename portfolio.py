@@ -0,0 +1,113 @@
+"""
+Exposure aware portfolio of lineups planned by column generation. Columns are candidate lineups found by greedy
+passes, which take best lineups one by one and remove players who reached their caps, like sequential run.
+Points of players in every pass are lowered by prices, prices go up for players who reached their caps in last
+pass, so next pass spends them later and leaves them for lineups which can't be filled without them.
+Master problem selects distinct candidates with most lineups and then most points, so that every player is used
+in no more lineups than his cap.
+"""
+from __future__ import division
+import numpy as np
+
+
+class PortfolioPlanner(object):
+    # number of priced passes after first pass with real points
+    max_rounds = 8
+    # step of prices as share of average points of players
+    price_step = 0.1
+
+    def __init__(self, points, caps, num_of_lineups):
+        """
+        :type points: List[float]
+        :type caps: List[int]
+        :type num_of_lineups: int
+        """
+        self.points = np.array(points, dtype=float)
+        self.caps = np.array(caps, dtype=int)
+        self.num_of_lineups = num_of_lineups
+        self.prices = np.zeros(len(points))
+        self.columns = []
+        self._known = set()
+        self._step = float(np.mean(self.points)) * self.price_step if len(points) else 0.0
+
+    def add_column(self, selected):
+        """
+        Add candidate lineup with passed indices of players, return False if candidate is already known.
+        :type selected: List[int]
+        :rtype: bool
+        """
+        column = tuple(sorted(selected))
+        if column in self._known:
+            return False
+        self._known.add(column)
+        self.columns.append(column)
+        return True
+
+    def get_column_points(self, column):
+        return float(self.points[list(column)].sum())
+
+    def get_pricing_objective(self):
+        """
+        :rtype: List[float]
+        """
+        return (self.points - self.prices).tolist()
+
+    def update_prices(self, usage):
+        """
+        Raise prices of players who reached their caps in pass with passed numbers of lineups of players.
+        Return False if nobody reached his cap, so next pass would find same lineups.
+        :type usage: np.ndarray
+        :rtype: bool
+        """
+        capped = np.asarray(usage) >= self.caps
+        self.prices = self.prices + self._step * capped
+        return bool(capped.any())
+
+    def get_master_rows(self):
+        """
+        Return usage rows of players with caps which can be exceeded by candidates as tuples of
+        (candidates indices, cap).
+        :rtype: List[tuple]
+        """
+        usage = {}
+        for i, column in enumerate(self.columns):
+            for player in column:
+                usage.setdefault(player, []).append(i)
+        return [(columns, int(self.caps[player])) for player, columns in usage.items()
+                if len(columns) > self.caps[player]]
+
+    def plan(self, create_solver, seed):
+        """
+        Return indices of candidates of portfolio ordered by points. Seed is portfolio which keeps caps,
+        it's returned if there are no other candidates and it's initial solution of master problem otherwise.
+        Master problem finds most lineups which keep caps, up to num_of_lineups, and then most points
+        of that many lineups.
+        :type create_solver: Callable[[int], Solver]
+        :type seed: List[int]
+        :rtype: List[int]
+        """
+        column_points = [self.get_column_points(column) for column in self.columns]
+        selected = seed
+        if len(self.columns) > len(seed):
+            rows = self.get_master_rows()
+            if len(seed) < self.num_of_lineups:
+                selected = self._solve_master(create_solver, rows, [1.0] * len(self.columns), '<=',
+                                              self.num_of_lineups, seed)
+                if selected is None or len(selected) < len(seed):
+                    selected = seed
+            selected = self._solve_master(create_solver, rows, column_points, '==', len(selected), selected) \
+                or selected
+            # master stopped by time limit or gap can be worse than seed
+            if len(selected) == len(seed) and \
+                    sum(column_points[i] for i in selected) < sum(column_points[i] for i in seed):
+                selected = seed
+        return sorted(selected, key=lambda i: (-column_points[i], i))
+
+    def _solve_master(self, create_solver, rows, objective, sense, num_of_lineups, warm_start):
+        solver = create_solver(len(self.columns))
+        solver.set_objective(objective)
+        solver.add_constraint(dict((i, 1) for i in range(len(self.columns))), sense, num_of_lineups)
+        for columns, cap in rows:
+            solver.add_constraint(dict((i, 1) for i in columns), '<=', cap)
+        solver.set_warm_start(warm_start)
+        return solver.solve()
@@ -0,0 +1,133 @@
+"""
+Presolve of players pool, it removes players which can't be selected to best lineups before model is built.
+"""
+from collections import Counter, defaultdict
+from .utils import list_intersection
+
+DOMINATED = 'dominated'
+OVER_BUDGET = 'over budget'
+
+
+class PresolveReport(object):
+    def __init__(self, total):
+        """
+        Removed players grouped by reason of removing and reasons of skipped checks.
+        :type total: int
+        """
+        self.total = total
+        self.removed = defaultdict(list)
+        self.skipped = {}
+
+    @property
+    def total_removed(self):
+        """
+        :rtype: int
+        """
+        return sum(len(players) for players in self.removed.values())
+
+    def __str__(self):
+        reasons = ', '.join('{} {}'.format(len(players), reason) for reason, players in self.removed.items())
+        report = 'Presolve removed {} of {} players'.format(self.total_removed, self.total)
+        if reasons:
+            report += ': ' + reasons
+        for check, reason in self.skipped.items():
+            report += '\nPresolve {} check skipped: {}'.format(check, reason)
+        return report
+
+
+def get_eligible_slots(player, slots):
+    """
+    Return indexes of lineup places which can be filled by player.
+    :type player: Player
+    :type slots: List[LineupPosition]
+    :rtype: Tuple[int]
+    """
+    return tuple(i for i, slot in enumerate(slots) if list_intersection(slot.positions, player.positions))
+
+
+def remove_over_budget_players(players, slots, budget, num_of_locked, report):
+    """
+    Remove players whose salary with cheapest fill of remaining places is over budget.
+    Cheapest fill of every place is taken separately, so it's lower bound of real cheapest lineup.
+    :type players: List[Player]
+    :type slots: List[LineupPosition]
+    :type budget: float
+    :type num_of_locked: int
+    :type report: PresolveReport
+    :rtype: List[Player]
+    """
+    slot_groups = Counter(tuple(sorted(slot.positions)) for slot in slots)
+    # cheapest players for every group of same places, one more than places for skipping checked player
+    cheapest = {}
+    for positions, places in slot_groups.items():
+        eligible = [player for player in players if list_intersection(positions, player.positions)]
+        # salaries are read once, players are views of pool rows and every read goes through pool
+        cheapest[positions] = sorted(((p, p.salary) for p in eligible), key=lambda item: item[1])[:places + 1]
+    result = []
+    for player in players:
+        min_salary = None
+        for positions in slot_groups:
+            if not list_intersection(positions, player.positions):
+                continue
+            costs = []
+            for other_positions, places in slot_groups.items():
+                if other_positions == positions:
+                    places -= 1
+                others = [salary for p, salary in cheapest[other_positions] if p is not player][:places]
+                costs.extend(others)
+            # places of locked players are unknown, so most expensive places are left out
+            costs = sorted(costs)[:max(len(costs) - num_of_locked, 0)]
+            if min_salary is None or sum(costs) < min_salary:
+                min_salary = sum(costs)
+        if min_salary is not None and player.salary + min_salary > budget:
+            report.removed[OVER_BUDGET].append(player)
+        else:
+            result.append(player)
+    return result
+
+
+def remove_dominated_players(players, slots, num_of_lineups, max_from_one_team, same_team_only, report, points=None):
+    """
+    Remove players dominated by enough players which can fill same places, which are not more expensive and
+    have not less points. For every lineup with dominated player there are better lineups with one of dominators
+    instead of him, so player isn't needed for num_of_lineups best lineups if at least
+    places - 1 + num_of_lineups dominators can't be in that lineup. Dominators from other teams can be blocked by
+    max players from one team rule, so players from teams with most dominators aren't counted.
+    Points of players are fppg of players if points aren't passed.
+    :type players: List[Player]
+    :type slots: List[LineupPosition]
+    :type num_of_lineups: int
+    :type max_from_one_team: int
+    :type same_team_only: bool
+    :type report: PresolveReport
+    :type points: dict[Player, float]
+    :rtype: List[Player]
+    """
+    if points is None:
+        points = dict((player, player.fppg) for player in players)
+    groups = defaultdict(list)
+    for player in players:
+        groups[get_eligible_slots(player, slots)].append(player)
+    removed = set()
+    for eligible_slots, group in groups.items():
+        places = len(eligible_slots)
+        needed = places - 1 + num_of_lineups
+        if len(group) <= needed:
+            continue
+        # best players go first, so only previous players can dominate next ones
+        group = sorted(((p, p.team, p.salary) for p in group), key=lambda item: (-points[item[0]], item[2]))
+        for i, (player, team, salary) in enumerate(group):
+            dominators = Counter(t for _, t, s in group[:i] if s <= salary)
+            same_team = dominators.pop(team, 0)
+            if same_team_only:
+                count = same_team
+            else:
+                count = same_team + sum(dominators.values())
+                if max_from_one_team:
+                    full_teams = (len(slots) - 1) // max_from_one_team
+                    count -= sum(value for _, value in dominators.most_common(full_teams))
+            if count >= needed:
+                removed.add(player)
+    if removed:
+        report.removed[DOMINATED].extend(player for player in players if player in removed)
+    return [player for player in players if player not in removed]
@@ -0,0 +1,130 @@
+"""
+Registry of slates shared by optimizers of many specs with same players pool.
+Slate keeps parsed players and slate index with its memo of presolve results and groups of rules,
+so spec of known slate only copies players and applies its own options of players.
+"""
+import threading
+import time
+from collections import OrderedDict
+from .constants import JSON_SPEC
+from .player import PlayerPool
+from .slate import SlateIndex
+
+# fields of players which make pool, other fields are options of players which can differ for every spec
+POOL_FIELDS = (JSON_SPEC.PLAYER_ID, JSON_SPEC.PLAYER_FULL_NAME, JSON_SPEC.PLAYER_POSITION, JSON_SPEC.PLAYER_FPPG,
+               JSON_SPEC.PLAYER_SALARY, JSON_SPEC.PLAYER_TEAM, JSON_SPEC.PLAYER_OPPONENT, JSON_SPEC.PLAYER_INJURED)
+
+
+class Slate(object):
+    def __init__(self, pool, template_indices):
+        """
+        :type pool: PlayerPool
+        :type template_indices: List[int]
+        """
+        self.pool = pool
+        self.players = pool.players
+        # index of parsed player for every player of pool in canonical order, -1 for invalid players
+        self.template_indices = template_indices
+        self.index = SlateIndex(pool.players)
+        self.expires_at = None
+
+    def copy_players(self):
+        """
+        Return players of copy of parsed pool for one spec.
+        :rtype: List[Player]
+        """
+        return self.pool.copy().players
+
+
+class SlateRegistry(object):
+    """
+    Slates keyed by players pool of site and sport. Slate expires when it isn't used for ttl seconds,
+    only max_slates last used slates are kept.
+    """
+    def __init__(self, ttl=900, max_slates=16):
+        """
+        :type ttl: float
+        :type max_slates: int
+        """
+        self.ttl = ttl
+        self.max_slates = max_slates
+        self._slates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._slates)
+
+    @staticmethod
+    def get_key(site, sport, players):
+        """
+        Return key of pool and canonical order of players, pool with players in other order has same key.
+        Values are stored with their types, so key is same only for pools which are parsed to same players.
+        Return None key if pool can't be hashed.
+        :type site: str
+        :type sport: str
+        :type players: list
+        :rtype: Tuple[tuple, List[int]]
+        """
+        fields = []
+        for player in players:
+            if isinstance(player, dict):
+                values = tuple(map(player.get, POOL_FIELDS))
+                fields.append((values, tuple(map(type, values))))
+            else:
+                fields.append(None)
+        order = sorted(range(len(players)), key=lambda i: (str(fields[i][0][0]) if fields[i] else '', i))
+        key = (site, sport, tuple(fields[i] for i in order))
+        try:
+            hash(key)
+        except TypeError:
+            return None, order
+        return key, order
+
+    def get_slate(self, site, sport, players, parse_player_row):
+        """
+        Return slate of pool and index of parsed player for every player of pool, -1 for invalid players.
+        Pool is parsed by parse_player_row when slate isn't registered. Return None slate if pool can't be registered.
+        :type site: str
+        :type sport: str
+        :type players: list
+        :type parse_player_row: Callable[[dict], tuple]
+        :rtype: Tuple[Slate, List[int]]
+        """
+        key, order = self.get_key(site, sport, players)
+        if key is None:
+            return None, None
+        now = time.time()
+        with self._lock:
+            for expired_key in [k for k, slate in self._slates.items() if slate.expires_at <= now]:
+                del self._slates[expired_key]
+            slate = self._slates.get(key)
+        if slate is None:
+            slate = self._create_slate(players, order, parse_player_row)
+        with self._lock:
+            slate = self._slates.setdefault(key, slate)
+            slate.expires_at = now + self.ttl
+            self._slates.move_to_end(key)
+            while len(self._slates) > self.max_slates:
+                self._slates.popitem(last=False)
+        indices = [-1] * len(players)
+        for position, i in enumerate(order):
+            indices[i] = slate.template_indices[position]
+        return slate, indices
+
+    @staticmethod
+    def _create_slate(players, order, parse_player_row):
+        """
+        Parse pool without options of players, they are applied to copies of players for every spec.
+        Parsed players are kept in order of first spec, so its lineups are same as without registry.
+        """
+        rows = []
+        indices = []
+        for player in players:
+            row = parse_player_row(player) if isinstance(player, dict) else None
+            if row is None:
+                indices.append(-1)
+                continue
+            # options of players are max exposure, force and exclude
+            indices.append(len(rows))
+            rows.append(row[:8] + (None, False, False))
+        return Slate(PlayerPool(rows), [indices[i] for i in order])
@@ -0,0 +1,101 @@
+"""
+State of one optimization run. Run only reads players, points used by solver, numbers of lineups of players
+and deviated points of randomized lineups are kept in arrays of run, so players pool isn't changed by run
+and one pool can be used by many runs at the same time.
+"""
+from __future__ import division
+from math import ceil
+from random import uniform
+import numpy as np
+
+# points of forced players in objective, so they are selected to every lineup they fit
+FORCED_PLAYER_POINTS = 1000.0
+
+
+def get_run_points(player):
+    """
+    :type player: Player
+    :rtype: float
+    """
+    return FORCED_PLAYER_POINTS if player.force else player.fppg
+
+
+class OptimizationRun(object):
+    def __init__(self, players, num_of_lineups, max_exposure=None):
+        """
+        :type players: List[Player]
+        :type num_of_lineups: int
+        :type max_exposure: float
+        """
+        self.players = players
+        self.index = dict((player, i) for i, player in enumerate(players))
+        self.points = [get_run_points(player) for player in players]
+        # deviated points are set only for randomized lineups
+        self.deviated_points = None
+        self.num_of_lineups = np.zeros(len(players), dtype=int)
+        self._total_lineups = num_of_lineups
+        self._max_exposures = [player.max_exposure if player.max_exposure is not None else max_exposure
+                               for player in players]
+
+    def get_usage_caps(self):
+        """
+        Return max number of lineups of every player. Like in sequential run, player reaches max exposure
+        with lineup which takes him to it or over it, so every player can be in one lineup at least.
+        :rtype: List[int]
+        """
+        caps = []
+        for exposure in self._max_exposures:
+            if exposure is None:
+                caps.append(self._total_lineups)
+                continue
+            cap = min(max(int(ceil(exposure * self._total_lineups)), 1), self._total_lineups)
+            while cap > 1 and exposure <= (cap - 1) / self._total_lineups:
+                cap -= 1
+            caps.append(cap)
+        return caps
+
+    def add_lineup(self, selected):
+        """
+        Count lineup with passed indices of players, return indices of players who reached max exposure.
+        :type selected: List[int]
+        :rtype: List[int]
+        """
+        reached = []
+        for i in selected:
+            self.num_of_lineups[i] += 1
+            exposure = self._max_exposures[i]
+            if exposure is not None and exposure <= self.num_of_lineups[i] / self._total_lineups:
+                reached.append(i)
+        return reached
+
+    def reset_deviated_points(self):
+        self.deviated_points = list(self.points)
+
+    def deviate_points(self, players, min_deviation, max_deviation):
+        """
+        Lower deviated points of passed players by random share from min to max deviation,
+        players who aren't in run only take their random number.
+        :type players: List[Player]
+        :type min_deviation: float
+        :type max_deviation: float
+        """
+        for player in players:
+            deviation = uniform(min_deviation, max_deviation)
+            i = self.index.get(player)
+            if i is not None:
+                self.deviated_points[i] = self.deviated_points[i] * (1 - deviation)
+
+    def set_values(self, players, copies):
+        """
+        Set values of players in run to their copies in lineup: points, number of lineups and deviated points.
+        :type players: List[Player]
+        :type copies: List[Player]
+        """
+        for player, player_copy in zip(players, copies):
+            i = self.index.get(player)
+            if i is None:
+                continue
+            player_copy.fppg = self.points[i]
+            player_copy.num_of_lineups = int(self.num_of_lineups[i])
+            if self.deviated_points is not None:
+                player_copy.deviated_fppg = self.deviated_points[i]
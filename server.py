@@ -0,0 +1,541 @@
+"""
+Asyncio HTTP service of optimizer. Specs are queued to bounded pool of solver worker processes and every lineup
+is streamed to clients as server-sent event as soon as it's found and sorted.
+
+POST   /jobs               submit spec, returns job
+GET    /jobs/<id>          returns job with state and number of found lineups
+GET    /jobs/<id>/lineups  stream of lineup events followed by one done, failed or cancelled event
+DELETE /jobs/<id>          cancel queued or running job
+POST   /optimize           submit spec and stream its lineups in same response, job is cancelled on disconnect
+
+Jobs with same canonical form of spec share one optimization, final results are answered from cache.
+Lineups of multi entry specs are spooled to file one per line and every stream reads them from it, so they
+are never collected in memory, their cached results are read from cache directory.
+Run it with `python -m pydfs_lineup_optimizer.server --port 8000 --workers 4 --cache-dir /var/cache/optimizer`.
+"""
+from __future__ import print_function
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+from collections import OrderedDict
+from itertools import count
+from multiprocessing import Pipe, Process, cpu_count
+from . import get_optimizer, is_multi_entry
+from .cache import LineupsCache, spec_key, is_final_result, get_max_gap
+from .cli import redirect_output
+from .registry import SlateRegistry
+from .player import Player
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+STATUSES = {
+    200: 'OK',
+    202: 'Accepted',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    503: 'Service Unavailable',
+}
+
+
+def worker_main(connection):
+    """
+    Loop of solver worker process: receive spec, send every found lineup and then finish message,
+    data of done message tells whether result wasn't cut short by deadline and can be cached.
+    Worker is leader of its own process group, so killing of group stops solver binaries started by worker too.
+    Players pools are kept in registry of worker, so specs of same slate don't parse pool again.
+    :type connection: multiprocessing.connection.Connection
+    """
+    os.setpgrp()
+    redirect_output()
+    registry = SlateRegistry()
+    while True:
+        spec = connection.recv()
+        num_of_lineups = 0
+        max_gap = 0.0
+        try:
+            for lineup in get_optimizer(spec, registry).iter_optimize():
+                connection.send(('lineup', json.dumps(lineup, default=Player.jdefault)))
+                num_of_lineups += 1
+                max_gap = get_max_gap(max_gap, lineup)
+        except Exception as e:
+            connection.send((FAILED, '{}: {}'.format(type(e).__name__, e)))
+        else:
+            connection.send((DONE, is_final_result(spec, num_of_lineups, max_gap)))
+
+
+class SolverWorker(object):
+    """
+    Worker process with pipe for sending specs and receiving lineups.
+    """
+    def __init__(self):
+        self.connection, child_connection = Pipe()
+        self.process = Process(target=worker_main, args=(child_connection, ))
+        self.process.daemon = True
+        self.process.start()
+        child_connection.close()
+
+    def kill(self):
+        """
+        Kill worker with running solver, pipe of killed worker is closed, so waiting for its messages fails.
+        """
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            # worker didn't become group leader yet
+            self.process.kill()
+
+    def close(self):
+        self.connection.close()
+        self.process.join()
+
+
+class LineupsSpool(object):
+    """
+    Serialized lineups of multi entry optimization in file, one per line. Service appends lineups of running
+    optimization and every stream reads them by its own handle. Spool file is removed when optimization and all
+    jobs which use it are released, spool of cached result only reads file of cache directory.
+    """
+    def __init__(self, path, count=0, file=None):
+        """
+        :type path: str
+        :type count: int
+        :type file: file
+        """
+        self.path = path
+        self.count = count
+        self.users = 1
+        self._file = file
+        self._owned = file is not None
+
+    @classmethod
+    def create(cls, directory):
+        """
+        :type directory: str
+        :rtype: LineupsSpool
+        """
+        fd, path = tempfile.mkstemp(dir=directory, suffix='.jsonl')
+        return cls(path, file=os.fdopen(fd, 'w'))
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        :type path: str
+        :rtype: LineupsSpool
+        """
+        with open(path, 'r') as f:
+            return cls(path, sum(1 for _ in f))
+
+    def __len__(self):
+        return self.count
+
+    def append(self, lineup):
+        """
+        :type lineup: str
+        """
+        self._file.write(lineup + '\n')
+        self._file.flush()
+        self.count += 1
+
+    def open(self):
+        return open(self.path, 'r')
+
+    def close(self):
+        """
+        Stop writing of lineups, they can still be read.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def release(self):
+        self.users -= 1
+        if self.users > 0:
+            return
+        self.close()
+        if self._owned:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def release_lineups(lineups):
+    """
+    Release spool of lineups, lists of lineups are freed with their jobs.
+    :type lineups: List[str]|LineupsSpool
+    """
+    if isinstance(lineups, LineupsSpool):
+        lineups.release()
+
+
+class Job(object):
+    def __init__(self, id, spec):
+        """
+        :type id: str
+        :type spec: dict
+        """
+        self.id = id
+        self.spec = spec
+        self.state = QUEUED
+        self.lineups = []
+        self.error = None
+        self.optimization = None
+        self.condition = asyncio.Condition()
+
+    def to_dict(self):
+        """
+        :rtype: dict
+        """
+        return {'id': self.id, 'state': self.state, 'lineups': len(self.lineups), 'error': self.error}
+
+    async def notify(self):
+        async with self.condition:
+            self.condition.notify_all()
+
+    async def iter_events(self):
+        """
+        Yield names and data of events: all found lineups and then finish event with job.
+        :rtype: AsyncIterator[Tuple[str, str]]
+        """
+        sent = 0
+        # spooled lineups are read one by one by own handle of stream
+        reader = self.lineups.open() if isinstance(self.lineups, LineupsSpool) else None
+        try:
+            while True:
+                async with self.condition:
+                    await self.condition.wait_for(lambda: len(self.lineups) > sent or self.state in FINISHED)
+                while sent < len(self.lineups):
+                    yield 'lineup', reader.readline().rstrip('\n') if reader is not None else self.lineups[sent]
+                    sent += 1
+                if self.state in FINISHED:
+                    yield self.state, json.dumps(self.to_dict())
+                    return
+        finally:
+            if reader is not None:
+                reader.close()
+
+
+class Optimization(object):
+    """
+    Run of optimizer for spec shared by all jobs with same key of spec, jobs share its lineups.
+    """
+    def __init__(self, key, spec, lineups):
+        """
+        :type key: str
+        :type spec: dict
+        :type lineups: List[str]|LineupsSpool
+        """
+        self.key = key
+        self.spec = spec
+        self.jobs = []
+        self.lineups = lineups
+        self.worker = None
+        self.cancelled = False
+        self.closed = False
+
+    def close(self):
+        """
+        Stop collecting of lineups, they are kept only for jobs which use them.
+        """
+        if not self.closed:
+            self.closed = True
+            release_lineups(self.lineups)
+
+
+class OptimizerService(object):
+    """
+    Queue of optimizations served by pool of solver workers. Job of spec which is already queued or running
+    joins its optimization and gets lineups found so far, optimization is stopped only when all its jobs are cancelled.
+    Finished jobs are kept for late subscribers, only max_finished_jobs last of them are stored.
+    """
+    max_finished_jobs = 1000
+    max_body_size = 64 * 1024 * 1024
+
+    def __init__(self, workers, queue_size, cache=None):
+        """
+        :type workers: int
+        :type queue_size: int
+        :type cache: LineupsCache
+        """
+        self.workers = workers
+        self.queue = asyncio.Queue(queue_size)
+        self.cache = cache
+        self.jobs = OrderedDict()
+        self.finished_jobs = []
+        self.optimizations = {}
+        self.ids = count(1)
+        self.tasks = []
+        self.spool_directory = None
+
+    def start(self):
+        self.tasks = [asyncio.ensure_future(self._run_worker()) for _ in range(self.workers)]
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        if self.spool_directory is not None:
+            shutil.rmtree(self.spool_directory, ignore_errors=True)
+            self.spool_directory = None
+
+    def submit(self, spec):
+        """
+        Queue spec, return None if queue is full. Cached spec gets finished job and spec which is already
+        optimized gets job attached to running optimization.
+        :type spec: dict
+        :rtype: Job
+        """
+        key = spec_key(spec)
+        multi_entry = is_multi_entry(spec)
+        lineups = None
+        if self.cache is not None and key is not None:
+            # results of multi entry specs are read from cache directory line by line
+            if multi_entry:
+                path = self.cache.get_path(key)
+                lineups = LineupsSpool.from_file(path) if path is not None else None
+            else:
+                lineups = self.cache.get(key)
+        optimization = self.optimizations.get(key) if key is not None else None
+        if lineups is None and optimization is None:
+            if self.queue.full():
+                return None
+            if multi_entry:
+                if self.spool_directory is None:
+                    self.spool_directory = tempfile.mkdtemp(prefix='lineups-')
+                optimization = Optimization(key, spec, LineupsSpool.create(self.spool_directory))
+            else:
+                optimization = Optimization(key, spec, [])
+            if key is not None:
+                self.optimizations[key] = optimization
+            self.queue.put_nowait(optimization)
+        job = Job(str(next(self.ids)), spec)
+        self.jobs[job.id] = job
+        if lineups is not None:
+            job.lineups = lineups
+            job.state = DONE
+            self._finish(job)
+        else:
+            job.optimization = optimization
+            job.lineups = optimization.lineups
+            if isinstance(job.lineups, LineupsSpool):
+                job.lineups.users += 1
+            job.state = RUNNING if optimization.worker is not None else QUEUED
+            optimization.jobs.append(job)
+        return job
+
+    async def cancel(self, job):
+        """
+        Cancel queued or running job, optimization without jobs is dropped and its worker is killed.
+        :type job: Job
+        """
+        if job.state in FINISHED:
+            return
+        optimization = job.optimization
+        optimization.jobs.remove(job)
+        if not optimization.jobs:
+            if self.optimizations.get(optimization.key) is optimization:
+                del self.optimizations[optimization.key]
+            optimization.cancelled = True
+            if optimization.worker is not None:
+                optimization.worker.kill()
+        job.optimization = None
+        job.state = CANCELLED
+        self._finish(job)
+        await job.notify()
+
+    def _finish(self, job):
+        self.finished_jobs.append(job)
+        while len(self.finished_jobs) > self.max_finished_jobs:
+            evicted = self.finished_jobs.pop(0)
+            self.jobs.pop(evicted.id, None)
+            release_lineups(evicted.lineups)
+
+    async def _finish_optimization(self, optimization, state, error, final=False):
+        if self.optimizations.get(optimization.key) is optimization:
+            del self.optimizations[optimization.key]
+        lineups = optimization.lineups
+        if isinstance(lineups, LineupsSpool):
+            lineups.close()
+        if state == DONE and final and self.cache is not None and optimization.key is not None:
+            if isinstance(lineups, LineupsSpool):
+                self.cache.put_file(optimization.key, lineups.path)
+            else:
+                self.cache.put(optimization.key, lineups)
+        optimization.close()
+        jobs, optimization.jobs = optimization.jobs, []
+        for job in jobs:
+            job.state = state
+            job.error = error
+            job.optimization = None
+            self._finish(job)
+            await job.notify()
+
+    async def _run_worker(self):
+        loop = asyncio.get_event_loop()
+        worker = SolverWorker()
+        try:
+            while True:
+                optimization = await self.queue.get()
+                if not optimization.jobs:
+                    # all jobs were cancelled in queue
+                    optimization.close()
+                    continue
+                optimization.worker = worker
+                for job in optimization.jobs:
+                    job.state = RUNNING
+                    await job.notify()
+                try:
+                    worker.connection.send(optimization.spec)
+                    while optimization.jobs:
+                        message, data = await loop.run_in_executor(None, worker.connection.recv)
+                        if not optimization.jobs:
+                            break
+                        if message == 'lineup':
+                            optimization.lineups.append(data)
+                            for job in optimization.jobs:
+                                await job.notify()
+                        elif message == DONE:
+                            await self._finish_optimization(optimization, DONE, None, data)
+                        else:
+                            await self._finish_optimization(optimization, message, data)
+                except (EOFError, OSError):
+                    # worker was killed by cancelling of all jobs or it crashed
+                    await self._finish_optimization(optimization, FAILED, 'Solver worker died')
+                # optimization whose jobs were cancelled between messages isn't finished
+                optimization.close()
+                if optimization.cancelled or not worker.process.is_alive():
+                    await loop.run_in_executor(None, worker.close)
+                    worker = SolverWorker()
+                optimization.worker = None
+        finally:
+            worker.kill()
+            worker.close()
+
+    async def handle(self, reader, writer):
+        """
+        Serve one HTTP request, connection is closed after response.
+        """
+        try:
+            request_line = await reader.readline()
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length') or 0)
+            if length > self.max_body_size:
+                await self._send_json(writer, 413, {'error': 'Spec is too large'})
+                return
+            body = await reader.readexactly(length)
+            await self._route(method, target.split('?')[0].rstrip('/').split('/')[1:], body, writer)
+        except (ValueError, asyncio.IncompleteReadError):
+            await self._send_json(writer, 400, {'error': 'Bad request'})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body, writer):
+        if path in (['jobs'], ['optimize']):
+            if method != 'POST':
+                await self._send_json(writer, 405, {'error': 'Method not allowed'})
+                return
+            try:
+                spec = json.loads(body.decode('utf-8'))
+            except ValueError:
+                await self._send_json(writer, 400, {'error': 'Spec is not valid JSON'})
+                return
+            job = self.submit(spec)
+            if job is None:
+                await self._send_json(writer, 503, {'error': 'Queue is full'})
+            elif path == ['jobs']:
+                await self._send_json(writer, 202, job.to_dict())
+            else:
+                try:
+                    await self._stream(writer, job)
+                finally:
+                    # client of optimize request owns job, it isn't needed after disconnect
+                    await self.cancel(job)
+            return
+        if len(path) < 2 or path[0] != 'jobs' or path[1] not in self.jobs or len(path) > 3 or \
+                (len(path) == 3 and path[2] != 'lineups'):
+            await self._send_json(writer, 404, {'error': 'Not found'})
+            return
+        job = self.jobs[path[1]]
+        if len(path) == 3 and method == 'GET':
+            await self._stream(writer, job)
+        elif len(path) == 2 and method == 'GET':
+            await self._send_json(writer, 200, job.to_dict())
+        elif len(path) == 2 and method == 'DELETE':
+            await self.cancel(job)
+            await self._send_json(writer, 200, job.to_dict())
+        else:
+            await self._send_json(writer, 405, {'error': 'Method not allowed'})
+
+    async def _send_json(self, writer, status, data):
+        body = json.dumps(data).encode('utf-8')
+        writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n'
+                     'Connection: close\r\n\r\n'.format(status, STATUSES[status], len(body)).encode('latin-1'))
+        writer.write(body)
+        await writer.drain()
+
+    async def _stream(self, writer, job):
+        """
+        Send events of job as server-sent events, every event is flushed to client immediately.
+        """
+        writer.write('HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n'
+                     'X-Job-Id: {}\r\nConnection: close\r\n\r\n'.format(job.id).encode('latin-1'))
+        await writer.drain()
+        async for event, data in job.iter_events():
+            writer.write('event: {}\ndata: {}\n\n'.format(event, data).encode('utf-8'))
+            await writer.drain()
+
+
+async def serve(host, port, workers, queue_size, cache=None):
+    service = OptimizerService(workers, queue_size, cache)
+    service.start()
+    server = await asyncio.start_server(service.handle, host, port)
+    print('Optimizer service listening on {}:{} with {} workers'.format(host, port, workers), file=sys.stderr)
+    try:
+        await server.serve_forever()
+    finally:
+        server.close()
+        service.stop()
+        await asyncio.gather(*service.tasks, return_exceptions=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pydfs_lineup_optimizer.server',
+                                     description='Optimizer HTTP service with streaming of lineups.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('-w', '--workers', type=int, default=cpu_count(), help='number of solver worker processes')
+    parser.add_argument('-q', '--queue-size', type=int, default=100, help='max number of queued optimizations')
+    parser.add_argument('--cache-dir', help='directory for results of specs shared by restarts and other services')
+    parser.add_argument('--cache-size', type=int, default=256, help='max size of results kept in memory in MB')
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error('number of workers must be positive')
+    cache = LineupsCache(args.cache_size * 1024 * 1024, args.cache_dir)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue_size, cache))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
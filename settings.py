@@ -10,11 +10,17 @@ class BaseSettings(object):
     __metaclass__ = ABCMeta
     budget = 0
     positions = []
+    # places of sorted lineup in their order with names used as provider positions, positions are used if not set
+    lineup_positions = None
     max_from_one_team = None
 
     @classmethod
     def get_total_players(cls):
         return len(cls.positions)
+
+    @classmethod
+    def get_lineup_positions(cls):
+        return cls.lineup_positions or cls.positions
 # FanDuel
 class FanDuelSettings(BaseSettings):
     max_from_one_team = 4
@@ -32,6 +38,17 @@ class FanDuelFootballSettings(FanDuelSettings):
         LineupPosition('D', ('D', )),
         LineupPosition('K', ('K', )),
     ]
+    lineup_positions = [
+        LineupPosition('QB', ('QB', )),
+        LineupPosition('RB', ('RB', )),
+        LineupPosition('RB', ('RB', )),
+        LineupPosition('WR', ('WR', )),
+        LineupPosition('WR', ('WR', )),
+        LineupPosition('WR', ('WR', )),
+        LineupPosition('TE', ('TE', )),
+        LineupPosition('K', ('K', )),
+        LineupPosition('D', ('D', )),
+    ]
 
 class FanDuelBaseballSettings(FanDuelSettings):
     budget = 35000
@@ -77,6 +94,17 @@ class DraftKingsFootballSettings(DraftKingsSettings):
         LineupPosition('FLEX', ('WR', 'RB', 'TE')),
         LineupPosition('DST', ('DST',))
     ]
+    lineup_positions = [
+        LineupPosition('QB', ('QB',)),
+        LineupPosition('RB', ('RB',)),
+        LineupPosition('RB', ('RB',)),
+        LineupPosition('WR', ('WR',)),
+        LineupPosition('WR', ('WR',)),
+        LineupPosition('WR', ('WR',)),
+        LineupPosition('TE', ('TE',)),
+        LineupPosition('FLEX', ('WR', 'RB', 'TE')),
+        LineupPosition('DST', ('DST',))
+    ]
     max_from_one_team = 8
 
 class DraftKingsBaseballSettings(DraftKingsSettings):
@@ -107,4 +135,5 @@ class DraftKingsBasketballSettings(DraftKingsSettings):
         LineupPosition('G', ('PG', 'SG')),
         LineupPosition('F', ('SF', 'PF')),
         LineupPosition('UTIL', ('PG', 'SG', 'PF', 'SF', 'C'))
-    ]
\ No newline at end of file
+    ]
+    lineup_positions = positions[:7] + [LineupPosition('FLEX', ('PG', 'SG', 'PF', 'SF', 'C'))]
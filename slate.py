@@ -0,0 +1,178 @@
+"""
+Index of players pool with lookup tables of players by positions, teams, opponents and games.
+"""
+from collections import defaultdict
+from copy import copy
+import numpy as np
+
+
+def _table(get_keys):
+    def get(self):
+        return self.get_table(name, get_keys)
+    name = get_keys.__name__
+    return property(get)
+
+
+class SlateIndex(object):
+    """
+    Lookup tables of integer indices of players in loaded pool. Every table is built once on its first lookup,
+    removing and restoring of players only changes active flag of player, so lookups cost is proportional
+    to size of looked up group, not to size of pool.
+    Memo keeps results derived from pool, like presolve results and groups of rules, it's shared by indices
+    bound to copies of same pool.
+    """
+    max_memo_size = 64
+
+    @_table
+    def positions(player):
+        return player.positions
+
+    @_table
+    def primary_positions(player):
+        return player.positions[0],
+
+    @_table
+    def position_tuples(player):
+        return tuple(player.positions),
+
+    @_table
+    def teams(player):
+        return player.team,
+
+    @_table
+    def opponents(player):
+        return player.opponent,
+
+    @_table
+    def games(player):
+        return SlateIndex.get_game(player),
+
+    @_table
+    def team_position_tuples(player):
+        return (player.team, tuple(player.positions)),
+
+    def __init__(self, players):
+        """
+        :type players: List[Player]
+        """
+        self.players = list(players)
+        self.active = np.ones(len(self.players), dtype=bool)
+        self._set_indices()
+        self._tables = {}
+        self.memo = {}
+
+    def get_table(self, name, get_keys):
+        """
+        Return lookup table of passed name, it's built on first lookup and shared with bound indices.
+        :type name: str
+        :type get_keys: Callable[[Player], Iterable]
+        :rtype: dict[Any, np.ndarray]
+        """
+        if name not in self._tables:
+            table = defaultdict(list)
+            for i, player in enumerate(self.players):
+                for key in get_keys(player):
+                    table[key].append(i)
+            self._tables[name] = self._to_arrays(table)
+        return self._tables[name]
+
+    def _set_indices(self):
+        """
+        Players which are views of all rows of one pool in order of rows are looked up by their rows,
+        other players are looked up in dict.
+        """
+        pool = getattr(self.players[0], '_pool', None) if self.players else None
+        if pool is not None and len(pool.players) == len(self.players) and \
+                all(p is q for p, q in zip(pool.players, self.players)):
+            self._pool = pool
+            self._indices = None
+        else:
+            self._pool = None
+            self._indices = dict((player, i) for i, player in enumerate(self.players))
+
+    def __len__(self):
+        return len(self.players)
+
+    @staticmethod
+    def get_game(player):
+        """
+        :type player: Player
+        :rtype: Tuple[str, str]
+        """
+        return tuple(sorted((player.team, player.opponent)))
+
+    @staticmethod
+    def _to_arrays(table):
+        return dict((key, np.array(indices, dtype=int)) for key, indices in table.items())
+
+    def bind(self, players):
+        """
+        Return index of passed copies of pool players, lookup tables and memo are shared with this index.
+        :type players: List[Player]
+        :rtype: SlateIndex
+        """
+        if len(players) != len(self.players):
+            raise ValueError('Players are not copies of pool')
+        index = copy(self)
+        index.players = list(players)
+        index.active = np.ones(len(players), dtype=bool)
+        index._set_indices()
+        return index
+
+    def get_memo(self, key):
+        return self.memo.get(key)
+
+    def set_memo(self, key, value):
+        if len(self.memo) >= self.max_memo_size:
+            self.memo.clear()
+        self.memo[key] = value
+
+    def index_of(self, player):
+        """
+        Return index of player in pool or None if player isn't in pool.
+        :type player: Player
+        :rtype: int
+        """
+        if self._pool is not None:
+            return player._row if getattr(player, '_pool', None) is self._pool else None
+        return self._indices.get(player)
+
+    def indices_of(self, players):
+        """
+        :type players: List[Player]
+        :rtype: np.ndarray
+        """
+        if self._pool is not None:
+            if any(getattr(player, '_pool', None) is not self._pool for player in players):
+                raise KeyError('Player is not in pool')
+            return np.fromiter((player._row for player in players), dtype=int, count=len(players))
+        return np.array([self._indices[player] for player in players], dtype=int)
+
+    def remove(self, player):
+        """
+        :type player: Player
+        """
+        i = self.index_of(player)
+        if i is not None:
+            self.active[i] = False
+
+    def restore(self, player):
+        """
+        :type player: Player
+        """
+        i = self.index_of(player)
+        if i is not None:
+            self.active[i] = True
+
+    def mask(self, table, keys):
+        """
+        Return boolean mask of pool with players from groups of passed keys of lookup table.
+        :type table: dict[str, np.ndarray]
+        :type keys: Iterable
+        :rtype: np.ndarray
+        """
+        mask = np.zeros(len(self.players), dtype=bool)
+        for key in keys:
+            if key in table:
+                mask[table[key]] = True
+        return mask
@@ -0,0 +1,122 @@
+"""
+Assignment of lineup players to places of lineup. Places which player can fill are bit mask of places,
+players are assigned to places by augmenting paths of bipartite matching, so assignment is found
+whenever it exists, also for players with several positions.
+Cover table of settings is Hall's condition of this matching for lineup model: for every set of positions
+lineup has at least as many players with any of these positions as places which take only these positions,
+so lineup of model always can be sorted.
+"""
+from itertools import combinations
+
+# compiled slot and cover tables of settings, they are shared by all optimizers with same settings
+_slot_tables = {}
+_cover_tables = {}
+
+
+def get_slot_table(settings):
+    """
+    Return names of places of sorted lineup and dict with mask of places by player position,
+    table is compiled on first call for settings and then shared.
+    :type settings: BaseSettings
+    :rtype: Tuple[Tuple[str], dict]
+    """
+    table = _slot_tables.get(settings)
+    if table is None:
+        table = _slot_tables[settings] = compile_slot_table(settings.get_lineup_positions())
+    return table
+
+
+def compile_slot_table(lineup_positions):
+    """
+    :type lineup_positions: List[LineupPosition]
+    :rtype: Tuple[Tuple[str], dict]
+    """
+    masks = {}
+    for i, lineup_position in enumerate(lineup_positions):
+        for position in lineup_position.positions:
+            masks[position] = masks.get(position, 0) | 1 << i
+    return tuple(lineup_position.name for lineup_position in lineup_positions), masks
+
+
+def get_cover_table(settings):
+    """
+    Return sets of positions with minimal number of lineup players who have any of these positions,
+    table is compiled on first call for settings and then shared.
+    :type settings: BaseSettings
+    :rtype: Tuple[Tuple[Tuple[str], int]]
+    """
+    table = _cover_tables.get(settings)
+    if table is None:
+        table = _cover_tables[settings] = compile_cover_table(settings.get_lineup_positions())
+    return table
+
+
+def compile_cover_table(lineup_positions):
+    """
+    Set of positions is skipped if its minimum isn't greater than minimum of some its subset, because its row
+    follows from row of subset, set of all positions is covered by total number of players.
+    :type lineup_positions: List[LineupPosition]
+    :rtype: Tuple[Tuple[Tuple[str], int]]
+    """
+    positions = sorted(set(position for lineup_position in lineup_positions
+                           for position in lineup_position.positions))
+    table = []
+    # greatest minimum of set and its subsets
+    covered = {(): 0}
+    for size in range(1, len(positions)):
+        for key in combinations(positions, size):
+            min_value = sum(1 for lineup_position in lineup_positions if set(lineup_position.positions) <= set(key))
+            subsets_value = max(covered[subset] for subset in combinations(key, size - 1))
+            if min_value > subsets_value:
+                table.append((key, min_value))
+            covered[key] = max(min_value, subsets_value)
+    return tuple(table)
+
+
+def assign_slots(masks, num_of_slots):
+    """
+    Return index of place for every player or None if players can't fill all places.
+    Players who can fill less places are placed first, players who can fill same number of places are placed
+    in their order. Every player takes first free place he can fill, place is taken from placed player only
+    when he can be moved to other place.
+    Search of place for every player tries every place at most once.
+    :type masks: List[int]
+    :type num_of_slots: int
+    :rtype: List[int]
+    """
+    if len(masks) != num_of_slots:
+        return None
+    # player index for every place, -1 for free place
+    slot_players = [-1] * num_of_slots
+    for player in sorted(range(len(masks)), key=lambda i: (bin(masks[i]).count('1'), i)):
+        if not _augment(player, masks, slot_players, [0]):
+            return None
+    slots = [0] * len(masks)
+    for slot, player in enumerate(slot_players):
+        slots[player] = slot
+    return slots
+
+
+def _iter_slots(mask):
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        yield bit.bit_length() - 1
+
+
+def _augment(player, masks, slot_players, visited):
+    """
+    Place player to free place or to place of other player who can be moved, visited is mask of places
+    which were tried for this augmenting path.
+    """
+    candidates = masks[player] & ~visited[0]
+    for slot in _iter_slots(candidates):
+        if slot_players[slot] == -1:
+            slot_players[slot] = player
+            return True
+    visited[0] |= candidates
+    for slot in _iter_slots(candidates):
+        if _augment(slot_players[slot], masks, slot_players, visited):
+            slot_players[slot] = player
+            return True
+    return False
@@ -0,0 +1,881 @@
+"""
+Solver backends used by optimizer for selecting lineups.
+"""
+from collections import OrderedDict
+from copy import copy
+import math
+import time
+from pulp import LpProblem, LpMaximize, LpVariable, LpInteger, LpAffineExpression, LpConstraint, LpConstraintEQ, \
+    LpConstraintGE, LpConstraintLE, LpSolverDefault, LpSolutionOptimal, LpStatusInfeasible, COIN_CMD, GLPK_CMD
+from .exceptions import LineupOptimizerException
+
+try:
+    import highspy
+except ImportError:  # pragma: no cover
+    highspy = None
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+class ConstraintMatrix(object):
+    """
+    Linear constraints collected row by row and passed to solver in bulk as compressed sparse rows:
+    coefficients of i-th row are values[starts[i]:starts[i + 1]] of variables indices[starts[i]:starts[i + 1]].
+    """
+    def __init__(self):
+        self._indices = []
+        self._values = []
+        self.senses = []
+        self.rhs = []
+
+    def __len__(self):
+        return len(self.senses)
+
+    def add_row(self, indices, values, sense, rhs):
+        """
+        Add row with coefficients of variables, values can be one number for all variables.
+        :type indices: np.ndarray
+        :type values: np.ndarray|float
+        :type sense: str
+        :type rhs: float
+        """
+        indices = np.asarray(indices, dtype=np.int32)
+        self._indices.append(indices)
+        self._values.append(np.broadcast_to(np.asarray(values, dtype=float), indices.shape))
+        self.senses.append(sense)
+        self.rhs.append(rhs)
+
+    def to_csr(self):
+        """
+        Return starts, indices and values arrays of all rows.
+        :rtype: Tuple[np.ndarray, np.ndarray, np.ndarray]
+        """
+        starts = np.zeros(len(self._indices) + 1, dtype=np.int32)
+        np.cumsum([len(indices) for indices in self._indices], out=starts[1:])
+        if not self._indices:
+            return starts, np.zeros(0, dtype=np.int32), np.zeros(0)
+        return starts, np.concatenate(self._indices), np.concatenate(self._values)
+
+
+class LazyConstraints(object):
+    """
+    Rows which aren't added to solver model up front. Solution of reduced model is checked against all rows at once
+    and only rows violated by it are added, so model is solved again until solution keeps all rows.
+    Added rows stay in model, when solver is replaced they are added to new solver at once.
+    """
+    epsilon = 1e-6
+
+    def __init__(self, matrix, num_of_variables):
+        """
+        :type matrix: ConstraintMatrix
+        :type num_of_variables: int
+        """
+        starts, indices, values = matrix.to_csr()
+        self._matrix = np.zeros((len(matrix), num_of_variables))
+        rows = np.repeat(np.arange(len(matrix)), np.diff(starts))
+        np.add.at(self._matrix, (rows, indices), values)
+        self._rhs = np.array(matrix.rhs, dtype=float)
+        senses = np.array(matrix.senses)
+        self._le = (senses == '<=') | (senses == '==')
+        self._ge = (senses == '>=') | (senses == '==')
+        self._senses = matrix.senses
+        self._added = np.zeros(len(matrix), dtype=bool)
+        self._solver = None
+
+    def __len__(self):
+        return len(self._senses)
+
+    @property
+    def num_of_added_rows(self):
+        return int(self._added.sum())
+
+    def attach(self, solver):
+        """
+        Use passed solver for next rows, rows added to previous solver are added to it.
+        :type solver: Solver
+        """
+        if solver is self._solver:
+            return
+        self._solver = solver
+        for row in np.nonzero(self._added)[0]:
+            self._add_row(row)
+
+    def separate(self, selected):
+        """
+        Add rows violated by solution with passed selected variables.
+        Return False if solution keeps all rows.
+        :type selected: List[int]
+        :rtype: bool
+        """
+        activity = self._matrix[:, list(selected)].sum(axis=1)
+        violated = (self._le & (activity > self._rhs + self.epsilon)) | \
+                   (self._ge & (activity < self._rhs - self.epsilon))
+        violated &= ~self._added
+        if not violated.any():
+            return False
+        for row in np.nonzero(violated)[0]:
+            self._added[row] = True
+            self._add_row(row)
+        return True
+
+    def _add_row(self, row):
+        indices = np.nonzero(self._matrix[row])[0]
+        self._solver.add_constraint(dict(zip(indices.tolist(), self._matrix[row, indices].tolist())),
+                                    self._senses[row], float(self._rhs[row]))
+
+
+class Solver(object):
+    """
+    Base class for solver backends.
+    Backend owns model with one binary variable for every player, model lives during whole optimize() run
+    and optimizer changes it incrementally between lineups.
+    """
+    in_process = False
+    supports_warm_start = False
+    # backend solves any binary model, not only lineup models
+    general = True
+
+    def __init__(self, num_of_variables, message=0, threads=None):
+        """
+        :type num_of_variables: int
+        :type message: int
+        :type threads: int
+        """
+        self.num_of_variables = num_of_variables
+        self.message = message
+        self.threads = threads
+        self.time_limit = None
+        self.mip_gap = None
+        # proven relative gap of points of last solution to upper bound, None if backend doesn't know it
+        self.gap = None
+        # last solve without solution proved that model is infeasible, False if it was stopped by time limit
+        self.infeasible = False
+        self._warm_start = None
+
+    def set_objective(self, coefficients):
+        """
+        Set coefficients of maximized objective.
+        :type coefficients: List[float]
+        """
+        raise NotImplementedError
+
+    def add_constraint(self, coefficients, sense, rhs):
+        """
+        Add linear constraint and return it's handle.
+        :type coefficients: dict[int, float]
+        :type sense: str
+        :type rhs: float
+        """
+        raise NotImplementedError
+
+    def add_constraints(self, matrix):
+        """
+        Add all rows of constraint matrix and return list of their handles.
+        :type matrix: ConstraintMatrix
+        :rtype: list
+        """
+        starts, indices, values = matrix.to_csr()
+        return [self.add_constraint(dict(zip(indices[start:end].tolist(), values[start:end].tolist())), sense, rhs)
+                for start, end, sense, rhs in zip(starts[:-1], starts[1:], matrix.senses, matrix.rhs)]
+
+    def remove_constraint(self, constraint):
+        """
+        Remove constraint added by add_constraint.
+        """
+        raise NotImplementedError
+
+    def change_rhs(self, constraint, rhs):
+        """
+        Change right hand side of constraint added by add_constraint.
+        :type rhs: float
+        """
+        raise NotImplementedError
+
+    def set_bounds(self, index, low, up):
+        """
+        Change bounds of variable.
+        :type index: int
+        :type low: int
+        :type up: int
+        """
+        raise NotImplementedError
+
+    def set_time_limit(self, seconds):
+        """
+        Set time limit of next solves, solve returns best solution found in time or None if nothing was found.
+        :type seconds: float
+        """
+        self.time_limit = seconds
+
+    def set_mip_gap(self, gap):
+        """
+        Set relative gap to upper bound at which solve can stop, None or 0 means exact solve.
+        :type gap: float
+        """
+        self.mip_gap = gap
+
+    def set_warm_start(self, selected):
+        """
+        Set initial solution for next solve. Backends without warm start support ignore it.
+        :type selected: List[int]
+        """
+        self._warm_start = selected
+
+    def solve(self):
+        """
+        Solve current model. Return indexes of selected variables or None if model is infeasible
+        or nothing was found in time limit, infeasible attribute tells these cases apart.
+        :rtype: List[int]
+        """
+        raise NotImplementedError
+
+
+class PulpSolver(Solver):
+    """
+    Backend which builds pulp problem and solves it with external solver command.
+    """
+    senses = {
+        '<=': LpConstraintLE,
+        '>=': LpConstraintGE,
+        '==': LpConstraintEQ,
+    }
+
+    def __init__(self, num_of_variables, message=0, threads=None):
+        super(PulpSolver, self).__init__(num_of_variables, message, threads)
+        self._prob = LpProblem("DFS", LpMaximize)
+        self._variables = [LpVariable('x_%d' % i, lowBound=0, upBound=1, cat=LpInteger)
+                           for i in range(num_of_variables)]
+        self._constraints_counter = 0
+        # rows of model by name, pulp can't remove constraints, so problem is assembled again after removal
+        self._rows = OrderedDict()
+        self._rows_removed = False
+        self._objective = None
+
+    def get_pulp_solver(self):
+        """
+        Return pulp solver command or None for default one.
+        """
+        return None
+
+    def set_objective(self, coefficients):
+        self._objective = LpAffineExpression(
+            [(self._variables[i], coef) for i, coef in enumerate(coefficients) if coef]
+        )
+        self._prob.setObjective(self._objective)
+
+    def add_constraint(self, coefficients, sense, rhs):
+        return self._add_row(coefficients.items(), sense, rhs)
+
+    def add_constraints(self, matrix):
+        starts, indices, values = matrix.to_csr()
+        indices = indices.tolist()
+        values = values.tolist()
+        return [self._add_row(zip(indices[start:end], values[start:end]), sense, rhs)
+                for start, end, sense, rhs in zip(starts[:-1].tolist(), starts[1:].tolist(), matrix.senses, matrix.rhs)]
+
+    def _add_row(self, coefficients, sense, rhs):
+        name = 'c_%d' % self._constraints_counter
+        self._constraints_counter += 1
+        expression = LpAffineExpression([(self._variables[i], coef) for i, coef in coefficients])
+        row = self._rows[name] = LpConstraint(expression, self.senses[sense], name, rhs)
+        self._prob.addConstraint(row, name)
+        return name
+
+    def remove_constraint(self, constraint):
+        del self._rows[constraint]
+        self._rows_removed = True
+
+    def change_rhs(self, constraint, rhs):
+        self._rows[constraint].changeRHS(rhs)
+
+    def set_bounds(self, index, low, up):
+        self._variables[index].lowBound = low
+        self._variables[index].upBound = up
+
+    def solve(self):
+        if self._rows_removed:
+            self._prob = LpProblem("DFS", LpMaximize)
+            if self._objective is not None:
+                self._prob.setObjective(self._objective)
+            for name, row in self._rows.items():
+                self._prob.addConstraint(row, name)
+            self._rows_removed = False
+        if self.supports_warm_start and self._warm_start is not None:
+            selected = set(self._warm_start)
+            for i, variable in enumerate(self._variables):
+                variable.setInitialValue(1 if i in selected else 0)
+        self._prob.solve(self.get_pulp_solver())
+        if self._prob.status != 1:
+            # solver commands report other statuses for stopped solves, they are infeasible without time limit
+            self.infeasible = self.time_limit is None or self._prob.status == LpStatusInfeasible
+            return None
+        # solution stopped by time limit is only feasible, solver commands don't report its bound
+        self.gap = (self.mip_gap or 0.0) if self._prob.sol_status == LpSolutionOptimal else None
+        return [i for i, variable in enumerate(self._variables) if variable.value() > 0.5]
+
+
+class CbcSolver(PulpSolver):
+    supports_warm_start = True
+
+    def get_pulp_solver(self):
+        # options are set to copy of default solver, so they don't leak to other solvers of process
+        solver = copy(LpSolverDefault)
+        if self.message == 1:
+            solver.msg = 1
+        solver.optionsDict = dict(LpSolverDefault.optionsDict, warmStart=self._warm_start is not None)
+        # pulp passes number of threads to cbc only from options
+        if self.threads and self.threads > 0:
+            solver.optionsDict['threads'] = self.threads
+        solver.timeLimit = self.time_limit
+        if self.mip_gap:
+            solver.optionsDict['gapRel'] = self.mip_gap
+        return solver
+
+
+class CoinSolver(PulpSolver):
+    supports_warm_start = True
+
+    def get_pulp_solver(self):
+        return COIN_CMD(msg=self.message, threads=self.threads, warmStart=self._warm_start is not None,
+                        timeLimit=self.time_limit, gapRel=self.mip_gap or None)
+
+
+class GlpkSolver(PulpSolver):
+    def get_pulp_solver(self):
+        options = ['--mipgap', str(self.mip_gap)] if self.mip_gap else None
+        # glpsol takes time limit only in whole seconds, shorter limits are rounded up
+        time_limit = max(1, int(math.ceil(self.time_limit))) if self.time_limit is not None else None
+        return GLPK_CMD(msg=self.message, timeLimit=time_limit, options=options)
+
+
+class HighsSolver(Solver):
+    """
+    In-process backend using HiGHS python bindings. Model stays in HiGHS memory between solves,
+    so there is no LP file writing and no solver process spawning for each lineup.
+    """
+    in_process = True
+    supports_warm_start = True
+
+    def __init__(self, num_of_variables, message=0, threads=None):
+        if highspy is None:
+            raise LineupOptimizerException("HiGHS solver requires highspy package!")
+        super(HighsSolver, self).__init__(num_of_variables, message, threads)
+        self._highs = highspy.Highs()
+        self._highs.setOptionValue('output_flag', bool(message))
+        if threads and threads > 0:
+            self._highs.setOptionValue('threads', threads)
+        columns = list(range(num_of_variables))
+        self._highs.addVars(num_of_variables, [0] * num_of_variables, [1] * num_of_variables)
+        self._highs.changeColsIntegrality(num_of_variables, columns,
+                                          [highspy.HighsVarType.kInteger] * num_of_variables)
+        self._highs.changeObjectiveSense(highspy.ObjSense.kMaximize)
+        self._rows = []
+
+    def _get_row_bounds(self, sense, rhs):
+        if sense == '<=':
+            return -highspy.kHighsInf, rhs
+        elif sense == '>=':
+            return rhs, highspy.kHighsInf
+        return rhs, rhs
+
+    def set_objective(self, coefficients):
+        self._highs.changeColsCost(self.num_of_variables, list(range(self.num_of_variables)),
+                                   [float(coef) for coef in coefficients])
+
+    def add_constraint(self, coefficients, sense, rhs):
+        lower, upper = self._get_row_bounds(sense, rhs)
+        indices = list(coefficients.keys())
+        self._highs.addRow(lower, upper, len(indices), indices, [float(coefficients[i]) for i in indices])
+        row = _HighsRow(len(self._rows), sense)
+        self._rows.append(row)
+        return row
+
+    def add_constraints(self, matrix):
+        if not len(matrix):
+            return []
+        starts, indices, values = matrix.to_csr()
+        bounds = [self._get_row_bounds(sense, rhs) for sense, rhs in zip(matrix.senses, matrix.rhs)]
+        self._highs.addRows(len(matrix), np.array([lower for lower, _ in bounds], dtype=float),
+                            np.array([upper for _, upper in bounds], dtype=float), len(indices),
+                            starts[:-1], indices, values)
+        rows = [_HighsRow(len(self._rows) + i, sense) for i, sense in enumerate(matrix.senses)]
+        self._rows.extend(rows)
+        return rows
+
+    def remove_constraint(self, constraint):
+        self._highs.deleteRows(1, [constraint.index])
+        del self._rows[constraint.index]
+        for row in self._rows[constraint.index:]:
+            row.index -= 1
+
+    def change_rhs(self, constraint, rhs):
+        lower, upper = self._get_row_bounds(constraint.sense, rhs)
+        self._highs.changeRowBounds(constraint.index, lower, upper)
+
+    def set_bounds(self, index, low, up):
+        self._highs.changeColBounds(index, low, up)
+
+    def solve(self):
+        if self._warm_start is not None:
+            # HiGHS checks feasibility of passed solution and ignores it if it isn't feasible
+            self._highs.setSolution(len(self._warm_start), list(self._warm_start), [1.0] * len(self._warm_start))
+        # default relative gap accepts lineups few hundredths of point worse than best one, so gap is exact by default
+        self._highs.setOptionValue('mip_rel_gap', float(self.mip_gap or 0))
+        self._highs.setOptionValue('time_limit', float(self.time_limit) if self.time_limit is not None
+                                   else highspy.kHighsInf)
+        self._highs.run()
+        status = self._highs.getModelStatus()
+        info = self._highs.getInfo()
+        if status != highspy.HighsModelStatus.kOptimal and \
+                not (status == highspy.HighsModelStatus.kTimeLimit and info.primal_solution_status == 2):
+            self.infeasible = status != highspy.HighsModelStatus.kTimeLimit
+            return None
+        self.gap = max(info.mip_gap, 0.0) if info.mip_gap < highspy.kHighsInf else None
+        values = self._highs.getSolution().col_value
+        return [i for i, value in enumerate(values) if value > 0.5]
+
+
+class _HighsRow(object):
+    def __init__(self, index, sense):
+        self.index = index
+        self.sense = sense
+
+
+class BranchAndBoundSolver(Solver):
+    """
+    Exact in-process backend made for lineup models, it doesn't need any solver binary or bindings.
+    Lineup is built by depth first search over players ordered by position groups and points.
+    Nodes are pruned by two upper bounds, both computed with numpy for all candidates at once:
+    salary knapsack table of best completions for remaining places (ignores team limits and cuts) and
+    best points of candidates priced with Lagrangian multipliers of remaining salary (fractional knapsack relaxation).
+    Position groups are made of exact position rows without common players. When exact rows count every place
+    (FanDuel formats), players with several positions would take several places and are excluded. Otherwise places
+    of players with several positions (DraftKings formats) are bounded only by position minimum rows, so on big pools
+    search can be much slower than CBC or HiGHS.
+    """
+    in_process = True
+    supports_warm_start = True
+    general = False
+    epsilon = 1e-6
+    max_table_size = 2000000
+    max_budget_units = 1000
+    # number of search nodes between checks of time limit
+    time_check_interval = 256
+
+    def __init__(self, num_of_variables, message=0, threads=None):
+        if np is None:
+            raise LineupOptimizerException("Branch and bound solver requires numpy package!")
+        super(BranchAndBoundSolver, self).__init__(num_of_variables, message, threads)
+        self._objective = np.zeros(num_of_variables)
+        self._rows = OrderedDict()
+        self._rows_counter = 0
+        self._low = np.zeros(num_of_variables, dtype=bool)
+        self._up = np.ones(num_of_variables, dtype=bool)
+        self._model = None
+
+    def set_objective(self, coefficients):
+        self._objective = np.array(coefficients, dtype=float)
+        self._model = None
+
+    def add_constraint(self, coefficients, sense, rhs):
+        handle = self._rows_counter
+        self._rows_counter += 1
+        self._rows[handle] = [np.array(list(coefficients.keys()), dtype=int),
+                              np.array(list(coefficients.values()), dtype=float), sense, rhs]
+        self._model = None
+        return handle
+
+    def add_constraints(self, matrix):
+        starts, indices, values = matrix.to_csr()
+        handles = []
+        for start, end, sense, rhs in zip(starts[:-1], starts[1:], matrix.senses, matrix.rhs):
+            handles.append(self._rows_counter)
+            self._rows[self._rows_counter] = [indices[start:end], values[start:end], sense, rhs]
+            self._rows_counter += 1
+        self._model = None
+        return handles
+
+    def remove_constraint(self, constraint):
+        del self._rows[constraint]
+        self._model = None
+
+    def change_rhs(self, constraint, rhs):
+        self._rows[constraint][3] = rhs
+        self._model = None
+
+    def set_bounds(self, index, low, up):
+        self._low[index] = low >= 1
+        self._up[index] = up >= 1
+        self._model = None
+
+    def _compile(self):
+        """
+        Convert constraints into dense matrix of G * x <= h rows and find lineup structure in it:
+        total number of players, salary row, position groups and rows limiting objective.
+        :rtype: _BranchAndBoundModel
+        """
+        n = self.num_of_variables
+        matrix = []
+        rhs = []
+        total = None
+        equal_rows = []
+        for indices, values, sense, value in self._rows.values():
+            row = np.zeros(n)
+            row[indices] = values
+            if sense in ('<=', '=='):
+                matrix.append(row)
+                rhs.append(value)
+            if sense in ('>=', '=='):
+                matrix.append(-row)
+                rhs.append(-value)
+            if sense == '==' and np.all((row == 0) | (row == 1)):
+                if np.all(row == 1):
+                    total = int(round(value))
+                else:
+                    equal_rows.append((row > 0, int(round(value)), len(rhs) - 2))
+        if total is None:
+            raise LineupOptimizerException("Branch and bound solver requires constraint for total number of players!")
+        allowed = self._up.copy()
+        if equal_rows:
+            membership = np.sum([mask for mask, _, _ in equal_rows], axis=0)
+            rest_value = total - sum(value for _, value, _ in equal_rows)
+            if rest_value == 0 and np.all(membership[allowed] >= 1):
+                # every place is counted by one exact position row (FanDuel formats), so player with several
+                # positions would be counted for more places than he takes and can't be selected
+                allowed &= membership <= 1
+            # players without exact position (DraftKings formats) are group of places left after exact positions
+            if np.all(membership[allowed] <= 1) and rest_value > 0:
+                rest = (membership == 0).astype(float)
+                matrix.extend([rest, -rest])
+                rhs.extend([rest_value, -rest_value])
+                equal_rows.append((rest > 0, rest_value, len(rhs) - 2))
+        model = _BranchAndBoundModel()
+        model.total = total
+        model.matrix = np.array(matrix).reshape(len(rhs), n)
+        model.columns = np.ascontiguousarray(model.matrix.T)
+        model.rhs = np.array(rhs, dtype=float)
+        model.monotone = np.all(model.matrix >= 0, axis=1)
+        model.covering = ~model.monotone
+        # covering rows with -1/0 coefficients are position minimums, rows without common players are disjoint
+        covering = model.matrix[model.covering]
+        model.position_rows = np.all((covering == 0) | (covering == -1), axis=1)
+        model.disjoint = None
+        if np.sum(model.position_rows) > 1:
+            support = (covering != 0).astype(float)
+            model.disjoint = support.dot(support.T) == 0
+            model.support_sizes = support.sum(axis=1)
+        model.infeasible = False
+        # salary row is the widest non negative row with biggest coefficients
+        model.salary_row = None
+        candidates = [r for r in np.nonzero(model.monotone)[0]
+                      if np.all(model.matrix[r] > 0) and not np.allclose(model.matrix[r], self._objective)]
+        if candidates:
+            model.salary_row = max(candidates, key=lambda r: model.matrix[r].sum())
+        model.objective_rows = [r for r in np.nonzero(model.monotone)[0]
+                                if np.allclose(model.matrix[r], self._objective)]
+        forced = np.nonzero(self._low & allowed)[0]
+        if np.any(self._low & ~allowed):
+            model.infeasible = True
+        # players can be split into disjoint position groups with exact number of players,
+        # otherwise all players are in one group
+        model.groups = [(np.ones(n, dtype=bool), total, None)]
+        if equal_rows:
+            membership = np.sum([mask for mask, _, _ in equal_rows], axis=0)
+            if np.all(membership[allowed] <= 1) and sum(value for _, value, _ in equal_rows) == total:
+                model.groups = equal_rows
+                allowed &= membership == 1
+        group_ids = np.zeros(n, dtype=int)
+        needs = []
+        for group_id, (mask, value, _) in enumerate(model.groups):
+            group_ids[mask] = group_id
+            needs.append(value - int(np.sum(mask[forced])))
+            if needs[-1] > np.sum(mask & allowed & ~self._low) or needs[-1] < 0:
+                model.infeasible = True
+        model.group_ids = group_ids
+        model.needs = needs
+        # order players by position groups and by points inside group, smallest groups go first and groups of
+        # players requiring other players (qb of stack, pitcher) go last, so such rows are checked early
+        mixed = ~model.monotone & np.any(model.matrix > 0, axis=1)
+        triggers = np.any(model.matrix[mixed] > 0, axis=0)
+        keys = [(np.any(mask & triggers), np.sum(mask & allowed)) for mask, _, _ in model.groups]
+        group_rank = np.zeros(len(keys), dtype=int)
+        group_rank[sorted(range(len(keys)), key=lambda g: keys[g])] = np.arange(len(keys))
+        order = np.lexsort((-self._objective, group_rank[group_ids]))
+        model.order = order[allowed[order] & ~self._low[order]]
+        model.forced = forced
+        model.order_columns = np.ascontiguousarray(model.matrix[:, model.order])
+        model.multipliers = np.zeros(1)
+        model.table = None
+        if model.salary_row is not None and len(model.order) and not model.infeasible:
+            salaries = model.matrix[model.salary_row]
+            # Lagrangian multipliers of salary are taken from players efficiency quantiles
+            efficiency = self._objective[model.order] / salaries[model.order]
+            model.multipliers = np.concatenate(([0.0], np.percentile(np.maximum(efficiency, 0), np.arange(5, 100, 5))))
+            self._compile_table(model, salaries)
+        return model
+
+    def _compile_table(self, model, salaries):
+        """
+        Build table of best points for completing lineup from every position of players order:
+        table[i, k, b] is max points of k more players from group of i-th player (from i-th player onwards)
+        and all places in next groups with salary not bigger than b budget units.
+        Salaries are rounded down to budget units, so table is upper bound for real lineups.
+        """
+        order = model.order
+        size = len(order)
+        max_need = max(model.needs)
+        budget = model.rhs[model.salary_row] - np.sum(salaries[model.forced])
+        units = min(self.max_budget_units, self.max_table_size // ((size + 1) * (max_need + 1)))
+        if budget < 0 or units < 1:
+            return
+        unit = max(budget / units, 1.0)
+        costs = np.floor(salaries[order] / unit + self.epsilon).astype(int)
+        units = int(np.floor(budget / unit + self.epsilon))
+        table = np.full((size + 1, max_need + 1, units + 1), -np.inf)
+        table[size, 0] = 0
+        next_group = np.full((max_need + 1, units + 1), -np.inf)
+        next_group[0] = 0
+        for i in range(size - 1, -1, -1):
+            group_id = model.group_ids[order[i]]
+            if i == size - 1 or model.group_ids[order[i + 1]] != group_id:
+                after = next_group
+            else:
+                after = table[i + 1]
+            current = after.copy()
+            cost = costs[i]
+            if cost <= units:
+                take = self._objective[order[i]] + after[:-1, :units + 1 - cost]
+                current[1:, cost:] = np.maximum(current[1:, cost:], take)
+            table[i] = current
+            if i == 0 or model.group_ids[order[i - 1]] != group_id:
+                # previous player is from another group which has to be followed by completed current group
+                next_group = np.full((max_need + 1, units + 1), -np.inf)
+                next_group[0] = current[model.needs[group_id]]
+        model.table = table
+        model.unit = unit
+        model.costs = salaries[order]
+        # need of player's group when it is entered from previous group
+        model.entry_needs = np.array([model.needs[model.group_ids[player]] for player in order] + [0])
+        model.last_in_group = np.ones(size, dtype=bool)
+        model.last_in_group[:-1] = model.group_ids[order[1:]] != model.group_ids[order[:-1]]
+
+    def _get_upper_bound(self, model, candidates, remaining, activity):
+        """
+        Upper bound of points which can be added by remaining players, salary of candidates is priced with
+        Lagrangian multipliers and best candidates for remaining places of every position group are taken.
+        :type candidates: np.ndarray
+        :type remaining: int
+        :type activity: np.ndarray
+        :rtype: float
+        """
+        bound = float('inf')
+        for row in model.objective_rows:
+            # rows limiting objective, like max points of previous lineup
+            bound = min(bound, model.rhs[row] - activity[row])
+        objective = self._objective[candidates]
+        if model.salary_row is not None:
+            salaries = model.matrix[model.salary_row, candidates]
+            budget = model.rhs[model.salary_row] - activity[model.salary_row]
+            adjusted = objective[None, :] - model.multipliers[:, None] * salaries[None, :]
+        else:
+            budget = 0
+            adjusted = objective[None, :]
+        if len(model.groups) > 1:
+            totals = np.zeros(adjusted.shape[0])
+            candidate_groups = model.group_ids[candidates]
+            for group_id, (mask, value, row) in enumerate(model.groups):
+                need = value - int(round(activity[row]))
+                if need <= 0:
+                    continue
+                group_values = adjusted[:, candidate_groups == group_id]
+                if group_values.shape[1] < need:
+                    return None
+                totals += _top_sum(group_values, need)
+        else:
+            totals = _top_sum(adjusted, remaining)
+        return min(bound, np.min(totals + model.multipliers * budget))
+
+    def _get_children_bounds(self, model, positions, need, activity):
+        """
+        Upper bounds of points for lineups with every player from passed positions of players order,
+        they are taken from salary knapsack table.
+        :type positions: np.ndarray
+        :type need: int
+        :type activity: np.ndarray
+        :rtype: np.ndarray
+        """
+        budget = model.rhs[model.salary_row] - activity[model.salary_row] - model.costs[positions]
+        units = np.floor(budget / model.unit + self.epsilon).astype(int)
+        next_positions = positions + 1
+        same_group = ~model.last_in_group[positions]
+        needs = np.where(same_group, need - 1, model.entry_needs[next_positions])
+        valid = (units >= 0) & (same_group | (need == 1))
+        bounds = np.full(len(positions), -np.inf)
+        bounds[valid] = self._objective[model.order[positions[valid]]] + \
+            model.table[next_positions[valid], needs[valid], units[valid]]
+        return bounds
+
+    def _set_best(self, selected, value):
+        """
+        Set incumbent lineup, nodes which can't improve it by more than mip gap are pruned.
+        """
+        self._best = selected
+        self._best_value = value
+        self._cutoff = value + max(self.epsilon, (self.mip_gap or 0) * abs(value))
+
+    def _search(self, model, start, selected, activity, value):
+        if self._deadline is not None:
+            self._nodes += 1
+            if not self._nodes % self.time_check_interval and time.time() > self._deadline:
+                raise _TimeLimitReached()
+        remaining = model.total - len(selected)
+        if remaining == 0:
+            if np.all(activity <= model.rhs + self.epsilon) and value > self._best_value + self.epsilon:
+                self._set_best(list(selected), value)
+            return
+        slack = model.rhs - activity
+        columns = model.order_columns[:, start:]
+        if remaining == 1:
+            # last player is selected directly from all players which make lineup feasible
+            feasible = np.nonzero(np.all(columns <= slack[:, None] + self.epsilon, axis=0))[0]
+            if len(feasible):
+                players = model.order[start + feasible]
+                player = players[np.argmax(self._objective[players])]
+                if value + self._objective[player] > self._best_value + self.epsilon:
+                    self._set_best(selected + [player], value + self._objective[player])
+            return
+        # candidates which keep non negative rows (budget, team limits, cuts) satisfied
+        allowed = np.all(columns[model.monotone] <= slack[model.monotone][:, None] + self.epsilon, axis=0)
+        positions = start + np.nonzero(allowed)[0]
+        if len(positions) < remaining:
+            return
+        # other rows (positions minimum, min salary, stacks) must be satisfiable by remaining players
+        if np.any(model.covering):
+            need = -slack[model.covering]
+            best_add = np.maximum(-model.order_columns[model.covering][:, positions], 0)
+            if np.any(need > _top_sum(best_add, remaining) + self.epsilon):
+                return
+            # every player fills at most one of position rows without common players
+            if model.disjoint is not None:
+                filled = 0
+                used = np.zeros(len(need), dtype=bool)
+                for row in np.lexsort((model.support_sizes, -need)):
+                    if need[row] <= self.epsilon:
+                        break
+                    if model.position_rows[row] and not np.any(used & ~model.disjoint[row]):
+                        used[row] = True
+                        filled += need[row]
+                if filled > remaining + self.epsilon:
+                    return
+                if filled > remaining - 1 + self.epsilon:
+                    # all remaining players have to fill these rows
+                    positions = positions[np.any(best_add[used] > 0, axis=0)]
+        candidates = model.order[positions]
+        bound = self._get_upper_bound(model, candidates, remaining, activity)
+        if bound is None or value + bound <= self._cutoff:
+            return
+        if len(model.groups) > 1:
+            # position groups are filled one by one, so next player is always from first not completed group
+            group_id = model.group_ids[candidates[0]]
+            need = model.groups[group_id][1] - int(round(activity[model.groups[group_id][2]]))
+            positions = positions[model.group_ids[candidates] == group_id]
+        else:
+            need = remaining
+        if model.table is not None:
+            bounds = self._get_children_bounds(model, positions, need, activity)
+        else:
+            bounds = np.full(len(positions), float('inf'))
+        for position, child_bound in zip(positions, bounds):
+            if value + child_bound <= self._cutoff:
+                continue
+            player = model.order[position]
+            selected.append(player)
+            self._search(model, position + 1, selected, activity + model.columns[player],
+                         value + self._objective[player])
+            selected.pop()
+
+    def solve(self):
+        if self._model is None:
+            self._model = self._compile()
+        model = self._model
+        self._best = None
+        self._best_value = -float('inf')
+        self._cutoff = -float('inf')
+        self._deadline = time.time() + self.time_limit if self.time_limit is not None else None
+        self._nodes = 0
+        if self._warm_start is not None:
+            warm_start = list(self._warm_start)
+            activity = model.matrix[:, warm_start].sum(axis=1)
+            if len(warm_start) == model.total and np.all(self._up[warm_start]) and \
+                    set(model.forced).issubset(warm_start) and np.all(activity <= model.rhs + self.epsilon):
+                # search looks only for strictly better lineups
+                self._set_best(warm_start, self._objective[warm_start].sum())
+        completed = True
+        if not model.infeasible:
+            selected = list(model.forced)
+            activity = model.matrix[:, selected].sum(axis=1)
+            value = self._objective[selected].sum()
+            try:
+                self._search(model, 0, selected, activity, value)
+            except _TimeLimitReached:
+                completed = False
+        if self._best is None:
+            self.infeasible = completed
+            return None
+        if completed:
+            self.gap = self.mip_gap or 0.0
+        else:
+            # search was stopped, so only bound of root node is proven
+            bound = self._get_upper_bound(model, model.order, model.total - len(model.forced), activity)
+            self.gap = float(max(value + bound - self._best_value, 0.0) / max(abs(self._best_value), self.epsilon)) \
+                if bound is not None else 0.0
+        return sorted(self._best)
+
+
+class _TimeLimitReached(Exception):
+    pass
+
+
+class _BranchAndBoundModel(object):
+    pass
+
+
+def _top_sum(values, k):
+    """
+    Sum of k biggest values in every row of matrix.
+    :type values: np.ndarray
+    :type k: int
+    :rtype: np.ndarray
+    """
+    if k <= 0:
+        return np.zeros(values.shape[0])
+    if k >= values.shape[1]:
+        return values.sum(axis=1)
+    return -np.partition(-values, k - 1, axis=1)[:, :k].sum(axis=1)
+
+
+solvers_mapping = {
+    'CBC': CbcSolver,
+    'COIN': CoinSolver,
+    'GLPK': GlpkSolver,
+    'HIGHS': HighsSolver,
+    'BNB': BranchAndBoundSolver,
+}
+
+
+def get_solver(name, num_of_variables, message=0, threads=None, general=False):
+    """
+    Create solver backend registered under passed name, GLPK is used by default.
+    Model which isn't lineup model needs general backend, HiGHS or CBC is used instead of backend made for lineups.
+    :type name: str
+    :type num_of_variables: int
+    :type general: bool
+    :rtype: Solver
+    """
+    solver_class = solvers_mapping.get(name, GlpkSolver)
+    if general and not solver_class.general:
+        solver_class = HighsSolver if highspy is not None else CbcSolver
+    return solver_class(num_of_variables, message=message, threads=threads)
@@ -1,37 +1,67 @@
 from __future__ import absolute_import
 import unittest
+import asyncio
+import copy
+import os
+import pickle
 import json
+import random
+import signal
+import subprocess
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations, count
 from collections import Counter
-from pydfs_lineup_optimizer import settings
+import numpy as np
+from pulp import LpSolverDefault
+from pydfs_lineup_optimizer import settings, parallel
 from pydfs_lineup_optimizer import get_optimizer
-from pydfs_lineup_optimizer.constants import Site, Sport
+from pydfs_lineup_optimizer.constants import Site, Sport, JSON_SPEC, DIVERSITY_CUTS
 from pydfs_lineup_optimizer.lineup_optimizer import LineupOptimizer
-from pydfs_lineup_optimizer.player import Player
+from pydfs_lineup_optimizer.player import Player, PlayerPool, copy_players
 from pydfs_lineup_optimizer.settings import LineupPosition
-from pydfs_lineup_optimizer.exceptions import LineupOptimizerException
+from pydfs_lineup_optimizer.exceptions import LineupOptimizerException, InvalidSportSpecified
 from pydfs_lineup_optimizer.utils import ratio
+from pydfs_lineup_optimizer.cache import spec_key, is_final_result
+from pydfs_lineup_optimizer.slots import get_slot_table, get_cover_table, assign_slots
+from pydfs_lineup_optimizer.diversity import DiversityCuts
+from pydfs_lineup_optimizer.lineup_index import LineupIndex, popcount
+from pydfs_lineup_optimizer.solvers import get_solver
+from pydfs_lineup_optimizer.server import OptimizerService, SolverWorker
+from pydfs_lineup_optimizer.registry import SlateRegistry
 
 
 class TestLineupOptimizer(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
-        with open('tests/players.json', 'r') as file:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'players.json'), 'r') as file:
             players_dict = json.loads(file.read())['players']
             players = [Player(
-                p['id'],
-                p['first_name'],
-                p['last_name'],
+                p['id'] or str(i + 1),
+                '{} {}'.format(p['first_name'], p['last_name']),
                 p['positions'],
                 p['team'],
+                '',
                 p['salary'],
                 p['fppg']
-            ) for p in players_dict]
+            ) for i, p in enumerate(players_dict)]
         cls.players = players
 
     def setUp(self):
         self.lineup_optimizer = LineupOptimizer(settings.DraftKingsBasketballSettings)
+        self.lineup_optimizer._site = Site.DRAFTKINGS
+        self.lineup_optimizer._sport = Sport.BASKETBALL
+        self.lineup_optimizer._solver = 'HIGHS'
         self.lineup_optimizer.load_players(self.players[:])
 
+    def load_players(self, players):
+        self.lineup_optimizer.load_players(self.players + players)
+
+    def optimize(self, num_of_lineups):
+        self.lineup_optimizer._num_of_lineups = num_of_lineups
+        return self.lineup_optimizer.optimize()
+
     def test_optimizer_positions_processing(self):
         positions = [
             LineupPosition('1', ('1', )),
@@ -75,24 +105,26 @@ class TestLineupOptimizer(unittest.TestCase):
 
     def test_add_player_with_many_positions(self):
         players = [
-            Player('', 'p1', 'p1', ['PG', 'SG'], 'DEN', 10, 200),
-            Player('', 'p2', 'p2', ['PG'], 'DEN', 10, 200),
-            Player('', 'p3', 'p3', ['PG'], 'DEN', 10, 200),
-            Player('', 'p4', 'p4', ['PG'], 'DEN', 10, 200),
-            Player('', 'p5', 'p5', ['PG', 'SG', 'SF'], 'DEN', 10, 200),
-            Player('', 'p6', 'p6', ['SF'], 'DEN', 10, 200),
-            Player('', 'p7', 'p7', ['SF'], 'DEN', 10, 190),
+            Player('p1', 'p1', ['PG', 'SG'], 'DEN', '', 10, 200),
+            Player('p2', 'p2', ['PG'], 'DEN', '', 10, 200),
+            Player('p3', 'p3', ['PG'], 'DEN', '', 10, 200),
+            Player('p4', 'p4', ['PG'], 'DEN', '', 10, 200),
+            Player('p5', 'p5', ['PG', 'SG', 'SF'], 'DEN', '', 10, 200),
+            Player('p6', 'p6', ['SF'], 'DEN', '', 10, 200),
+            Player('p7', 'p7', ['SF'], 'DEN', '', 10, 190),
         ]
-        self.lineup_optimizer._players.extend(players)
+        self.load_players(players)
         self.lineup_optimizer.add_player_to_lineup(players[0])
         self.lineup_optimizer.add_player_to_lineup(players[1])
         self.lineup_optimizer.add_player_to_lineup(players[2])
         self.lineup_optimizer.add_player_to_lineup(players[3])
-        lineup = next(self.lineup_optimizer.optimize(1))
-        self.assertTrue(all([p in lineup.players for p in players[:4]]))
+        lineup = self.optimize(1)[0]
+        ids = set(player.id for player in lineup.players)
+        self.assertTrue(all([p.id in ids for p in players[:4]]))
         self.lineup_optimizer.add_player_to_lineup(players[4])
-        lineup = next(self.lineup_optimizer.optimize(1))
-        self.assertTrue(all([p in lineup.players for p in players[:5]]))
+        lineup = self.optimize(1)[0]
+        ids = set(player.id for player in lineup.players)
+        self.assertTrue(all([p.id in ids for p in players[:5]]))
         num_of_selected_by_optimizer = len(list(filter(
             lambda p: 'C' in p.positions or 'PF' in p.positions, lineup.players
         )))
@@ -100,7 +132,7 @@ class TestLineupOptimizer(unittest.TestCase):
 
     def test_adding_player_with_salary_bigger_than_budget(self):
         self.lineup_optimizer.reset_lineup()
-        player = Player('', '', '', ['PG'], 'DEN', 100000, 2)
+        player = Player('', '', ['PG'], 'DEN', '', 100000, 2)
         with self.assertRaises(LineupOptimizerException):
             self.lineup_optimizer.add_player_to_lineup(player)
 
@@ -108,7 +140,7 @@ class TestLineupOptimizer(unittest.TestCase):
         self.lineup_optimizer.reset_lineup()
         players = []
         for i in 'abcd':
-            players.append(Player(i, i, i, ['PG'], 'DEN', 10, 2))
+            players.append(Player(i, i, ['PG'], 'DEN', '', 10, 2))
         for i in range(3):
             self.lineup_optimizer.add_player_to_lineup(players[i])
         with self.assertRaises(LineupOptimizerException):
@@ -117,11 +149,11 @@ class TestLineupOptimizer(unittest.TestCase):
     def test_remove_player_from_lineup(self):
         self.lineup_optimizer.reset_lineup()
         players = [
-            Player('', 'P', 'P', ['PG'], 'DEN', 10, 2),
-            Player('', 'C', 'C', ['PG'], 'DEN', 10, 2),
-            Player('', 'P', 'P', ['PG'], 'DEN', 10, 2),
+            Player('P1', 'P', ['PG'], 'DEN', '', 10, 2),
+            Player('C', 'C', ['PG'], 'DEN', '', 10, 2),
+            Player('P2', 'P', ['PG'], 'DEN', '', 10, 2),
         ]
-        self.lineup_optimizer._players.extend(players)
+        self.load_players(players)
         self.lineup_optimizer.add_player_to_lineup(players[0])
         self.lineup_optimizer.remove_player_from_lineup(players[0])
         self.assertEqual(len(self.lineup_optimizer._lineup), 0)
@@ -150,65 +182,70 @@ class TestLineupOptimizer(unittest.TestCase):
 
     def test_lineup_with_players_from_same_team(self):
         self.lineup_optimizer.reset_lineup()
-        lineup = next(self.lineup_optimizer.optimize(1, teams={'CAVS': 4, 'LAC': 4}))
-        self.assertEqual(len(list(filter(lambda x: x.team == 'CAVS', lineup.lineup))), 4)
-        self.assertEqual(len(list(filter(lambda x: x.team == 'LAC', lineup.lineup))), 4)
+        self.lineup_optimizer._teamConstraints = {'CAVS': [['=', 4]], 'LAC': [['=', 4]]}
+        lineup = self.optimize(1)[0]
+        self.assertEqual(len(list(filter(lambda x: x.team == 'CAVS', lineup.players))), 4)
+        self.assertEqual(len(list(filter(lambda x: x.team == 'LAC', lineup.players))), 4)
 
     def test_lineup_with_players_from_same_positions(self):
         self.lineup_optimizer.reset_lineup()
-        self.lineup_optimizer._players.extend([
-            Player('', 'p1', 'p1', ['C'], 'DEN', 10, 2),
-            Player('', 'p2', 'p2', ['C'], 'DEN', 10, 2),
+        self.load_players([
+            Player('p1', 'p1', ['C'], 'DEN', '', 10, 200),
+            Player('p2', 'p2', ['C'], 'DEN', '', 10, 200),
         ])
-        lineup = next(self.lineup_optimizer.optimize(1, positions={'C': 1}))
-        self.assertTrue(len(list(filter(lambda x: 'C' in x.positions, lineup.lineup))) >= 2)
+        lineup = self.optimize(1)[0]
+        self.assertTrue(len(list(filter(lambda x: 'C' in x.positions, lineup.players))) >= 2)
 
     def test_lineup_with_max_players(self):
         self.lineup_optimizer.reset_lineup()
         players = []
-        players.append(Player('', 'P', 'P', ['PG'], 'DEN', 10, 2))
-        players.append(Player('', 'P', 'P', ['SG'], 'DEN', 10, 2))
-        players.append(Player('', 'P', 'P', ['SF'], 'DEN', 10, 2))
-        players.append(Player('', 'P', 'P', ['PF'], 'DEN', 10, 2))
-        players.append(Player('', 'P', 'P', ['C'], 'DEN', 10, 2))
-        players.append(Player('', 'P', 'P', ['PG'], 'DEN', 10, 2))
-        players.append(Player('', 'P', 'P', ['PF'], 'DEN', 10, 2))
-        players.append(Player('', 'P', 'P', ['PG'], 'DEN', 10, 2))
+        players.append(Player('1', 'P', ['PG'], 'DEN', '', 10, 2))
+        players.append(Player('2', 'P', ['SG'], 'DEN', '', 10, 2))
+        players.append(Player('3', 'P', ['SF'], 'DEN', '', 10, 2))
+        players.append(Player('4', 'P', ['PF'], 'DEN', '', 10, 2))
+        players.append(Player('5', 'P', ['C'], 'DEN', '', 10, 2))
+        players.append(Player('6', 'P', ['PG'], 'DEN', '', 10, 2))
+        players.append(Player('7', 'P', ['PF'], 'DEN', '', 10, 2))
+        players.append(Player('8', 'P', ['PG'], 'DEN', '', 10, 2))
         for player in players:
             self.lineup_optimizer.add_player_to_lineup(player)
-        gen = self.lineup_optimizer.optimize(10)
-        self.assertEqual(len(list(gen)), 1)
+        self.assertEqual(len(self.optimize(10)), 1)
 
     def test_max_exposure(self):
         optimizer = self.lineup_optimizer
         players = [
-            Player('', 'p1', 'p1', ['PG', 'SG'], 'DEN', 10, 200, max_exposure=0.3),
-            Player('', 'p2', 'p2', ['PF', 'SF'], 'DEN', 10, 200),
-            Player('', 'p3', 'p3', ['C'], 'DEN', 100, 2, max_exposure=0.35),
-            Player('', 'p4', 'p4', ['PG'], 'DEN', 100, 2),
-            Player('', 'p5', 'p5', ['PF'], 'DEN', 100, 2, max_exposure=0),
-            Player('', 'p6', 'p6', ['SF'], 'DEN', 1, 2001, max_exposure=0),
+            Player('p1', 'p1', ['PG', 'SG'], 'DEN', '', 10, 200, max_exposure=0.3),
+            Player('p2', 'p2', ['PF', 'SF'], 'DEN', '', 10, 200),
+            Player('p3', 'p3', ['C'], 'DEN', '', 100, 2, max_exposure=0.35),
+            Player('p4', 'p4', ['PG'], 'DEN', '', 100, 2),
+            Player('p5', 'p5', ['PF'], 'DEN', '', 100, 2, max_exposure=0),
+            Player('p6', 'p6', ['SF'], 'DEN', '', 1, 2001, max_exposure=0),
         ]
-        optimizer._players.extend(players)
+        self.load_players(players)
         optimizer.add_player_to_lineup(players[2])
         optimizer.add_player_to_lineup(players[3])
         optimizer.add_player_to_lineup(players[4])
+        optimizer._max_exposure = 0.5
         lineups_with_players = [0 for _ in players]
-        for lineup in optimizer.optimize(10, max_exposure=0.5):
+        for lineup in self.optimize(10):
+            ids = set(player.id for player in lineup.players)
             for i, player in enumerate(players):
-                if player in lineup.players:
+                if player.id in ids:
                     lineups_with_players[i] += 1
+        # max exposure is kept for players selected by optimizer, locked players are in every lineup
         self.assertEqual(lineups_with_players[0], 3)
         self.assertEqual(lineups_with_players[1], 5)
-        self.assertEqual(lineups_with_players[2], 4)
-        self.assertEqual(lineups_with_players[3], 5)
-        self.assertEqual(lineups_with_players[4], 0)
+        self.assertEqual(lineups_with_players[2], 10)
+        self.assertEqual(lineups_with_players[3], 10)
+        self.assertEqual(lineups_with_players[4], 10)
         self.assertEqual(lineups_with_players[5], 0)
         self.assertEqual(optimizer.lineup, players[2:5])
 
     def test_randomness(self):
-        optimized_lineup = next(self.lineup_optimizer.optimize(1))
-        random_lineup = next(self.lineup_optimizer.optimize(1, randomness=True))
+        optimized_lineup = self.optimize(1)[0]
+        self.lineup_optimizer._randomness = True
+        # points are deviated for players of previous lineup, so first randomized lineup is optimized one
+        random_lineup = self.optimize(2)[1]
         self.assertTrue(optimized_lineup.fantasy_points_projection > random_lineup.fantasy_points_projection)
         self.assertTrue(
             random_lineup.fantasy_points_projection >
@@ -220,26 +257,29 @@ class TestLineupOptimizer(unittest.TestCase):
         optimizer = self.lineup_optimizer
         optimizer._max_from_one_team = max_from_one_team
         players = [
-            Player('', 'p1', 'p1', ['PG', 'SG'], 'DEN', 10, 200),
-            Player('', 'p2', 'p2', ['PF', 'SF'], 'DEN', 10, 200),
-            Player('', 'p3', 'p3', ['C'], 'DEN', 10, 200),
+            Player('p1', 'p1', ['PG', 'SG'], 'DEN', '', 10, 200),
+            Player('p2', 'p2', ['PF', 'SF'], 'DEN', '', 10, 200),
+            Player('p3', 'p3', ['C'], 'DEN', '', 10, 200),
         ]
-        optimizer._players.extend(players)
-        optimizer._available_teams.add('DEN')
-        lineup = next(optimizer.optimize(1))
+        self.load_players(players)
+        lineup = self.optimize(1)[0]
         team_counter = Counter([p.team for p in lineup.players])
         self.assertTrue(all([team_players <= max_from_one_team for team_players in team_counter.values()]))
-        with self.assertRaises(LineupOptimizerException):
-            next(optimizer.optimize(1, teams={'DEN': 3}))
+        optimizer._teamConstraints = {'DEN': [['=', 3]]}
+        self.assertEqual(self.optimize(1), [])
+        optimizer._teamConstraints = None
         optimizer.add_player_to_lineup(players[0])
         with self.assertRaises(LineupOptimizerException):
             optimizer.add_player_to_lineup(players[1])
 
     def test_get_optimizer(self):
-        optimizer = get_optimizer(Site.YAHOO, Sport.FOOTBALL)
-        self.assertEqual(optimizer._settings, settings.YahooFootballSettings)
-        with self.assertRaises(NotImplementedError):
-            get_optimizer(Site.DRAFTKINGS, 'Some sport')
+        spec = {'site': Site.DRAFTKINGS, 'sport': Sport.FOOTBALL,
+                'players': [{'id': '1', 'fullName': 'p1', 'position': 'QB', 'fppg': 20, 'salary': 5000,
+                             'team': 'DEN', 'opponent': 'KC'}]}
+        optimizer = get_optimizer(spec)
+        self.assertEqual(optimizer._settings, settings.DraftKingsFootballSettings)
+        with self.assertRaises(InvalidSportSpecified):
+            get_optimizer(dict(spec, sport='Some sport'))
 
     def test_ratio(self):
         threshold = 0.8
@@ -249,6 +289,851 @@ class TestLineupOptimizer(unittest.TestCase):
         self.assertFalse(ratio('Hood', 'Blake Griffin') >= threshold)
 
 
+SPEC_POSITIONS = {
+    (Site.DRAFTKINGS, Sport.BASKETBALL): ['PG', 'SG', 'SF', 'PF', 'C', 'PG/SG', 'SG/SF', 'SF/PF', 'PF/C'],
+    (Site.DRAFTKINGS, Sport.BASEBALL): ['P', 'P', 'C', '1B', '2B', '3B', 'SS', 'OF', 'OF', '1B/OF', '2B/SS', 'C/1B'],
+    (Site.FANDUEL, Sport.BASKETBALL): ['PG', 'SG', 'SF', 'PF', 'C', 'PG/SG', 'SF/PF', 'PF/C'],
+    (Site.DRAFTKINGS, Sport.FOOTBALL): ['QB', 'RB', 'RB', 'WR', 'WR', 'WR', 'TE', 'DST'],
+}
+
+
+def get_spec(site, sport, num_of_players, seed=1, integer_points=False, **options):
+    """
+    Return spec with random players pool of 8 teams, positions of players are taken in turn from SPEC_POSITIONS.
+    """
+    rand = random.Random(seed)
+    positions = SPEC_POSITIONS.get((site, sport), ['PG', 'SG', 'SF', 'PF', 'C'])
+    players = []
+    for i in range(num_of_players):
+        points = rand.randint(10, 30) if integer_points else round(rand.uniform(5, 50), 1)
+        players.append({
+            'id': str(i + 1),
+            'fullName': 'Player {}'.format(i + 1),
+            'position': positions[i % len(positions)],
+            'fppg': points,
+            'salary': rand.randrange(3000, 11000, 100),
+            'team': 'T{}'.format(i % 8),
+            'opponent': 'T{}'.format(i % 8 ^ 1),
+        })
+    spec = {'site': site, 'sport': sport, 'players': players}
+    spec.update(options)
+    return spec
+
+
+def get_mixed_spec(site, sport, num_of_players, **options):
+    """
+    Return spec where every team has players of all positions and points of players differ,
+    so optimal lineups are unique.
+    """
+    spec = get_spec(site, sport, num_of_players, **options)
+    positions = SPEC_POSITIONS[(site, sport)]
+    for i, player in enumerate(spec['players']):
+        team = i // len(positions) % 8
+        player['team'] = 'T{}'.format(team)
+        player['opponent'] = 'T{}'.format(team ^ 1)
+        player['fppg'] = round(player['fppg'] + i * 0.001, 3)
+    return spec
+
+
+def get_points(lineups):
+    return [round(sum(player.fppg for player in lineup.players), 3) for lineup in lineups]
+
+
+def get_masks(lineup, position_masks):
+    """
+    Return masks of places which players with passed positions can fill.
+    """
+    masks = []
+    for positions in lineup:
+        mask = 0
+        for position in positions:
+            mask |= position_masks.get(position, 0)
+        masks.append(mask)
+    return masks
+
+
+def get_ids(lineups):
+    return [frozenset(player.id for player in lineup.players) for lineup in lineups]
+
+
+class TestSolverBackends(unittest.TestCase):
+    def test_same_lineups_of_all_backends(self):
+        spec = get_spec(Site.FANDUEL, Sport.BASKETBALL, 40, numberOfLineups=10)
+        highs = get_optimizer(dict(spec, solver='HIGHS')).optimize()
+        self.assertEqual(len(highs), 10)
+        for solver in ('BNB', 'CBC'):
+            lineups = get_optimizer(dict(spec, solver=solver)).optimize()
+            self.assertEqual(get_points(lineups), get_points(highs), solver)
+            self.assertEqual(get_ids(lineups), get_ids(highs), solver)
+
+    def test_persistent_model_same_as_rebuilt_model(self):
+        # points of lineups tie, so cuts of lineups with same points are removed and bound of points is changed
+        spec = get_spec(Site.FANDUEL, Sport.BASKETBALL, 40, integer_points=True, numberOfLineups=12)
+        for solver in ('CBC', 'HIGHS', 'BNB'):
+            rebuilt = get_optimizer(dict(spec, solver=solver, persistentModel=False)).optimize()
+            persistent = get_optimizer(dict(spec, solver=solver, persistentModel=True)).optimize()
+            self.assertTrue(len(set(get_points(rebuilt))) < len(rebuilt))
+            self.assertEqual(get_points(persistent), get_points(rebuilt), solver)
+            self.assertEqual(len(set(get_ids(persistent))), len(persistent), solver)
+
+    def test_warm_start_doesnt_change_lineups(self):
+        spec = get_spec(Site.DRAFTKINGS, Sport.FOOTBALL, 50, numberOfLineups=8)
+        for solver in ('CBC', 'HIGHS'):
+            for options in ({}, {'numberOfUniquePlayers': 3}):
+                cold = get_optimizer(dict(spec, solver=solver, warmStart=False, **options)).optimize()
+                warm = get_optimizer(dict(spec, solver=solver, warmStart=True, **options)).optimize()
+                self.assertEqual(get_points(warm), get_points(cold), (solver, options))
+
+    def test_time_limit_and_mip_gap_of_solver_commands(self):
+        glpk = get_solver('GLPK', 3)
+        self.assertIsNone(glpk.get_pulp_solver().timeLimit)
+        glpk.set_mip_gap(0.05)
+        # glpsol takes only whole seconds
+        for seconds, whole_seconds in ((0.2, 1), (2.5, 3), (3, 3)):
+            glpk.set_time_limit(seconds)
+            command = glpk.get_pulp_solver()
+            self.assertEqual(command.timeLimit, whole_seconds)
+            self.assertEqual(command.options, ['--mipgap', '0.05'])
+        for name in ('CBC', 'COIN'):
+            solver = get_solver(name, 3)
+            solver.set_time_limit(2.5)
+            solver.set_mip_gap(0.05)
+            command = solver.get_pulp_solver()
+            self.assertEqual(command.timeLimit, 2.5, name)
+            self.assertEqual(command.optionsDict['gapRel'], 0.05, name)
+
+    def test_gap_of_lineups(self):
+        spec = get_spec(Site.DRAFTKINGS, Sport.FOOTBALL, 60, numberOfLineups=5, timeLimit=60)
+        for solver in ('HIGHS', 'BNB', 'CBC'):
+            for mip_gap in (0, 0.02):
+                lineups = get_optimizer(dict(spec, solver=solver, mipGap=mip_gap)).optimize()
+                self.assertEqual(len(lineups), 5, solver)
+                for lineup in lineups:
+                    self.assertIsNotNone(lineup.gap, solver)
+                    self.assertLessEqual(lineup.gap, mip_gap + 1e-9, solver)
+
+    def test_pulp_rows_are_removed_and_changed(self):
+        solver = get_solver('CBC', 3)
+        solver.set_objective([1, 2, 3])
+        solver.add_constraint({0: 1, 1: 1, 2: 1}, '<=', 2)
+        cut = solver.add_constraint({1: 1, 2: 1}, '<=', 1)
+        with warnings.catch_warnings():
+            warnings.filterwarnings('error', 'Using LpProblem.constraints', DeprecationWarning)
+            self.assertEqual(solver.solve(), [0, 2])
+            solver.change_rhs(cut, 2)
+            self.assertEqual(solver.solve(), [1, 2])
+            solver.change_rhs(cut, 0)
+            solver.remove_constraint(cut)
+            self.assertEqual(solver.solve(), [1, 2])
+
+
+class TestPresolve(unittest.TestCase):
+    def get_spec(self, site, sport, num_of_players=200, num_of_lineups=8, **options):
+        return get_mixed_spec(site, sport, num_of_players, solver='HIGHS', numberOfLineups=num_of_lineups, **options)
+
+    def assert_same_as_without_presolve(self, spec):
+        optimizer = get_optimizer(dict(spec, presolve=True))
+        lineups = optimizer.optimize()
+        self.assertGreater(optimizer.presolve_report.total_removed, 0)
+        without_presolve = get_optimizer(dict(spec, presolve=False)).optimize()
+        self.assertEqual(len(lineups), spec['numberOfLineups'])
+        self.assertEqual(get_points(lineups), get_points(without_presolve))
+        self.assertEqual(get_ids(lineups), get_ids(without_presolve))
+
+    def test_same_lineups_without_rules(self):
+        for site, sport in ((Site.FANDUEL, Sport.BASKETBALL), (Site.DRAFTKINGS, Sport.BASKETBALL),
+                            (Site.DRAFTKINGS, Sport.FOOTBALL)):
+            self.assert_same_as_without_presolve(self.get_spec(site, sport))
+
+    def test_same_lineups_with_team_limits(self):
+        # dominators are counted only from same team with rules, so bigger pool is needed for removing players
+        spec = self.get_spec(Site.FANDUEL, Sport.BASKETBALL, 400, 3,
+                             minMaxPlayersFromTeam=[{'teamName': 'T1', 'minPlayers': 3},
+                                                    {'teamName': 'T2', 'maxPlayers': 1}])
+        self.assert_same_as_without_presolve(spec)
+
+    def test_same_lineups_with_stacks_and_opponent_rules(self):
+        for options in ({'stacking': [{'stackType': 'QB_WR'}]}, {'stacking': [{'stackType': 'RB_D'}]},
+                        {'stacking': [{'stackType': 'QB_WR_TE'}], 'no_def_vs_opp_players': True}):
+            self.assert_same_as_without_presolve(self.get_spec(Site.DRAFTKINGS, Sport.FOOTBALL, 400, 3, **options))
+        spec = self.get_spec(Site.DRAFTKINGS, Sport.BASEBALL, 400, 3, noBattersVsPitchers=True)
+        self.assert_same_as_without_presolve(spec)
+
+
+class TestLazyRules(unittest.TestCase):
+    def assert_same_as_eager_rules(self, site, sport, num_of_lineups=5, **options):
+        spec = get_mixed_spec(site, sport, 120, solver='HIGHS', numberOfLineups=num_of_lineups)
+        lineups = get_optimizer(dict(spec, lazyRules=True, **options)).optimize()
+        eager = get_optimizer(dict(spec, lazyRules=False, **options)).optimize()
+        self.assertEqual(len(lineups), num_of_lineups)
+        self.assertEqual(get_points(lineups), get_points(eager))
+        # lineups with same points can be found in other order
+        self.assertEqual(set(get_ids(lineups)), set(get_ids(eager)))
+        # rules must change lineups, otherwise lazy rows are never added
+        self.assertNotEqual(get_ids(eager), get_ids(get_optimizer(spec).optimize()))
+
+    def test_same_lineups_with_team_limits(self):
+        self.assert_same_as_eager_rules(Site.FANDUEL, Sport.BASKETBALL,
+                                        minMaxPlayersFromTeam=[{'teamName': 'T7', 'minPlayers': 3}])
+        self.assert_same_as_eager_rules(Site.DRAFTKINGS, Sport.FOOTBALL, minMaxPlayersFromTeam=[
+            {'teamName': 'T7', 'maxPlayers': 1}, {'teamName': 'T6', 'maxPlayers': 1}])
+
+    def test_same_lineups_with_opponent_rules(self):
+        self.assert_same_as_eager_rules(Site.DRAFTKINGS, Sport.FOOTBALL, no_def_vs_opp_players=True)
+        self.assert_same_as_eager_rules(Site.DRAFTKINGS, Sport.BASEBALL, noBattersVsPitchers=True)
+
+    def test_same_lineups_with_stacks(self):
+        for stack_type in ('QB_WR', 'RB_D', 'QB_WR_TE'):
+            self.assert_same_as_eager_rules(Site.DRAFTKINGS, Sport.FOOTBALL, stacking=[{'stackType': stack_type}])
+
+    def test_same_lineups_with_unique_players(self):
+        self.assert_same_as_eager_rules(Site.DRAFTKINGS, Sport.FOOTBALL, 8, numberOfUniquePlayers=2,
+                                        stacking=[{'stackType': 'QB_WR'}], no_def_vs_opp_players=True)
+
+
+class TestMultiPositionLineups(unittest.TestCase):
+    def test_cover_table_allows_only_assignable_lineups(self):
+        for settings_class in (settings.DraftKingsBasketballSettings, settings.DraftKingsBaseballSettings):
+            names, position_masks = get_slot_table(settings_class)
+            positions = list(position_masks) + ['PG/SF', 'SG/PF', 'SF/PF', '1B/OF', '2B/SS', 'C/1B']
+            positions = [position for position in positions if set(position.split('/')) <= set(position_masks)]
+            rand = random.Random(1)
+            for _ in range(300):
+                lineup = [set(rand.choice(positions).split('/')) for _ in names]
+                masks = get_masks(lineup, position_masks)
+                covered = all(sum(1 for player in lineup if player & set(key)) >= min_value
+                              for key, min_value in get_cover_table(settings_class))
+                self.assertEqual(covered, assign_slots(masks, len(names)) is not None, lineup)
+
+    def test_best_lineup_with_multi_position_players(self):
+        # rows of position pairs and triples cut off best lineups of pools 5 and 6
+        names, position_masks = get_slot_table(settings.DraftKingsBasketballSettings)
+        for seed in range(1, 8):
+            spec = get_spec(Site.DRAFTKINGS, Sport.BASKETBALL, 14, seed=seed, solver='HIGHS', numberOfLineups=1)
+            best = None
+            for players in combinations(spec['players'], len(names)):
+                if sum(player['salary'] for player in players) > 50000:
+                    continue
+                masks = get_masks([player['position'].split('/') for player in players], position_masks)
+                if assign_slots(masks, len(names)) is not None:
+                    points = round(sum(player['fppg'] for player in players), 3)
+                    best = points if best is None else max(best, points)
+            lineups = get_optimizer(spec).optimize()
+            self.assertEqual(get_points(lineups[:1]), [best] if best is not None else [], seed)
+
+    def test_multi_position_lineups_are_sorted(self):
+        # rows of position pairs and triples let through lineup of NBA pool 3 which players can't fill
+        for sport in (Sport.BASKETBALL, Sport.BASEBALL):
+            for seed in range(1, 6):
+                spec = get_spec(Site.DRAFTKINGS, sport, 60, seed=seed, solver='HIGHS', numberOfLineups=10)
+                self.assertEqual(len(get_optimizer(spec).optimize()), 10, (sport, seed))
+
+
+class TestOptimizationRun(unittest.TestCase):
+    POOL_ARRAYS = ('salary', 'fppg', 'real_points', 'deviated_fppg', 'is_injured', 'max_exposure', 'force', 'exclude',
+                   'num_of_lineups')
+
+    def get_spec(self, **options):
+        options = dict({'solver': 'HIGHS', 'numberOfLineups': 6}, **options)
+        spec = get_spec(Site.DRAFTKINGS, Sport.FOOTBALL, 40, **options)
+        spec['players'][0]['force'] = True
+        spec['players'][1]['maxExposure'] = 0.5
+        spec['players'][2]['exclude'] = True
+        return spec
+
+    def test_pool_is_unchanged_by_optimize(self):
+        for options in ({}, {'variation': 0.1}, {'kBest': True}, {'numberOfUniquePlayers': 3}):
+            optimizer = get_optimizer(self.get_spec(**options))
+            pool = optimizer.players[0]._pool
+            arrays = dict((name, getattr(pool, name).copy()) for name in self.POOL_ARRAYS)
+            provider_positions = list(pool.provider_positions)
+            self.assertEqual(len(optimizer.optimize()), 6, options)
+            for name, values in arrays.items():
+                np.testing.assert_array_equal(getattr(pool, name), values, '{} {}'.format(name, options))
+            self.assertEqual(pool.provider_positions, provider_positions, options)
+
+    def test_repeated_and_concurrent_runs_give_same_lineups(self):
+        optimizer = get_optimizer(self.get_spec())
+        lineups = optimizer.optimize()
+        self.assertEqual(len(lineups), 6)
+        self.assertEqual(get_ids(optimizer.optimize()), get_ids(lineups))
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(lambda _: optimizer.optimize(), range(4)))
+        for result in results:
+            self.assertEqual(get_ids(result), get_ids(lineups))
+            self.assertEqual(get_points(result), get_points(lineups))
+
+    def test_default_pulp_solver_is_unchanged(self):
+        options = dict(LpSolverDefault.optionsDict)
+        msg, time_limit = LpSolverDefault.msg, LpSolverDefault.timeLimit
+        spec = self.get_spec(solver='CBC', thrads=2, mipGap=0.01, timeLimit=60, message=1)
+        self.assertEqual(len(get_optimizer(spec).optimize()), 6)
+        self.assertEqual(LpSolverDefault.optionsDict, options)
+        self.assertEqual((LpSolverDefault.msg, LpSolverDefault.timeLimit), (msg, time_limit))
+
+
+class TestKBestLineups(unittest.TestCase):
+    def assert_same_as_sequential(self, spec):
+        sequential = get_optimizer(spec).optimize()
+        k_best = get_optimizer(dict(spec, kBest=True)).optimize()
+        self.assertEqual(len(sequential), spec['numberOfLineups'])
+        self.assertEqual(get_points(k_best), get_points(sequential))
+        self.assertEqual(len(set(frozenset(player.id for player in lineup.players) for lineup in k_best)),
+                         len(k_best))
+
+    def test_same_points_as_sequential_lineups(self):
+        for solver in ('BNB', 'CBC'):
+            self.assert_same_as_sequential(get_spec(Site.FANDUEL, Sport.BASKETBALL, 60, solver=solver,
+                                                    numberOfLineups=20))
+
+    def test_same_points_as_sequential_lineups_with_ties(self):
+        spec = get_spec(Site.FANDUEL, Sport.BASKETBALL, 60, integer_points=True, solver='BNB', numberOfLineups=30)
+        points = get_points(get_optimizer(spec).optimize())
+        self.assertTrue(len(set(points)) < len(points))
+        self.assert_same_as_sequential(spec)
+
+    def test_same_points_as_sequential_lineups_with_flex_and_ties(self):
+        self.assert_same_as_sequential(get_spec(Site.DRAFTKINGS, Sport.FOOTBALL, 80, integer_points=True,
+                                                solver='BNB', numberOfLineups=30))
+
+    def test_same_points_as_sequential_lineups_with_forced_and_locked_players(self):
+        spec = get_spec(Site.FANDUEL, Sport.BASKETBALL, 40, solver='HIGHS', numberOfLineups=10)
+        spec['players'][3]['force'] = True
+        self.assert_same_as_sequential(spec)
+        spec['players'][3]['force'] = False
+        results = []
+        for k_best in (False, True):
+            optimizer = get_optimizer(dict(spec, kBest=k_best))
+            optimizer.add_player_to_lineup(optimizer.players[0])
+            lineups = optimizer.optimize()
+            self.assertEqual(len(lineups), 10)
+            self.assertEqual(len(set(get_ids(lineups))), 10)
+            self.assertTrue(all('1' in ids for ids in get_ids(lineups)))
+            results.append(get_points(lineups))
+        self.assertEqual(results[0], results[1])
+
+
+class TestPortfolio(unittest.TestCase):
+    def test_portfolio_keeps_caps_and_isnt_worse_than_sequential(self):
+        improved = 0
+        for site, sport, num_of_players in ((Site.FANDUEL, Sport.BASKETBALL, 40), (Site.FANDUEL, Sport.BASKETBALL, 60),
+                                            (Site.DRAFTKINGS, Sport.FOOTBALL, 40)):
+            spec = get_spec(site, sport, num_of_players, solver='HIGHS', numberOfLineups=10, maxExposure=0.3)
+            spec['players'][0]['maxExposure'] = 0.1
+            sequential = get_optimizer(spec).optimize()
+            portfolio = get_optimizer(dict(spec, portfolio=True)).optimize()
+            usage = Counter(player.id for lineup in portfolio for player in lineup.players)
+            self.assertLessEqual(usage.get('1', 0), 1)
+            self.assertLessEqual(max(usage.values()), 3)
+            self.assertEqual(len(set(get_ids(portfolio))), len(portfolio))
+            self.assertGreaterEqual((len(portfolio), sum(get_points(portfolio))),
+                                    (len(sequential), sum(get_points(sequential))))
+            if len(portfolio) > len(sequential) or sum(get_points(portfolio)) > sum(get_points(sequential)) + 1e-6:
+                improved += 1
+        self.assertGreater(improved, 0)
+
+
+class TestDiversityCuts(unittest.TestCase):
+    def test_same_points_in_all_modes(self):
+        spec = get_spec(Site.DRAFTKINGS, Sport.FOOTBALL, 50, solver='HIGHS', numberOfLineups=10,
+                        numberOfUniquePlayers=3)
+        eager = get_optimizer(dict(spec, diversityCuts=DIVERSITY_CUTS.EAGER)).optimize()
+        self.assertEqual(len(eager), 10)
+        lineups = get_optimizer(dict(spec, diversityCuts=DIVERSITY_CUTS.LAZY)).optimize()
+        self.assertEqual(get_points(lineups), get_points(eager))
+        ids = [set(player.id for player in lineup.players) for lineup in lineups]
+        for i, j in combinations(range(len(ids)), 2):
+            self.assertLessEqual(len(ids[i] & ids[j]), 9 - 3)
+
+    def test_randomized_lineups_are_unique(self):
+        for multi_entry in (False, True):
+            spec = get_spec(Site.DRAFTKINGS, Sport.FOOTBALL, 40, solver='HIGHS', numberOfLineups=20, variation=0.05,
+                            multiEntry=multi_entry)
+            lineups = get_optimizer(spec).optimize()
+            self.assertEqual(len(lineups), 20)
+            self.assertEqual(len(set(frozenset(player.id for player in lineup.players) for lineup in lineups)), 20)
+
+    def test_parallel_lineups_have_unique_players(self):
+        spec = get_spec(Site.DRAFTKINGS, Sport.FOOTBALL, 50, solver='HIGHS', numberOfLineups=12, variation=0.05,
+                        numberOfUniquePlayers=3, parallelWorkers=2)
+        # lineups over max number of cut lineups are still cut off by workers
+        for max_cut_lineups in (parallel.MAX_CUT_LINEUPS, 2):
+            default, parallel.MAX_CUT_LINEUPS = parallel.MAX_CUT_LINEUPS, max_cut_lineups
+            try:
+                lineups = get_optimizer(spec).optimize()
+            finally:
+                parallel.MAX_CUT_LINEUPS = default
+            self.assertEqual(len(lineups), 12)
+            ids = [set(player.id for player in lineup.players) for lineup in lineups]
+            for i, j in combinations(range(len(ids)), 2):
+                self.assertLessEqual(len(ids[i] & ids[j]), 9 - 3)
+
+    def test_lazy_cuts_are_removed_after_window(self):
+        class ConstraintsSolver(object):
+            def __init__(self):
+                self.constraints = {}
+                self.keys = count()
+
+            def add_constraint(self, coefficients, sign, rhs):
+                key = next(self.keys)
+                self.constraints[key] = (coefficients, sign, rhs)
+                return key
+
+            def remove_constraint(self, key):
+                del self.constraints[key]
+
+        solver = ConstraintsSolver()
+        cuts = DiversityCuts(1000, 2, DIVERSITY_CUTS.LAZY)
+        cuts.attach(solver)
+        first_cut = {0: 1, 1: 1, 2: 1}
+        cuts.add_lineup([0, 1, 2])
+        self.assertEqual([c[0] for c in solver.constraints.values()], [first_cut])
+        self.assertFalse(cuts.separate([0, 1, 3]))
+        lineups = ([3 * i, 3 * i + 1, 3 * i + 2] for i in count(1))
+        for _ in range(cuts.window + 1):
+            cuts.add_lineup(next(lineups))
+        # only cuts of window of last lineups stay in model
+        self.assertNotIn(first_cut, [c[0] for c in solver.constraints.values()])
+        self.assertEqual(len(solver.constraints), cuts.window + 1)
+        for _ in range(cuts.window * 3):
+            cuts.add_lineup(next(lineups))
+        self.assertEqual(len(solver.constraints), cuts.window + 1)
+        # cut which is violated again after removing is kept twice longer
+        self.assertTrue(cuts.separate([0, 1, 2]))
+        for _ in range(cuts.window + 1):
+            cuts.add_lineup(next(lineups))
+        self.assertIn(first_cut, [c[0] for c in solver.constraints.values()])
+        for _ in range(cuts.window):
+            cuts.add_lineup(next(lineups))
+        self.assertNotIn(first_cut, [c[0] for c in solver.constraints.values()])
+        # cuts which are tight for next lineups stay in model
+        solver = ConstraintsSolver()
+        cuts = DiversityCuts(1000, 1, DIVERSITY_CUTS.LAZY)
+        cuts.attach(solver)
+        for i in range(cuts.window * 2):
+            cuts.add_lineup([0, 2 * i + 1, 2 * i + 2])
+        self.assertEqual(len(solver.constraints), cuts.window * 2)
+
+    def test_lazy_cuts_of_new_solver(self):
+        class ConstraintsSolver(object):
+            def __init__(self):
+                self.constraints = {}
+                self.keys = count()
+
+            def add_constraint(self, coefficients, sign, rhs):
+                key = next(self.keys)
+                self.constraints[key] = coefficients
+                return key
+
+            def remove_constraint(self, key):
+                del self.constraints[key]
+
+        lineups = [[3 * i, 3 * i + 1, 3 * i + 2] for i in range(10)]
+        for mode, expected in ((DIVERSITY_CUTS.EAGER, lineups), (DIVERSITY_CUTS.LAZY, lineups[-4:])):
+            cuts = DiversityCuts(30, 2, mode, window=4)
+            cuts.attach(ConstraintsSolver())
+            for lineup in lineups:
+                cuts.add_lineup(lineup)
+            solver = ConstraintsSolver()
+            cuts.attach(solver)
+            self.assertEqual(list(solver.constraints.values()), [dict((i, 1) for i in lineup) for lineup in expected])
+
+
+class TestLineupIndex(unittest.TestCase):
+    def get_lineups(self, num_of_players, num_of_lineups, size=9, seed=1):
+        rand = random.Random(seed)
+        return [rand.sample(range(num_of_players), size) for _ in range(num_of_lineups)]
+
+    def test_queries_match_set_intersection(self):
+        # lineups span several words of bitsets and index grows past its initial capacity
+        for num_of_players in (20, 64, 65, 150, 300):
+            lineups = self.get_lineups(num_of_players, 60)
+            lineups.append(list(range(num_of_players - 9, num_of_players)))
+            lineups.append(list(reversed(lineups[0])))
+            index = LineupIndex(num_of_players)
+            taken = []
+            for lineup in lineups:
+                self.assertEqual(index.add(lineup), set(lineup) not in taken)
+                if set(lineup) not in taken:
+                    taken.append(set(lineup))
+            self.assertEqual(len(index), len(taken))
+            for position, lineup in enumerate(taken):
+                self.assertEqual(set(index.get_lineup(position).tolist()), lineup)
+            for candidate in self.get_lineups(num_of_players, 40, seed=2) + lineups:
+                overlaps = [len(set(candidate) & lineup) for lineup in taken]
+                self.assertEqual(index.get_overlaps(candidate).tolist(), overlaps)
+                self.assertEqual(index.get_max_overlap(candidate), max(overlaps))
+                position = taken.index(set(candidate)) if set(candidate) in taken else None
+                self.assertEqual(index.find(list(reversed(candidate))), position)
+                self.assertEqual(candidate in index, position is not None)
+            candidates = self.get_lineups(num_of_players, 40, seed=3)
+            for max_common_players in (0, 1, 3):
+                self.assertEqual(index.filter(candidates, max_common_players), [
+                    candidate for candidate in candidates
+                    if all(len(set(candidate) & lineup) <= max_common_players for lineup in taken)])
+
+    def test_empty_index(self):
+        index = LineupIndex(150)
+        self.assertEqual(index.get_max_overlap([0, 149]), 0)
+        self.assertEqual(index.get_overlaps([0, 149]).tolist(), [])
+        self.assertIsNone(index.find([0, 149]))
+
+    def test_popcount_of_bytes(self):
+        words = np.array([[0, 1, 2 ** 64 - 1], [2 ** 63, 3, 2 ** 32 + 7]], dtype=np.uint64)
+        expected = [sum(bin(int(word)).count('1') for word in row) for row in words]
+        self.assertEqual(popcount(words).tolist(), expected)
+        bitwise_count = getattr(np, 'bitwise_count', None)
+        if bitwise_count is not None:
+            del np.bitwise_count
+        try:
+            self.assertEqual(popcount(words).tolist(), expected)
+        finally:
+            if bitwise_count is not None:
+                np.bitwise_count = bitwise_count
+
+
+class TestCacheKeys(unittest.TestCase):
+    def test_randomized_spec_has_no_key(self):
+        spec = get_spec(Site.FANDUEL, Sport.BASKETBALL, 20, numberOfLineups=5)
+        self.assertIsNotNone(spec_key(spec))
+        self.assertEqual(spec_key(spec), spec_key(dict(spec, **{JSON_SPEC.SPEC_ID: 'other', JSON_SPEC.THREADS: 2})))
+        self.assertIsNone(spec_key(dict(spec, **{JSON_SPEC.VARIATION: 10})))
+
+    def test_result_cut_short_by_deadline_is_not_final(self):
+        spec = get_spec(Site.FANDUEL, Sport.BASKETBALL, 20, numberOfLineups=5)
+        self.assertTrue(is_final_result(spec, 3, float('inf')))
+        spec[JSON_SPEC.TIME_LIMIT] = 10
+        self.assertTrue(is_final_result(spec, 5, 0.0))
+        self.assertFalse(is_final_result(spec, 4, 0.0))
+        self.assertFalse(is_final_result(spec, 5, 0.001))
+        self.assertFalse(is_final_result(spec, 5, float('inf')))
+        self.assertTrue(is_final_result(dict(spec, **{JSON_SPEC.MIP_GAP: 0.01}), 5, 0.001))
+
+
+class TestPlayerPool(unittest.TestCase):
+    # attributes of players before they became views of pool rows
+    PLAYER_KEYS = {'id', 'full_name', 'positions', 'team', 'opponent', 'salary', 'fppg', 'is_injured', '_max_exposure',
+                   'exclude', 'force', 'provider_position', 'real_points'}
+
+    def setUp(self):
+        self.pool = PlayerPool([
+            ('1', 'Player 1', ['PG'], 'lal', 'bos', 5000, 20.5, False, None, False, False),
+            ('2', 'Player 2', ['PG', 'SG'], 'LAL', 'BOS', 6000, 30.0, True, 50, True, False),
+            ('3', 'Player 3', ['PG'], 'bos', 'lal', 7000, 25.0, False, 0.3, False, True),
+        ])
+
+    def test_teams_and_positions_are_interned(self):
+        pool = self.pool
+        self.assertEqual(pool.team_names, ['LAL', 'BOS'])
+        self.assertEqual(pool.teams.tolist(), [0, 0, 1])
+        self.assertEqual(pool.opponents.tolist(), [1, 1, 0])
+        self.assertIs(pool.positions[0], pool.positions[2])
+        self.assertEqual(pool.position_masks.tolist(), [1, 3, 1])
+        self.assertEqual([player.team for player in pool.players], ['LAL', 'LAL', 'BOS'])
+        self.assertEqual(pool.players[1].max_exposure, 0.5)
+        self.assertIsNone(pool.players[0].max_exposure)
+        # values of players are python values, not numpy scalars
+        self.assertIs(type(pool.players[0].salary), int)
+        self.assertIs(type(pool.players[0].fppg), float)
+        self.assertIs(type(pool.players[1].is_injured), bool)
+
+    def test_copies_are_detached_from_pool(self):
+        player = self.pool.players[1]
+        for copied in (copy.copy(player), copy.deepcopy(player), copy_players(self.pool.players[1:])[0],
+                       copy_players([player, Player('4', 'Player 4', ['C'], 'NYK', 'BKN', 3000, 10)])[0]):
+            copied.provider_position = 'SG'
+            copied.fppg = 1000
+            copied.num_of_lineups += 1
+            copied.team = 'NYK'
+            copied.max_exposure = None
+            self.assertEqual(copied.to_dict()['team'], 'NYK')
+            self.assertEqual((player.provider_position, player.fppg, player.num_of_lineups, player.team,
+                              player.max_exposure), ('PG', 30.0, 0, 'LAL', 0.5))
+        self.assertEqual(self.pool.team_names, ['LAL', 'BOS'])
+
+    def test_serialized_players_keep_keys(self):
+        player = self.pool.players[1]
+        data = json.loads(json.dumps(player, default=Player.jdefault))
+        self.assertEqual(set(data), self.PLAYER_KEYS)
+        self.assertEqual(data['_max_exposure'], 0.5)
+        self.assertEqual(data['positions'], ['PG', 'SG'])
+        # run state is added only when it's set, like attributes of plain players were
+        player.num_of_lineups = 2
+        player.deviated_fppg = 31.5
+        data = json.loads(json.dumps(player, default=Player.jdefault))
+        self.assertEqual(set(data), self.PLAYER_KEYS | {'num_of_lineups', 'deviated_fppg'})
+        restored = pickle.loads(pickle.dumps(player))
+        self.assertEqual(restored.to_dict(), player.to_dict())
+        restored.fppg = 0
+        self.assertEqual(player.fppg, 30.0)
+
+
+class TestSlateRegistry(unittest.TestCase):
+    # options of players as positions of players in pool: force, exclude and max exposure
+    PLAYER_OPTIONS = ({}, {0: {'force': True}}, {1: {'exclude': True}}, {2: {'maxExposure': 0.5}},
+                      {0: {'force': True}, 1: {'exclude': True}},
+                      {0: {'force': True}, 1: {'exclude': True}, 2: {'maxExposure': 0.5}})
+
+    def get_spec(self, site, sport, player_options=None, **options):
+        spec = get_mixed_spec(site, sport, 30, solver='HIGHS', numberOfLineups=3, **options)
+        for i, player_options in (player_options or {}).items():
+            spec['players'][i].update(player_options)
+        return spec
+
+    def assert_same_as_without_registry(self, spec, registry):
+        lineups = get_optimizer(spec, registry).optimize()
+        expected = get_optimizer(spec).optimize()
+        self.assertTrue(expected)
+        self.assertEqual(get_points(lineups), get_points(expected), spec)
+        self.assertEqual(get_ids(lineups), get_ids(expected), spec)
+
+    def test_same_lineups_as_without_registry(self):
+        registry = SlateRegistry()
+        rules = ({}, {'numberOfUniquePlayers': 3}, {'numberOfUniquePlayers': 2, 'diversityCuts': DIVERSITY_CUTS.LAZY},
+                 {'maxExposure': 0.5}, {'presolve': False}, {'kBest': True})
+        slates = ((Site.FANDUEL, Sport.BASKETBALL), (Site.DRAFTKINGS, Sport.BASKETBALL),
+                  (Site.DRAFTKINGS, Sport.FOOTBALL))
+        # all specs of slate go through same registered pool, so options of previous spec can't be left in it
+        num_of_specs = 0
+        for site, sport in slates:
+            for options in rules:
+                for player_options in self.PLAYER_OPTIONS:
+                    self.assert_same_as_without_registry(self.get_spec(site, sport, player_options, **options),
+                                                         registry)
+                    num_of_specs += 1
+        self.assertEqual(num_of_specs, 108)
+        self.assertEqual(len(registry), 3)
+
+    def test_options_of_players_dont_leak_to_other_specs(self):
+        registry = SlateRegistry()
+        get_optimizer(self.get_spec(Site.FANDUEL, Sport.BASKETBALL, self.PLAYER_OPTIONS[-1]), registry).optimize()
+        slate = list(registry._slates.values())[0]
+        self.assertFalse(any(player.force or player.exclude or player.max_exposure is not None
+                             for player in slate.players))
+        optimizer = get_optimizer(self.get_spec(Site.FANDUEL, Sport.BASKETBALL), registry)
+        self.assertEqual(len(optimizer.players), 30)
+        self.assertFalse(optimizer._lineup)
+        self.assert_same_as_without_registry(self.get_spec(Site.FANDUEL, Sport.BASKETBALL), registry)
+
+    def test_rules_dont_leak_to_other_specs(self):
+        # groups of rules are memoized in slate
+        registry = SlateRegistry()
+        rules = {'minMaxPlayersFromTeam': [{'teamName': 'T1', 'maxPlayers': 1}],
+                 'stacking': [{'stackType': 'QB_WR'}], 'no_def_vs_opp_players': True}
+        for options in (rules, {}, rules):
+            spec = self.get_spec(Site.DRAFTKINGS, Sport.FOOTBALL, {0: {'force': True}}, **options)
+            self.assert_same_as_without_registry(spec, registry)
+
+    def test_pool_in_other_order_has_same_slate(self):
+        registry = SlateRegistry()
+        spec = self.get_spec(Site.FANDUEL, Sport.BASKETBALL, {0: {'force': True}})
+        get_optimizer(spec, registry)
+        shuffled = dict(spec, players=spec['players'][::-1])
+        self.assert_same_as_without_registry(shuffled, registry)
+        self.assertEqual(len(registry), 1)
+        # types of values are part of key
+        spec['players'][5] = dict(spec['players'][5], salary=float(spec['players'][5]['salary']))
+        get_optimizer(spec, registry)
+        self.assertEqual(len(registry), 2)
+
+    def test_expired_slates_are_evicted(self):
+        specs = [self.get_spec(Site.FANDUEL, Sport.BASKETBALL, seed=seed) for seed in range(3)]
+        registry = SlateRegistry(ttl=0)
+        get_optimizer(specs[0], registry)
+        first = list(registry._slates.values())
+        get_optimizer(specs[0], registry)
+        self.assertEqual(len(registry), 1)
+        self.assertIsNot(list(registry._slates.values())[0], first[0])
+
+        registry = SlateRegistry(max_slates=2)
+        for spec in specs[:2] + specs[:1]:
+            get_optimizer(spec, registry)
+        used = dict(registry._slates)
+        # least recently used slate is evicted
+        get_optimizer(specs[2], registry)
+        self.assertEqual(len(registry), 2)
+        key = SlateRegistry.get_key(Site.FANDUEL, Sport.BASKETBALL, specs[0]['players'])[0]
+        self.assertIs(registry._slates[key], used[key])
+        key = SlateRegistry.get_key(Site.FANDUEL, Sport.BASKETBALL, specs[1]['players'])[0]
+        self.assertNotIn(key, registry._slates)
+
+
+def can_fill_slots(masks, slots, player=0):
+    """
+    Brute force check that players with passed masks of places can fill all places, every place is tried for every
+    player.
+    """
+    if player == len(masks):
+        return True
+    for slot in range(len(slots)):
+        if not slots[slot] and masks[player] & 1 << slot:
+            slots[slot] = True
+            if can_fill_slots(masks, slots, player + 1):
+                return True
+            slots[slot] = False
+    return False
+
+
+class TestSlotAssignment(unittest.TestCase):
+    def assert_same_as_brute_force(self, settings_class, positions, num_of_lineups=300):
+        names, position_masks = get_slot_table(settings_class)
+        rand = random.Random(1)
+        assigned = 0
+        for _ in range(num_of_lineups):
+            lineup = [rand.choice(positions).split('/') for _ in names]
+            masks = get_masks(lineup, position_masks)
+            slots = assign_slots(masks, len(names))
+            self.assertEqual(slots is not None, can_fill_slots(masks, [False] * len(names)), lineup)
+            if slots is not None:
+                assigned += 1
+                self.assertEqual(sorted(slots), list(range(len(names))))
+                self.assertTrue(all(mask & 1 << slot for mask, slot in zip(masks, slots)))
+        # both assignable and unassignable lineups are checked
+        self.assertTrue(0 < assigned < num_of_lineups)
+
+    def test_draftkings_basketball(self):
+        self.assert_same_as_brute_force(settings.DraftKingsBasketballSettings,
+                                        SPEC_POSITIONS[(Site.DRAFTKINGS, Sport.BASKETBALL)] + ['PG/SF', 'SG/PF'])
+
+    def test_draftkings_baseball(self):
+        self.assert_same_as_brute_force(settings.DraftKingsBaseballSettings,
+                                        SPEC_POSITIONS[(Site.DRAFTKINGS, Sport.BASEBALL)] + ['3B/SS', 'SP', 'RP'])
+
+    def test_fanduel_basketball(self):
+        self.assert_same_as_brute_force(settings.FanDuelBasketballSettings,
+                                        SPEC_POSITIONS[(Site.FANDUEL, Sport.BASKETBALL)])
+
+    def test_unassignable_lineups(self):
+        names, position_masks = get_slot_table(settings.DraftKingsBasketballSettings)
+        # only PG, G and UTIL places take point guards
+        masks = [position_masks['PG']] * 4 + [position_masks['C']] * 4
+        self.assertIsNone(assign_slots(masks, len(names)))
+        masks = [position_masks['PG'] | position_masks['SG']] * 3 + \
+            [position_masks[position] for position in ('SF', 'PF', 'C', 'C', 'SF')]
+        self.assertIsNotNone(assign_slots(masks, len(names)))
+        self.assertIsNone(assign_slots(masks[:-1], len(names)))
+
+
+async def request(port, method, path, body=None):
+    """
+    Send HTTP request to service and return status and body of response, which is read until connection is closed.
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = json.dumps(body).encode('utf-8') if body is not None else b''
+    writer.write('{} {} HTTP/1.1\r\nContent-Length: {}\r\n\r\n'.format(method, path, len(body)).encode('latin-1'))
+    writer.write(body)
+    response = (await reader.read()).decode('utf-8')
+    writer.close()
+    head, _, data = response.partition('\r\n\r\n')
+    return int(head.split(' ')[1]), data
+
+
+def get_events(data):
+    """
+    Return names and data of server-sent events.
+    """
+    events = []
+    for block in data.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        if fields:
+            events.append((fields['event'], fields['data']))
+    return events
+
+
+async def wait_for(condition, timeout=30):
+    started = time.time()
+    while not condition():
+        if time.time() - started > timeout:
+            raise AssertionError('Condition is not met in {} seconds'.format(timeout))
+        await asyncio.sleep(0.05)
+
+
+class TestOptimizerService(unittest.TestCase):
+    def run_service(self, test, workers=1, queue_size=10):
+        """
+        Run coroutine function with started service and port of its HTTP server.
+        """
+        async def main():
+            service = OptimizerService(workers, queue_size)
+            service.start()
+            server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+            try:
+                return await test(service, server.sockets[0].getsockname()[1])
+            finally:
+                server.close()
+                service.stop()
+                await asyncio.gather(*service.tasks, return_exceptions=True)
+        return asyncio.run(main())
+
+    def test_lineups_are_streamed_before_done_event(self):
+        spec = get_spec(Site.FANDUEL, Sport.BASKETBALL, 30, solver='HIGHS', numberOfLineups=3)
+
+        async def test(service, port):
+            status, data = await request(port, 'POST', '/optimize', spec)
+            self.assertEqual(status, 200)
+            events = get_events(data)
+            self.assertEqual([event for event, _ in events], ['lineup'] * 3 + ['done'])
+            self.assertEqual(json.loads(events[-1][1])['lineups'], 3)
+        self.run_service(test)
+
+    def test_jobs_of_same_spec_share_optimization(self):
+        spec = get_spec(Site.FANDUEL, Sport.BASKETBALL, 30, solver='HIGHS', numberOfLineups=3)
+
+        async def test(service, port):
+            first = service.submit(spec)
+            second = service.submit(json.loads(json.dumps(spec)))
+            self.assertIs(first.optimization, second.optimization)
+            self.assertEqual(service.queue.qsize(), 1)
+            first_events = get_events((await request(port, 'GET', '/jobs/{}/lineups'.format(first.id)))[1])
+            second_events = get_events((await request(port, 'GET', '/jobs/{}/lineups'.format(second.id)))[1])
+            self.assertEqual([data for event, data in first_events if event == 'lineup'],
+                             [data for event, data in second_events if event == 'lineup'])
+            self.assertEqual(len(first_events), 4)
+        self.run_service(test)
+
+    def test_full_queue(self):
+        spec = get_spec(Site.FANDUEL, Sport.BASKETBALL, 30, solver='HIGHS', numberOfLineups=3)
+
+        async def test(service, port):
+            self.assertEqual((await request(port, 'POST', '/jobs', spec))[0], 202)
+            self.assertEqual((await request(port, 'POST', '/jobs', dict(spec, numberOfLineups=4)))[0], 503)
+            # spec which is already queued joins its optimization
+            self.assertEqual((await request(port, 'POST', '/jobs', spec))[0], 202)
+        # without workers nothing is taken from queue
+        self.run_service(test, workers=0, queue_size=1)
+
+    def test_cancelled_job_stops_worker(self):
+        spec = get_spec(Site.DRAFTKINGS, Sport.FOOTBALL, 200, solver='HIGHS', numberOfLineups=150)
+
+        async def test(service, port):
+            status, data = await request(port, 'POST', '/jobs', spec)
+            job = service.jobs[json.loads(data)['id']]
+            await wait_for(lambda: len(job.lineups) > 0)
+            worker = job.optimization.worker
+            status, data = await request(port, 'DELETE', '/jobs/{}'.format(job.id))
+            self.assertEqual(json.loads(data)['state'], 'cancelled')
+            await wait_for(lambda: not worker.process.is_alive())
+            self.assertEqual(get_events((await request(port, 'GET', '/jobs/{}/lineups'.format(job.id)))[1])[-1][0],
+                             'cancelled')
+            # next optimization gets new worker
+            status, data = await request(port, 'POST', '/optimize', dict(spec, numberOfLineups=2))
+            self.assertEqual([event for event, _ in get_events(data)], ['lineup', 'lineup', 'done'])
+        self.run_service(test)
+
+    def test_killed_worker_stops_its_process_group(self):
+        worker = SolverWorker()
+        try:
+            started = time.time()
+            while os.getpgid(worker.process.pid) != worker.process.pid and time.time() - started < 10:
+                time.sleep(0.01)
+            # solver binary started by worker is in its process group
+            solver = subprocess.Popen(['sleep', '60'], preexec_fn=lambda: os.setpgid(0, worker.process.pid))
+            worker.kill()
+            self.assertEqual(solver.wait(10), -signal.SIGKILL)
+        finally:
+            worker.close()
+
+
 def run_tests():
     unittest.main()
 